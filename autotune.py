@@ -0,0 +1,298 @@
+"""
+Auto-tune
+Chọn batch size và số workers cho device hiện tại bằng các micro-benchmark ngắn:
+vài bước forward/backward với từng batch size (trong giới hạn bộ nhớ), sau đó
+đo tốc độ dataloader với từng số workers. Chạy trong process riêng (spawn).
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+
+DEFAULT_BATCHES = (2, 4, 8, 16, 32, 64, 128)
+# Tỷ lệ bộ nhớ (GPU: VRAM, CPU: RAM còn trống) tối đa được dùng
+DEFAULT_MEMORY_FRACTION = 0.85
+COMPUTE_STEPS = 3
+LOADER_BATCHES = 10
+# Một bước quá chậm -> không thử batch lớn hơn nữa
+MAX_STEP_SECONDS = 30.0
+# Chênh lệch throughput nhỏ hơn mức này coi như nhiễu đo -> chọn batch nhỏ hơn
+THROUGHPUT_TOLERANCE = 0.03
+
+
+@dataclass
+class AutotuneSettings:
+    model: str
+    dataset: str
+    imgsz: int = 640
+    device: str = ''
+    batches: tuple = DEFAULT_BATCHES
+    memory_fraction: float = DEFAULT_MEMORY_FRACTION
+
+
+@dataclass
+class AutotuneProgress:
+    text: str
+
+
+@dataclass
+class AutotuneResult:
+    batch: int = 0
+    workers: int = 0
+    images_per_sec: float = 0.0
+    device: str = ''
+    # Mỗi phép đo: {'stage': 'compute'|'loader', ...}
+    trials: list = field(default_factory=list)
+    error: str = ''
+
+
+def resolve_device(device):
+    """'' -> first GPU or cpu; '0' -> 'cuda:0'; '0,1' -> ('cuda:0', 2 devices)"""
+    import torch
+
+    device = str(device).strip().lower()
+    if device in ('', 'none'):
+        return ('cuda:0', 1) if torch.cuda.is_available() else ('cpu', 1)
+    if device in ('cpu', 'mps'):
+        return device, 1
+    ids = [d.strip() for d in device.replace('cuda:', '').split(',') if d.strip()]
+    return f"cuda:{ids[0]}", len(ids)
+
+
+def _memory_used(device, baseline):
+    """Fraction of the memory budget currently used"""
+    import torch
+
+    if device.startswith('cuda'):
+        total = torch.cuda.get_device_properties(device).total_memory
+        return torch.cuda.max_memory_reserved(device) / total
+    try:
+        import psutil
+    except ImportError:
+        return 0.0
+    rss, available = baseline
+    return max(0, psutil.Process().memory_info().rss - rss) / available
+
+
+def _memory_baseline(device):
+    import torch
+
+    if device.startswith('cuda'):
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats(device)
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss, psutil.virtual_memory().available
+
+
+def _synthetic_batch(batch, imgsz, nc, device, boxes_per_image=4):
+    import torch
+
+    n = batch * boxes_per_image
+    xy = torch.rand(n, 2) * 0.6 + 0.2
+    wh = torch.rand(n, 2) * 0.2 + 0.05
+    return {
+        'img': torch.rand(batch, 3, imgsz, imgsz, device=device),
+        'batch_idx': torch.arange(batch).repeat_interleave(boxes_per_image).float().to(device),
+        'cls': torch.randint(0, nc, (n, 1)).float().to(device),
+        'bboxes': torch.cat([xy, wh], 1).to(device),
+    }
+
+
+def _benchmark_compute(settings, device, report):
+    """Forward/backward/step throughput for each candidate batch size"""
+    import torch
+    from ultralytics import YOLO
+    from ultralytics.cfg import get_cfg
+    from ultralytics.utils import DEFAULT_CFG
+
+    model = YOLO(settings.model).model.to(device)
+    model.args = get_cfg(DEFAULT_CFG)
+    model.train()
+    for p in model.parameters():
+        p.requires_grad_(True)
+    optimizer = torch.optim.SGD(model.parameters(), lr=1e-5, momentum=0.9)
+    amp = device.startswith('cuda')
+    nc = model.model[-1].nc
+
+    def sync():
+        if amp:
+            torch.cuda.synchronize(device)
+
+    trials, fitting, best = [], [], None
+    for batch in settings.batches:
+        baseline = _memory_baseline(device)
+        try:
+            data = _synthetic_batch(batch, settings.imgsz, nc, device)
+            times, memory = [], 0.0
+            for step in range(COMPUTE_STEPS + 1):  # bước đầu là warmup
+                sync()
+                start = time.perf_counter()
+                with torch.autocast('cuda', enabled=amp):
+                    loss, _ = model.loss(data)
+                loss.sum().backward()
+                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+                sync()
+                times.append(time.perf_counter() - start)
+                memory = max(memory, _memory_used(device, baseline))
+                if times[-1] > MAX_STEP_SECONDS:
+                    break
+        except RuntimeError as e:
+            if 'out of memory' not in str(e).lower():
+                raise
+            report(f"  batch {batch}: out of memory")
+            trials.append({'stage': 'compute', 'batch': batch, 'error': 'out of memory'})
+            break
+        finally:
+            data = loss = None
+            if amp:
+                torch.cuda.empty_cache()
+
+        step_time = sum(times[1:]) / len(times[1:]) if len(times) > 1 else times[0]
+        trial = {'stage': 'compute', 'batch': batch, 'images_per_sec': batch / step_time,
+                 'memory': memory}
+        trials.append(trial)
+        report(f"  batch {batch}: {trial['images_per_sec']:.1f} img/s, memory {memory:.0%}")
+        if memory > settings.memory_fraction:
+            trial['error'] = 'over memory budget'
+            break
+        fitting.append(trial)
+        if best is None or trial['images_per_sec'] >= best['images_per_sec']:
+            best = trial
+        elif trial['images_per_sec'] < 0.9 * best['images_per_sec']:
+            # Throughput đã bão hòa, batch lớn hơn chỉ tốn thêm bộ nhớ
+            break
+        if times[-1] > MAX_STEP_SECONDS:
+            break
+    if best is None:
+        return None, trials
+    threshold = best['images_per_sec'] * (1 - THROUGHPUT_TOLERANCE)
+    return next(t for t in fitting if t['images_per_sec'] >= threshold), trials
+
+
+def _benchmark_loader(settings, batch, needed, report):
+    """Dataloader throughput for increasing worker counts"""
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import build_dataloader
+    from ultralytics.data.utils import check_det_dataset
+    from ultralytics.utils import DEFAULT_CFG
+
+    from dataset_pack import build_dataset
+
+    data = check_det_dataset(settings.dataset)
+    cfg = get_cfg(DEFAULT_CFG, {'imgsz': settings.imgsz, 'data': settings.dataset})
+    dataset = build_dataset(cfg, data['train'], batch, data, mode='train', stride=32)
+
+    cpu_count = os.cpu_count() or 1
+    candidates = [w for w in (0, 1, 2, 4, 6, 8, 12, 16) if w <= cpu_count]
+    trials, best = [], None
+    for workers in candidates:
+        loader = build_dataloader(dataset, batch, workers, shuffle=True)
+        iterator = iter(loader)
+        next(iterator)  # khởi động worker processes
+        start = time.perf_counter()
+        count = 0
+        for _ in range(LOADER_BATCHES):
+            try:
+                count += len(next(iterator)['img'])
+            except StopIteration:
+                iterator = iter(loader)
+        elapsed = time.perf_counter() - start
+        del iterator, loader
+
+        trial = {'stage': 'loader', 'workers': workers, 'images_per_sec': count / elapsed}
+        trials.append(trial)
+        report(f"  workers {workers}: {trial['images_per_sec']:.1f} img/s")
+        if best is None or trial['images_per_sec'] > best['images_per_sec']:
+            best = trial
+        if trial['images_per_sec'] >= needed:
+            # Đủ nhanh để GPU/CPU không phải chờ dữ liệu -> dùng ít workers nhất
+            return trial, trials
+    return best, trials
+
+
+def run_autotune(settings, report=print):
+    """Run both benchmarks in the current process and return an AutotuneResult"""
+    device, n_devices = resolve_device(settings.device)
+    result = AutotuneResult(device=device)
+
+    report(f"Benchmarking forward/backward on {device} (imgsz {settings.imgsz})...")
+    best, trials = _benchmark_compute(settings, device, report)
+    result.trials += trials
+    if best is None:
+        result.error = "No batch size fits in the memory budget"
+        return result
+    # DDP: batch là tổng trên mọi GPU
+    result.batch = best['batch'] * n_devices
+
+    report(f"Benchmarking dataloader at batch {best['batch']}...")
+    # Dataloader CPU phải nuôi được tất cả GPU, thêm 10% dự phòng cho augmentation nặng
+    loader, trials = _benchmark_loader(settings, best['batch'], best['images_per_sec'] * n_devices * 1.1,
+                                       report)
+    result.trials += trials
+    result.workers = loader['workers']
+    result.images_per_sec = min(best['images_per_sec'] * n_devices, loader['images_per_sec'])
+    return result
+
+
+def _autotune_main(conn, settings):
+    # Log của ultralytics (scan dataset...) không cần thiết ở đây
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    try:
+        result = run_autotune(settings, lambda text: conn.send(AutotuneProgress(text)))
+    except BaseException:
+        result = AutotuneResult(error=traceback.format_exc())
+    conn.send(result)
+    conn.close()
+
+
+class Autotuner:
+    """Runs run_autotune() in a spawned process.
+
+    on_message receives AutotuneProgress messages and finally one
+    AutotuneResult, from a background reader thread.
+    """
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.process = None
+
+    def start(self, settings):
+        ctx = multiprocessing.get_context('spawn')
+        conn, child_conn = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(target=_autotune_main, args=(child_conn, settings),
+                                   name="yolo-autotune")
+        self.process.start()
+        child_conn.close()
+        threading.Thread(target=self._read_messages, args=(conn,), daemon=True).start()
+
+    def _read_messages(self, conn):
+        finished = False
+        try:
+            while True:
+                message = conn.recv()
+                finished = finished or isinstance(message, AutotuneResult)
+                self.on_message(message)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            self.process.join()
+            if not finished:
+                self.on_message(AutotuneResult(
+                    error=f"Auto-tune process exited with code {self.process.exitcode}"))
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self):
+        if self.is_alive():
+            self.process.terminate()
@@ -0,0 +1,167 @@
+"""
+Benchmark: Vectorized Evaluation From Cached Predictions
+Tạo một split giả lập (mặc định 10k ảnh, ~300 prediction/ảnh ở conf 0.001 như
+lúc val), cache bằng prediction_eval.build_cache rồi đo thời gian
+PredictionCache.evaluate với nhiều cặp conf / NMS iou. Một phần ảnh được kiểm
+tra lại bằng cách tính của ultralytics (match_predictions + compute_ap,
+torchvision NMS) trên cùng các box đã cache để chắc chắn kết quả giống hệt.
+Với NMS iou < CACHE_IOU còn in độ lệch so với NMS thẳng trên box thô (trước
+NMS, như khi chạy lại model): phần đó là xấp xỉ, không phải lỗi tính toán.
+
+Usage:
+    python benchmarks/bench_eval.py
+    python benchmarks/bench_eval.py --images 2000 --check 300
+    python benchmarks/bench_eval.py --cache runs/detect/train3/eval/best-val.npz
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prediction_eval import CACHE_IOU, IOU_THRESHOLDS, MAX_DET, PredictionCache, build_cache, format_metrics
+from tiled_inference import box_overlap
+
+SWEEP = ((0.001, 0.7), (0.01, 0.7), (0.1, 0.7), (0.25, 0.7), (0.001, 0.6), (0.25, 0.5), (0.5, 0.45))
+
+
+def _nms(dets, iou):
+    """Class-aware greedy NMS (torchvision) of (N, 6) detections, keeps the input order"""
+    import torch
+    from torchvision.ops import batched_nms
+
+    if not len(dets):
+        return dets
+    t = torch.from_numpy(np.ascontiguousarray(dets))
+    keep = batched_nms(t[:, :4], t[:, 4], t[:, 5].long(), iou).numpy()
+    return dets[np.sort(keep)]
+
+
+def synthetic_split(images, classes, seed=0, size=640):
+    """Per-image (N, 6) predictions after NMS at CACHE_IOU, (M, 5) labels and the raw predictions before NMS"""
+    rng = np.random.default_rng(seed)
+    preds, labels, raws = [], [], []
+    for _ in range(images):
+        m = int(rng.integers(0, 16))
+        wh = rng.uniform(8, 200, (m, 2))
+        xy = rng.uniform(0, size - wh)
+        label = np.column_stack([rng.integers(0, classes, m), xy, xy + wh])
+        # Vài prediction quanh mỗi label (lệch vị trí, đôi khi sai class) + nhiễu conf thấp
+        k = rng.integers(1, 6, m)
+        src = np.repeat(label, k, axis=0)
+        jitter = rng.normal(0, 0.12, (len(src), 4)) * np.repeat(wh, k, axis=0)[:, [0, 1, 0, 1]]
+        near = np.column_stack([src[:, 1:5] + jitter, rng.beta(2, 2, len(src)),
+                                np.where(rng.random(len(src)) < 0.9, src[:, 0], rng.integers(0, classes, len(src)))])
+        n = max(0, 300 - len(near))
+        wh = rng.uniform(4, 300, (n, 2))
+        xy = rng.uniform(0, size - wh)
+        noise = np.column_stack([xy, xy + wh, rng.uniform(0.001, 0.2, n) ** 2 + 0.001, rng.integers(0, classes, n)])
+        pred = np.concatenate([near, noise]).astype(np.float32)
+        pred = pred[np.argsort(-pred[:, 4], kind='stable')]
+        preds.append(_nms(pred, CACHE_IOU)[:MAX_DET])
+        labels.append(label.astype(np.float32))
+        raws.append(pred)
+    return preds, labels, raws
+
+
+def reference_map(preds, labels, conf, iou, classes, raw=False):
+    """(mAP50, mAP50-95) with ultralytics' own matching and AP on the same boxes.
+
+    raw=True: preds are the model output before NMS, NMS runs once at iou.
+    """
+    import torch
+    from ultralytics.models.yolo.detect import DetectionValidator
+    from ultralytics.utils.metrics import compute_ap
+
+    validator = DetectionValidator()
+    validator.iouv = torch.tensor(IOU_THRESHOLDS)
+    tps, confs, clss, targets = [], [], [], []
+    for pred, label in zip(preds, labels):
+        pred = pred[pred[:, 4] >= conf]
+        if raw:
+            pred = _nms(pred, iou)[:MAX_DET]
+        elif iou < CACHE_IOU:
+            pred = _nms(pred, iou)
+        overlap = torch.from_numpy(box_overlap(label[:, None, 1:5], pred[None, :, :4]).astype(np.float32))
+        tps.append(validator.match_predictions(torch.from_numpy(pred[:, 5]), torch.from_numpy(label[:, 0]),
+                                               overlap.reshape(len(label), len(pred))).numpy())
+        confs.append(pred[:, 4])
+        clss.append(pred[:, 5])
+        targets.append(label[:, 0])
+    tp, conf_all, cls = np.concatenate(tps), np.concatenate(confs), np.concatenate(clss)
+    target = np.concatenate(targets)
+    aps = []
+    for c in range(classes):
+        n_l = int((target == c).sum())
+        if not n_l:
+            continue
+        rows = np.flatnonzero(cls == c)
+        rows = rows[np.argsort(-conf_all[rows], kind='stable')]
+        ap = np.zeros(len(IOU_THRESHOLDS))
+        if len(rows):
+            tpc = tp[rows].cumsum(0)
+            recall = tpc / n_l
+            precision = tpc / np.arange(1, len(rows) + 1)[:, None]
+            ap = np.array([compute_ap(recall[:, k], precision[:, k])[0] for k in range(len(IOU_THRESHOLDS))])
+        aps.append(ap)
+    aps = np.array(aps)
+    return aps[:, 0].mean(), aps.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=10000)
+    parser.add_argument('--classes', type=int, default=4)
+    parser.add_argument('--check', type=int, default=500, help="images re-checked with ultralytics (0 = skip)")
+    parser.add_argument('--cache', default='', help="time an existing .npz cache instead of synthetic data")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.cache:
+        cache = PredictionCache.load(args.cache)
+    else:
+        start = time.perf_counter()
+        preds, labels, raws = synthetic_split(args.images, args.classes)
+        print(f"synthetic split: {args.images} images in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        cache = PredictionCache(build_cache(preds, labels), {'conf': 0.001, 'iou': CACHE_IOU})
+        print(f"build_cache: {len(cache.pred_conf)} predictions, {len(cache.label_cls)} labels, "
+              f"{len(cache.match_pred)} match pairs, {len(cache.nms_i)} NMS pairs "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'conf':>6} {'iou':>5} {'preds':>9} {'mAP50':>7} {'mAP50-95':>9} {'ms':>7}")
+    for conf, iou in SWEEP:
+        times = []
+        for _ in range(args.repeat):
+            metrics = cache.evaluate(conf, iou)
+            times.append(metrics.seconds)
+        print(f"{conf:>6g} {iou:>5g} {metrics.predictions:>9} {metrics.map50:>7.4f} {metrics.map50_95:>9.4f} "
+              f"{min(times) * 1000:>7.1f}")
+    print()
+    print(format_metrics(cache.evaluate()))
+
+    if args.check and not args.cache:
+        n = min(args.check, args.images)
+        subset = PredictionCache(build_cache(preds[:n], labels[:n]), {'conf': 0.001, 'iou': CACHE_IOU})
+        print(f"\ncheck against ultralytics on {n} images:")
+        worst = 0.0
+        for conf, iou in SWEEP:
+            ours = subset.evaluate(conf, iou)
+            ref50, ref = reference_map(preds[:n], labels[:n], conf, iou, args.classes)
+            diff = max(abs(ours.map50 - ref50), abs(ours.map50_95 - ref))
+            worst = max(worst, diff)
+            print(f"  conf {conf:g} iou {iou:g}: ours {ours.map50:.6f}/{ours.map50_95:.6f} "
+                  f"ultralytics {ref50:.6f}/{ref:.6f}")
+            if ours.approximate:
+                raw50, raw = reference_map(raws[:n], labels[:n], conf, iou, args.classes, raw=True)
+                print(f"    approximate: NMS on raw boxes gives {raw50:.6f}/{raw:.6f} "
+                      f"(gap {ours.map50 - raw50:+.4f}/{ours.map50_95 - raw:+.4f})")
+        print(f"max difference {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: Metrics Parser
+Đo tốc độ (lines/second) của TrainingOutputParser trên một log training nhiều MB
+
+Usage:
+    python benchmarks/bench_metrics_parser.py                      # log tổng hợp ~8 MB
+    python benchmarks/bench_metrics_parser.py --bar legacy         # progress bar kiểu tqdm cũ '|###|'
+    python benchmarks/bench_metrics_parser.py --log runs/detect/train/train_log.001.log
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_parser import TrainingOutputParser
+from training_log import ConsoleLineSplitter
+
+
+def _bar(pct, b, batches, style):
+    """Progress bar như ultralytics in sau phần mô tả"""
+    if style == 'legacy':
+        # tqdm (ultralytics 8.3.x cũ)
+        return f"{pct:3d}%|{'#' * (pct // 10):<10}| {b}/{batches} [00:10<00:12,  5.20it/s]"
+    filled = pct * 12 // 100
+    return f"{pct}% {'━' * filled}{'─' * (12 - filled)} {b}/{batches} 5.2it/s 10.4s<12.6s"
+
+
+def synthesize_log(size_mb, batches=120, seed=0, style='current'):
+    """Tạo log giống output ultralytics, mỗi batch là một lần ghi đè '\\r'"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, size, epoch = [], 0, 0
+    header = ("\n" + "%11s" * 7) % ("Epoch", "GPU_mem", "box_loss", "cls_loss",
+                                   "dfl_loss", "Instances", "Size") + "\n"
+    epochs = 300
+    while size < target:
+        epoch += 1
+        parts.append(header)
+        for b in range(1, batches + 1):
+            losses = [rng.uniform(0.5, 3.0) for _ in range(3)]
+            pct = b * 100 // batches
+            row = ("%11s" * 2 + "%11.4g" * 5) % (f"{epoch}/{epochs}", "2.51G", *losses,
+                                                 rng.randint(10, 80), 768)
+            parts.append(f"\r{row}: {_bar(pct, b, batches, style)}")
+        parts.append("\n")
+        parts.append(("%22s" + "%11s" * 6) % ("Class", "Images", "Instances", "Box(P",
+                                              "R", "mAP50", "mAP50-95)") + f": {_bar(100, 8, 8, style)}\n")
+        parts.append(("%22s" + "%11i" * 2 + "%11.3g" * 4) % ("all", 100, 250, *[rng.random() for _ in range(4)]) + "\n")
+        size = sum(len(p) for p in parts)
+    return "".join(parts)
+
+
+def legacy_parse(line):
+    """Cách parse cũ: sáu lần re.search trên mỗi dòng"""
+    re.search(r'Epoch\s+(\d+)/(\d+)', line)
+    re.search(r'loss:\s*([\d.]+)', line, re.IGNORECASE)
+    re.search(r'precision:\s*([\d.]+)', line, re.IGNORECASE)
+    re.search(r'recall:\s*([\d.]+)', line, re.IGNORECASE)
+    re.search(r'mAP50:\s*([\d.]+)', line, re.IGNORECASE)
+    re.search(r'mAP50-95:\s*([\d.]+)', line, re.IGNORECASE)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--log', help="recorded training log (default: synthesize one)")
+    ap.add_argument('--size-mb', type=float, default=8.0, help="size of the synthesized log")
+    ap.add_argument('--bar', choices=('current', 'legacy'), default='current',
+                    help="progress bar of the synthesized log: ━━━─── (current ultralytics) or tqdm |###|")
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    if args.log:
+        with open(args.log, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthesize_log(args.size_mb, style=args.bar).encode()
+
+    # Raw mode: mọi trạng thái progress là một dòng -> trường hợp xấu nhất cho parser
+    splitter = ConsoleLineSplitter(raw=True)
+    lines = [text for _, text in splitter.feed(data) + splitter.close()]
+    print(f"Log: {len(data) / 1e6:.1f} MB, {len(lines):,} lines")
+
+    def run_parser():
+        parser = TrainingOutputParser()
+        return sum(len(parser.feed(line)) for line in lines)
+
+    def run_legacy():
+        for line in lines:
+            legacy_parse(line)
+        return 0
+
+    for name, run in (("TrainingOutputParser", run_parser), ("legacy 6x re.search", run_legacy)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            events = run()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:22s} {len(lines) / best:>14,.0f} lines/s  "
+              f"{len(data) / best / 1e6:8.1f} MB/s  events={events}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark: Packed Dataset vs Directory
+So sánh tốc độ đọc ảnh (images/second) của dataset dạng thư mục (mỗi ảnh một
+file) với dataset đã đóng gói bằng dataset_pack (shard + mmap), theo thứ tự
+ngẫu nhiên như khi training.
+
+Usage:
+    python benchmarks/bench_pack.py --data path/to/data.yaml
+    python benchmarks/bench_pack.py --data path/to/data.yaml --drop-caches   # Linux, root: đo đọc nguội
+
+Các mức đo:
+    read     chỉ đọc bytes (I/O)
+    decode   đọc + cv2.imdecode
+    dataset  YOLODataset / PackedYOLODataset __getitem__ (không augmentation)
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_pack import PackReader, build_dataset, pack_dataset
+from dataset_scan import list_images, load_data_yaml
+
+
+def drop_caches():
+    """Flush the OS page cache so the next reads hit the disk"""
+    os.sync()
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def read_files(paths, order, decode):
+    import cv2
+    import numpy as np
+
+    for i in order:
+        with open(paths[i], 'rb') as f:
+            data = f.read()
+        if decode:
+            cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def read_pack(reader, order, decode):
+    for i in order:
+        if decode:
+            reader.decode(i)
+        else:
+            bytes(reader.image_bytes(i))  # chạm vào mọi page của ảnh
+
+
+def read_dataset(dataset, order, decode):
+    for i in order:
+        dataset[i]
+
+
+def make_datasets(data_yaml, pack_yaml, split, imgsz):
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data.utils import check_det_dataset
+    from ultralytics.utils import DEFAULT_CFG
+
+    # names/nc giống nhau; đường dẫn split lấy theo cách dataset_scan giải quyết
+    data = check_det_dataset(pack_yaml)
+    cfg = get_cfg(DEFAULT_CFG, {'imgsz': imgsz, 'data': pack_yaml})
+    return (build_dataset(cfg, load_data_yaml(data_yaml)[split], 16, data, mode='val'),
+            build_dataset(cfg, load_data_yaml(pack_yaml)[split][0], 16, data, mode='val'))
+
+
+def measure(name, fn, target, count, repeat, cold):
+    order = list(range(count))
+    times = []
+    for _ in range(repeat):
+        random.shuffle(order)
+        if cold:
+            drop_caches()
+        start = time.perf_counter()
+        fn(target, order)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    print(f"{name:32s} {count / best:10.1f} img/s   ({best:.2f}s for {count} images)")
+    return count / best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--data', required=True, help="dataset YAML file (directory layout)")
+    ap.add_argument('--pack', default=None, help="packed data.yaml (default: pack into a temp dir)")
+    ap.add_argument('--split', default='train')
+    ap.add_argument('--limit', type=int, default=2000, help="images per measurement")
+    ap.add_argument('--imgsz', type=int, default=640)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--drop-caches', action='store_true', help="drop the page cache before every pass")
+    ap.add_argument('--skip-dataset', action='store_true', help="skip the ultralytics dataset level")
+    args = ap.parse_args()
+
+    if args.drop_caches and not drop_caches():
+        sys.exit("--drop-caches needs Linux and root")
+
+    tmp = None
+    if args.pack is None:
+        tmp = tempfile.TemporaryDirectory()
+        print(f"Packing {args.data}...")
+        result = pack_dataset(args.data, tmp.name)
+        print(f"  {result.images} images, {result.shards} shards, {result.bytes / 2**20:.0f} MB "
+              f"in {result.seconds:.1f}s")
+        args.pack = result.yaml_path
+
+    pack_split = load_data_yaml(args.pack)[args.split][0]
+    reader = PackReader(pack_split)
+    # Ảnh lỗi bị bỏ khi đóng gói -> so sánh đúng cùng tập ảnh
+    packed_sources = set(reader.sources.tolist())
+    paths = [p for p in list_images(load_data_yaml(args.data)[args.split]) if p in packed_sources]
+    count = min(args.limit, len(paths), len(reader))
+    print(f"{count} images from '{args.split}', {'cold' if args.drop_caches else 'warm'} page cache\n")
+
+    rows = []
+    for decode in (False, True):
+        level = 'decode' if decode else 'read'
+        files = measure(f"{level:8s} directory", lambda p, o: read_files(p, o, decode), paths, count,
+                        args.repeat, args.drop_caches)
+        packed = measure(f"{level:8s} packed (mmap)", lambda r, o: read_pack(r, o, decode), reader, count,
+                         args.repeat, args.drop_caches)
+        rows.append((level, files, packed))
+
+    if not args.skip_dataset:
+        directory, packed = make_datasets(args.data, args.pack, args.split, args.imgsz)
+        n = min(count, len(directory), len(packed))
+        files = measure("dataset  directory", lambda d, o: read_dataset(d, o, True), directory, n,
+                        args.repeat, args.drop_caches)
+        packed_speed = measure("dataset  packed (mmap)", lambda d, o: read_dataset(d, o, True), packed, n,
+                               args.repeat, args.drop_caches)
+        rows.append(('dataset', files, packed_speed))
+
+    print(f"\n{'level':10s} {'directory':>12s} {'packed':>12s} {'speedup':>9s}")
+    for level, files, packed in rows:
+        print(f"{level:10s} {files:12.1f} {packed:12.1f} {packed / files:8.2f}x")
+    reader.close()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
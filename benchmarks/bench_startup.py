@@ -0,0 +1,95 @@
+"""
+Benchmark: Startup Time
+Đo thời gian từ lúc khởi chạy đến khi cửa sổ hiện ra (window-visible latency)
+cho bản chạy bằng script và bản đóng gói PyInstaller (onefile / onedir)
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --exe dist/YOLOTrainingStudio.exe --exe dist/YOLOTrainingStudio/YOLOTrainingStudio.exe
+    python benchmarks/bench_startup.py --imports-only      # không cần màn hình
+
+Cửa sổ cần display thật (hoặc Xvfb). --imports-only chỉ đo thời gian import
+module giao diện so với import torch/ultralytics.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Trùng với yolo_trainer_gui.STARTUP_MARK_ENV
+STARTUP_MARK_ENV = "YOLO_STUDIO_STARTUP_MARK"
+
+
+def time_window_visible(command, timeout=120):
+    """Seconds from launch until the app reports its main window is mapped"""
+    fd, mark = tempfile.mkstemp(suffix=".mark")
+    os.close(fd)
+    os.remove(mark)
+    env = dict(os.environ, **{STARTUP_MARK_ENV: mark})
+    start = time.time()
+    proc = subprocess.Popen(command, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        raise RuntimeError(f"{command[0]} did not exit within {timeout}s")
+    if not os.path.exists(mark):
+        raise RuntimeError(f"window never became visible:\n{stderr.decode(errors='replace')[-2000:]}")
+    with open(mark) as f:
+        visible = float(f.read())
+    os.remove(mark)
+    return visible - start
+
+
+def time_import(statement):
+    """Seconds for a fresh interpreter to run `statement` (no display needed)"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def report(name, samples):
+    print(f"{name:45s} median {statistics.median(samples):6.2f}s  "
+          f"min {min(samples):6.2f}s  max {max(samples):6.2f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--exe', action='append', default=[], help="frozen build to measure (repeatable)")
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--imports-only', action='store_true', help="skip the window measurements")
+    args = ap.parse_args()
+
+    imports = (
+        ("python -c pass", "pass"),
+        ("import yolo_trainer_gui", "import yolo_trainer_gui"),
+        ("import torch, ultralytics (eager baseline)", "import torch, ultralytics"),
+    )
+    for name, statement in imports:
+        try:
+            report(name, [time_import(statement) for _ in range(args.repeat)])
+        except subprocess.CalledProcessError:
+            print(f"{name:45s} failed (module missing?)")
+
+    if args.imports_only:
+        return
+    targets = [("script: yolo_trainer_gui.py", [sys.executable, "yolo_trainer_gui.py"])]
+    targets += [(f"frozen: {os.path.relpath(exe, ROOT)}", [os.path.abspath(exe)]) for exe in args.exe]
+    for name, command in targets:
+        # Lần đầu là cold start (cache đĩa, giải nén onefile), tính riêng
+        first = time_window_visible(command)
+        samples = [time_window_visible(command) for _ in range(args.repeat)]
+        print(f"{name:45s} first  {first:6.2f}s")
+        report(name, samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark: Tiled vs Whole-Image Inference
+So sánh inference cả ảnh (thu nhỏ về imgsz) với inference theo tile (tiled_inference)
+trên split val của một dataset: tốc độ (images/s, tiles/s) và recall so với label,
+riêng cho object nhỏ (< 32x32 px trên ảnh gốc) là loại bị mất khi thu nhỏ ảnh 4K.
+
+Usage:
+    python benchmarks/bench_tiled.py --weights runs/detect/train3/weights/best.pt --data path/to/data.yaml
+    python benchmarks/bench_tiled.py --weights best.pt --data data.yaml --imgsz 768 --tile 640 --overlap 0.2
+
+Các chế độ:
+    whole      cả ảnh, imgsz = --imgsz (mặc định: imgsz lúc train)
+    tile-nms   tile --tile chồng lấn --overlap, gộp box bằng NMS (IoS)
+    tile-wbf   như trên, gộp bằng WBF
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_scan import list_images, load_data_yaml
+from prediction_eval import load_labels
+from tiled_inference import TILE_OVERLAP, TILE_SIZE, box_overlap, predict_tiled
+
+SMALL_AREA = 32 * 32
+MATCH_IOU = 0.5
+
+
+def match(labels, dets, iou=MATCH_IOU):
+    """(matched label mask, true positives): greedy by confidence, same class only"""
+    matched = np.zeros(len(labels), dtype=bool)
+    if not len(labels) or not len(dets):
+        return matched, 0
+    dets = dets[np.argsort(-dets[:, 4])]
+    overlap = box_overlap(dets[:, None, :4], labels[None, :, 1:5])
+    overlap[dets[:, 5, None] != labels[None, :, 0]] = 0
+    tp = 0
+    for row in overlap:
+        row = np.where(matched, 0, row)
+        best = int(row.argmax())
+        if row[best] >= iou:
+            matched[best] = True
+            tp += 1
+    return matched, tp
+
+
+class Tally:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.images = 0
+        self.tiles = 0
+        self.detections = 0
+        self.tp = 0
+        self.labels = 0
+        self.found = 0
+        self.small = 0
+        self.small_found = 0
+
+    def add(self, labels, dets, seconds, tiles=0):
+        matched, tp = match(labels, dets)
+        area = (labels[:, 3] - labels[:, 1]) * (labels[:, 4] - labels[:, 2])
+        small = area < SMALL_AREA
+        self.seconds += seconds
+        self.images += 1
+        self.tiles += tiles
+        self.detections += len(dets)
+        self.tp += tp
+        self.labels += len(labels)
+        self.found += int(matched.sum())
+        self.small += int(small.sum())
+        self.small_found += int((matched & small).sum())
+
+    def row(self):
+        def ratio(a, b):
+            return f"{a / b:.3f}" if b else "-"
+        tiles_per_s = f"{self.tiles / self.seconds:.1f}" if self.tiles else "-"
+        return (f"{self.name:<10} {self.images / self.seconds:>9.2f} {tiles_per_s:>9} "
+                f"{ratio(self.found, self.labels):>8} {ratio(self.small_found, self.small):>8} "
+                f"{ratio(self.tp, self.detections):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', required=True)
+    parser.add_argument('--data', required=True, help="data.yaml; the val split is used")
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--imgsz', type=int, default=None, help="whole-image size (default: training imgsz)")
+    parser.add_argument('--tile', type=int, default=TILE_SIZE)
+    parser.add_argument('--overlap', type=float, default=TILE_OVERLAP)
+    parser.add_argument('--tile-batch', type=int, default=16, help="tiles per forward pass")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--limit', type=int, default=0, help="first N images only (0 = all)")
+    args = parser.parse_args()
+
+    import cv2
+    from ultralytics import YOLO
+
+    images = list_images(load_data_yaml(args.data)[args.split])
+    if args.limit:
+        images = images[:args.limit]
+    model = YOLO(args.weights)
+    predict_args = {'conf': args.conf, 'verbose': False}
+    if args.imgsz:
+        predict_args['imgsz'] = args.imgsz
+    if args.device:
+        predict_args['device'] = args.device
+    model.predict(np.zeros((64, 64, 3), dtype=np.uint8), **predict_args)  # warmup
+
+    tallies = {name: Tally(name) for name in ('whole', 'tile-nms', 'tile-wbf')}
+    for path in images:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        labels = load_labels(path, image.shape[1], image.shape[0])
+
+        start = time.perf_counter()
+        result = model.predict(image, **predict_args)[0]
+        dets = result.boxes.data.cpu().numpy()[:, :6]
+        tallies['whole'].add(labels, dets, time.perf_counter() - start)
+
+        for merge in ('nms', 'wbf'):
+            start = time.perf_counter()
+            merged, tiles = predict_tiled(model, [image], args.tile, args.overlap, merge,
+                                          tile_batch=args.tile_batch, **predict_args)
+            tallies[f'tile-{merge}'].add(labels, merged[0], time.perf_counter() - start, tiles)
+
+    print(f"{len(images)} images, tile {args.tile} overlap {args.overlap}, conf {args.conf}, "
+          f"recall at IoU {MATCH_IOU} (small: < {int(SMALL_AREA ** 0.5)}x{int(SMALL_AREA ** 0.5)} px)")
+    print(f"{'mode':<10} {'images/s':>9} {'tiles/s':>9} {'recall':>8} {'small':>8} {'precision':>9}")
+    for tally in tallies.values():
+        if tally.images:
+            print(tally.row())
+
+
+if __name__ == "__main__":
+    main()
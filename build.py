@@ -20,10 +20,18 @@ OUTPUT_DIR = "dist"
 BUILD_DIR = "build"
 
 class YOLOTrainerBuilder:
-    def __init__(self):
+    def __init__(self, onedir=False):
         self.root_dir = Path(__file__).parent
         self.dist_dir = self.root_dir / OUTPUT_DIR
         self.build_dir = self.root_dir / BUILD_DIR
+        # onedir: không phải giải nén toàn bộ torch vào thư mục tạm mỗi lần mở app
+        self.onedir = onedir
+        
+    @property
+    def exe_path(self):
+        if self.onedir:
+            return self.dist_dir / "YOLOTrainingStudio" / "YOLOTrainingStudio.exe"
+        return self.dist_dir / "YOLOTrainingStudio.exe"
         
     def clean(self):
         """Xóa các thư mục build cũ"""
@@ -117,7 +125,7 @@ class YOLOTrainerBuilder:
         args = [
             'pyinstaller',
             '--name=YOLOTrainingStudio',
-            '--onefile',  # Single file
+            '--onedir' if self.onedir else '--onefile',
             '--windowed',  # No console window
             '--clean',
             f'--distpath={self.dist_dir}',
@@ -169,7 +177,10 @@ class YOLOTrainerBuilder:
         """Tạo Inno Setup script để build installer"""
         print("📝 Creating Inno Setup script...")
         
-        exe_path = self.dist_dir / "YOLOTrainingStudio.exe"
+        exe_path = self.exe_path
+        # onedir: cài cả thư mục (exe + _internal)
+        app_files = f"{exe_path.parent}\\*" if self.onedir else f"{exe_path}"
+        app_flags = "ignoreversion recursesubdirs createallsubdirs" if self.onedir else "ignoreversion"
         
         if not exe_path.exists():
             print("   ✗ Executable not found. Build exe first!")
@@ -218,7 +229,7 @@ Name: "desktopicon"; Description: "{{cm:CreateDesktopIcon}}"; GroupDescription:
 Name: "quicklaunchicon"; Description: "{{cm:CreateQuickLaunchIcon}}"; GroupDescription: "{{cm:AdditionalIcons}}"; Flags: unchecked; OnlyBelowVersion: 6.1; Check: not IsAdminInstallMode
 
 [Files]
-Source: "{exe_path}"; DestDir: "{{app}}"; Flags: ignoreversion
+Source: "{app_files}"; DestDir: "{{app}}"; Flags: {app_flags}
 Source: "{self.root_dir}\\requirements.txt"; DestDir: "{{app}}"; Flags: ignoreversion
 ; NOTE: Don't use "Flags: ignoreversion" on any shared system files
 
@@ -316,7 +327,7 @@ end;
         """Tạo phiên bản portable (ZIP)"""
         print("📦 Creating portable ZIP package...")
         
-        exe_path = self.dist_dir / "YOLOTrainingStudio.exe"
+        exe_path = self.exe_path
         
         if not exe_path.exists():
             print("   ✗ Executable not found!")
@@ -327,7 +338,10 @@ end;
         portable_dir.mkdir(parents=True, exist_ok=True)
         
         # Copy files
-        shutil.copy2(exe_path, portable_dir / "YOLOTrainingStudio.exe")
+        if self.onedir:
+            shutil.copytree(exe_path.parent, portable_dir, dirs_exist_ok=True)
+        else:
+            shutil.copy2(exe_path, portable_dir / "YOLOTrainingStudio.exe")
         shutil.copy2(self.root_dir / "requirements.txt", portable_dir / "requirements.txt")
         
         # Create README
@@ -406,7 +420,7 @@ For support, please visit: https://txtech.com
         print("\n" + "=" * 60)
         print("  BUILD SUMMARY")
         print("=" * 60)
-        print(f"✓ Executable: {self.dist_dir / 'YOLOTrainingStudio.exe'}")
+        print(f"✓ Executable: {self.exe_path}")
         
         if installer_success:
             print(f"✓ Installer: {self.root_dir / 'installer' / f'YOLOTrainingStudio_Setup_v{APP_VERSION}.exe'}")
@@ -425,11 +439,12 @@ For support, please visit: https://txtech.com
 
 def main():
     """Main build function"""
-    builder = YOLOTrainerBuilder()
+    args = [a for a in sys.argv[1:] if a != '--onedir']
+    builder = YOLOTrainerBuilder(onedir='--onedir' in sys.argv[1:])
     
     # Parse arguments
-    if len(sys.argv) > 1:
-        command = sys.argv[1].lower()
+    if args:
+        command = args[0].lower()
         
         if command == 'clean':
             builder.clean()
@@ -445,13 +460,14 @@ def main():
         else:
             print(f"Unknown command: {command}")
             print("\nUsage:")
-            print("  python build.py [command]")
+            print("  python build.py [command] [--onedir]")
             print("\nCommands:")
             print("  clean     - Clean build directories")
             print("  exe       - Build executable only")
             print("  installer - Build installer only")
             print("  portable  - Build portable ZIP only")
             print("  all       - Build everything (default)")
+            print("\n  --onedir  - Folder build instead of one file (faster app startup)")
     else:
         # Default: build all
         builder.build_all()
@@ -0,0 +1,186 @@
+"""
+Dataset Resize Cache
+Tạo bản sao dataset đã thu nhỏ (cạnh dài = max_side) để các lần training sau
+không phải decode ảnh 4K mỗi epoch. Label YOLO dạng chuẩn hóa nên giữ nguyên
+khi giữ tỷ lệ ảnh. Bản sao có data.yaml riêng và manifest để lần sau chỉ xử lý
+lại các ảnh nguồn đã thay đổi.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from dataset_scan import SPLITS, img2label_path, list_images, load_data_yaml
+
+MANIFEST_NAME = "manifest.json"
+JPEG_QUALITY = 95
+CHUNK_SIZE = 64
+
+
+@dataclass
+class ResizeResult:
+    yaml_path: str = ''
+    processed: int = 0
+    reused: int = 0
+    removed: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def cache_dir_for(yaml_path, max_side):
+    """data.yaml -> <dir>/data_resized_768/"""
+    yaml_path = Path(yaml_path)
+    return yaml_path.with_name(f"{yaml_path.stem}_resized_{max_side}")
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def resize_image(src, dst, max_side):
+    """Write `src` with its long side reduced to max_side (EXIF orientation applied)"""
+    from PIL import Image, ImageOps
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with Image.open(src) as im:
+        fmt = im.format
+        scale = max_side / max(im.size)
+        if scale >= 1 and (im.getexif().get(0x0112, 1) == 1):
+            # Đã đủ nhỏ và không cần xoay -> copy nguyên file
+            im.close()
+            shutil.copyfile(src, dst)
+            return
+        if fmt == 'JPEG' and scale < 1:
+            # Decoder JPEG tự giảm 1/2, 1/4, 1/8 khi decode -> nhanh hơn nhiều với ảnh 4K
+            im.draft('RGB', (int(im.width * scale) + 1, int(im.height * scale) + 1))
+        im = ImageOps.exif_transpose(im)
+        scale = max_side / max(im.size)
+        if scale < 1:
+            size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+            im = im.resize(size, Image.Resampling.LANCZOS)
+        if fmt == 'JPEG':
+            im.convert('RGB').save(dst, 'JPEG', quality=JPEG_QUALITY)
+        else:
+            im.save(dst, fmt)
+
+
+def _process_chunk(tasks, max_side):
+    """tasks: [(src_image, dst_image, src_label, dst_label)] -> [(dst_image, error)]"""
+    results = []
+    for src, dst, src_label, dst_label in tasks:
+        try:
+            resize_image(src, dst, max_side)
+            if os.path.exists(src_label):
+                os.makedirs(os.path.dirname(dst_label), exist_ok=True)
+                shutil.copyfile(src_label, dst_label)
+            elif os.path.exists(dst_label):
+                os.remove(dst_label)
+            results.append((dst, ''))
+        except Exception as e:
+            results.append((dst, f"{src}: {e}"))
+    return results
+
+
+def build_resized_dataset(yaml_path, max_side, out_dir=None, workers=None, progress=None):
+    """Create or update the resized copy of a dataset; returns a ResizeResult.
+
+    progress(done, total) is called from the calling thread after every chunk.
+    """
+    start = time.perf_counter()
+    data = load_data_yaml(yaml_path)
+    root = Path(data['path']).resolve()
+    out_dir = Path(out_dir) if out_dir else cache_dir_for(yaml_path, max_side)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = out_dir / MANIFEST_NAME
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    if manifest.get('max_side') != max_side:
+        manifest = {'max_side': max_side, 'files': {}}
+    old_files = manifest['files']
+
+    # Ảnh nguồn -> đường dẫn tương đối trong bản sao (giữ cấu trúc images/... để tìm label)
+    files, split_lists, tasks = {}, {}, []
+    for split in SPLITS:
+        if not data.get(split):
+            continue
+        rel_paths = []
+        for image in list_images(data[split]):
+            try:
+                rel = Path(image).resolve().relative_to(root).as_posix()
+            except ValueError:
+                # Ảnh ngoài root: thêm hash thư mục nguồn để hai ảnh cùng tên không ghi đè nhau
+                source = Path(image).resolve()
+                digest = hashlib.sha1(str(source.parent).encode('utf-8')).hexdigest()[:8]
+                rel = f"images/_external/{split}/{digest}_{source.name}"
+            rel_paths.append(rel)
+            label = img2label_path(image)
+            key = _source_key(image) + (_source_key(label) if os.path.exists(label) else [0, -1])
+            files[rel] = key
+            dst = str(out_dir / rel)
+            if old_files.get(rel) != key or not os.path.exists(dst):
+                tasks.append((image, dst, label, img2label_path(dst)))
+        split_lists[split] = rel_paths
+
+    result = ResizeResult(str(out_dir / "data.yaml"))
+    result.reused = len(files) - len(tasks)
+
+    # Xóa ảnh/label không còn trong dataset nguồn
+    for rel in set(old_files) - set(files):
+        for path in (out_dir / rel, Path(img2label_path(str(out_dir / rel)))):
+            if path.exists():
+                path.unlink()
+        result.removed += 1
+
+    chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    failed = set()
+    done = 0
+
+    def collect(chunk_results):
+        nonlocal done
+        for dst, error in chunk_results:
+            if error:
+                failed.add(dst)
+                result.errors.append(error)
+        done += len(chunk_results)
+        if progress:
+            progress(done, len(tasks))
+
+    workers = workers if workers is not None else min(os.cpu_count() or 1, 16)
+    if workers < 2 or len(chunks) < 2:
+        for chunk in chunks:
+            collect(_process_chunk(chunk, max_side))
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+            for chunk_results in executor.map(_process_chunk, chunks, [max_side] * len(chunks)):
+                collect(chunk_results)
+    result.processed = len(tasks) - len(failed)
+
+    # Manifest: file lỗi không được ghi để lần sau thử lại
+    manifest['files'] = {rel: key for rel, key in files.items() if str(out_dir / rel) not in failed}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+    # data.yaml mới: mỗi split là một file danh sách ảnh
+    import yaml
+    derived = {'path': str(out_dir), 'nc': data['nc'], 'names': data['names']}
+    for split, rel_paths in split_lists.items():
+        # Ảnh resize lỗi không có trong bản sao -> không liệt kê
+        with open(out_dir / f"{split}.txt", 'w', encoding='utf-8') as f:
+            f.writelines(f"./{rel}\n" for rel in rel_paths if str(out_dir / rel) not in failed)
+        derived[split] = f"{split}.txt"
+    with open(result.yaml_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(derived, f, sort_keys=False, allow_unicode=True)
+
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,120 @@
+"""
+Dataset Index
+Cache kết quả quét dataset (kích thước ảnh, số box theo class, lỗi label) trong
+một file SQLite cạnh data.yaml. Mỗi dòng gắn với mtime/size của ảnh và label,
+nên lần quét sau chỉ đọc lại các file đã thay đổi.
+"""
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+INDEX_SUFFIX = ".index.sqlite"
+# Tăng khi logic kiểm tra của dataset_scan thay đổi -> index cũ bị bỏ
+INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    split TEXT NOT NULL,
+    image TEXT NOT NULL,
+    image_mtime INTEGER, image_size INTEGER,
+    label_mtime INTEGER, label_size INTEGER,
+    width INTEGER, height INTEGER,
+    label_found INTEGER,
+    classes TEXT,
+    errors TEXT,
+    warnings TEXT,
+    PRIMARY KEY (split, image)
+);
+"""
+
+
+def index_path(yaml_path):
+    """data.yaml -> data.index.sqlite in the same directory"""
+    yaml_path = Path(yaml_path)
+    return yaml_path.with_name(yaml_path.stem + INDEX_SUFFIX)
+
+
+def file_key(image_path, label_path):
+    """(image mtime, image size, label mtime, label size); label -1 = missing"""
+    st = os.stat(image_path)
+    try:
+        lt = os.stat(label_path)
+        label = (lt.st_mtime_ns, lt.st_size)
+    except FileNotFoundError:
+        label = (0, -1)
+    return (st.st_mtime_ns, st.st_size) + label
+
+
+def _encode_classes(classes):
+    counts = {}
+    for c in classes:
+        counts[c] = counts.get(c, 0) + 1
+    return " ".join(f"{c}:{n}" for c, n in sorted(counts.items()))
+
+
+def _decode_classes(text):
+    classes = []
+    for item in text.split():
+        c, n = item.split(':')
+        classes.extend([int(c)] * int(n))
+    return classes
+
+
+def _encode_issues(issues):
+    # Đa số ảnh không có lỗi -> NULL, khỏi json.loads khi đọc lại
+    return json.dumps(issues) if issues else None
+
+
+def _decode_issues(text):
+    return [tuple(issue) for issue in json.loads(text)] if text else []
+
+
+class DatasetIndex:
+    """Per-image scan results of one dataset, keyed by file mtime/size"""
+
+    def __init__(self, yaml_path, nc):
+        self.path = index_path(yaml_path)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.executescript(_SCHEMA)
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        expected = {'version': str(INDEX_VERSION), 'nc': str(nc)}
+        if any(meta.get(k) != v for k, v in expected.items()):
+            # nc hoặc phiên bản thay đổi -> kết quả kiểm tra cũ không còn đúng
+            with self.conn:
+                self.conn.execute("DELETE FROM files")
+                self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", expected.items())
+
+    def load(self, split):
+        """{image: (key, (width, height, classes, label_found, errors, warnings))}"""
+        rows = self.conn.execute(
+            "SELECT image, image_mtime, image_size, label_mtime, label_size, width, height, "
+            "label_found, classes, errors, warnings FROM files WHERE split = ?", (split,))
+        cached = {}
+        for image, im_mtime, im_size, lb_mtime, lb_size, w, h, found, classes, errors, warnings in rows:
+            fields = (w, h, _decode_classes(classes), bool(found), _decode_issues(errors),
+                      _decode_issues(warnings))
+            cached[image] = ((im_mtime, im_size, lb_mtime, lb_size), fields)
+        return cached
+
+    def store(self, split, results, keys):
+        """Save fresh FileResults; keys maps image -> file_key() taken before the check"""
+        rows = [(split, r.image, *keys[r.image], r.width, r.height, int(r.label_found),
+                 _encode_classes(r.classes), _encode_issues(r.errors), _encode_issues(r.warnings))
+                for r in results]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def prune(self, split, images):
+        """Drop rows for images that no longer exist in the split"""
+        stale = [(split, image) for (image,) in
+                 self.conn.execute("SELECT image FROM files WHERE split = ?", (split,))
+                 if image not in images]
+        if stale:
+            with self.conn:
+                self.conn.executemany("DELETE FROM files WHERE split = ? AND image = ?", stale)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,388 @@
+"""
+Dataset Pre-flight Scanner
+Kiểm tra dataset YOLO (data.yaml) trước khi training: ảnh thiếu/hỏng, label sai
+định dạng, class id vượt nc, tọa độ ngoài [0, 1], box suy biến...
+Chạy song song bằng process pool, ảnh chỉ đọc header (không decode toàn bộ).
+"""
+
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import multiprocessing
+import sqlite3
+
+from dataset_index import DatasetIndex, file_key
+
+IMG_FORMATS = {'bmp', 'dng', 'jpeg', 'jpg', 'mpo', 'png', 'tif', 'tiff', 'webp', 'pfm', 'heic'}
+SPLITS = ('train', 'val', 'test')
+
+# Dưới ngưỡng này quét trong process hiện tại (chi phí spawn pool không đáng)
+MIN_FILES_FOR_POOL = 2000
+CHUNK_SIZE = 256
+# Số lỗi/cảnh báo giữ lại chi tiết cho mỗi split (vẫn đếm đủ)
+MAX_REPORTED_ISSUES = 200
+
+
+@dataclass
+class FileResult:
+    image: str
+    label: str
+    width: int = 0
+    height: int = 0
+    classes: list = field(default_factory=list)
+    label_found: bool = True
+    # (path, message)
+    errors: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+
+
+@dataclass
+class SplitReport:
+    name: str
+    images: int = 0
+    labels_found: int = 0
+    missing_labels: int = 0
+    empty_labels: int = 0
+    corrupt_images: int = 0
+    invalid_labels: int = 0
+    instances: int = 0
+    # Số ảnh lấy từ index (không phải đọc lại)
+    cached: int = 0
+    class_counts: Counter = field(default_factory=Counter)
+    error_count: int = 0
+    warning_count: int = 0
+    errors: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+
+    def add(self, result):
+        self.images += 1
+        if not result.label_found:
+            self.missing_labels += 1
+        else:
+            self.labels_found += 1
+            if not result.classes and not result.errors:
+                self.empty_labels += 1
+        self.instances += len(result.classes)
+        self.class_counts.update(result.classes)
+        if any(path == result.image for path, _ in result.errors):
+            self.corrupt_images += 1
+        if any(path == result.label for path, _ in result.errors):
+            self.invalid_labels += 1
+        self.error_count += len(result.errors)
+        self.warning_count += len(result.warnings)
+        self.errors.extend(result.errors[:MAX_REPORTED_ISSUES - len(self.errors)])
+        self.warnings.extend(result.warnings[:MAX_REPORTED_ISSUES - len(self.warnings)])
+
+
+@dataclass
+class DatasetReport:
+    yaml_path: str
+    nc: int = 0
+    names: list = field(default_factory=list)
+    splits: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def error_count(self):
+        return len(self.errors) + sum(s.error_count for s in self.splits.values())
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+    def summary_lines(self, max_issues=10):
+        cached = sum(s.cached for s in self.splits.values())
+        lines = [f"Dataset: {self.yaml_path} ({self.nc} classes, scanned in {self.seconds:.2f}s"
+                 + (f", {cached} images from index)" if cached else ")")]
+        lines += [f"✗ {message}" for message in self.errors]
+        for split in self.splits.values():
+            lines.append(f"{split.name}: {split.images} images, {split.instances} instances, "
+                         f"{split.missing_labels} missing labels, {split.empty_labels} empty, "
+                         f"{split.corrupt_images} corrupt images, {split.invalid_labels} invalid labels")
+            if split.class_counts:
+                counts = ", ".join(f"{self.class_name(c)}={n}" for c, n in sorted(split.class_counts.items()))
+                lines.append(f"  classes: {counts}")
+            for path, message in split.errors[:max_issues]:
+                lines.append(f"  ✗ {path}: {message}")
+            if split.error_count > max_issues:
+                lines.append(f"  ... {split.error_count - max_issues} more errors")
+            for path, message in split.warnings[:max_issues]:
+                lines.append(f"  ⚠ {path}: {message}")
+            if split.warning_count > max_issues:
+                lines.append(f"  ... {split.warning_count - max_issues} more warnings")
+        return lines
+
+    def class_name(self, class_id):
+        return self.names[class_id] if 0 <= class_id < len(self.names) else str(class_id)
+
+
+def load_data_yaml(yaml_path):
+    """Read data.yaml and resolve split paths the way ultralytics does"""
+    import yaml
+
+    yaml_path = Path(yaml_path)
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+
+    root = Path(data.get('path') or yaml_path.parent)
+    if not root.exists() and not root.is_absolute():
+        # Giống check_det_dataset: path tương đối không có trong thư mục hiện tại -> trong DATASETS_DIR
+        from ultralytics.utils import DATASETS_DIR
+        root = (DATASETS_DIR / root).resolve()
+
+    data['path'] = str(root)
+
+    names = data.get('names') or []
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    data['names'] = list(names)
+    data['nc'] = int(data.get('nc') or len(names))
+
+    for split in SPLITS:
+        value = data.get(split)
+        if not value:
+            continue
+        if isinstance(value, list):
+            data[split] = [str((root / p).resolve()) for p in map(str, value)]
+            continue
+        path = (root / str(value)).resolve()
+        # Export kiểu Roboflow: "train: ../train/images" với yaml nằm ngay trong thư mục dataset
+        if not path.exists() and str(value).startswith('../'):
+            path = (root / str(value)[3:]).resolve()
+        data[split] = [str(path)]
+    return data
+
+
+def img2label_path(image_path):
+    """/data/images/train/a.jpg -> /data/labels/train/a.txt"""
+    sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    return sb.join(image_path.rsplit(sa, 1)).rsplit('.', 1)[0] + '.txt'
+
+
+def _walk_images(directory):
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=True):
+                    stack.append(entry.path)
+                elif entry.name.rsplit('.', 1)[-1].lower() in IMG_FORMATS:
+                    yield entry.path
+
+
+def list_images(sources):
+    """Image files of a split given as directories and/or .txt file lists"""
+    images = []
+    for source in sources:
+        if os.path.isdir(source):
+            images.extend(_walk_images(source))
+        elif os.path.isfile(source) and source.endswith('.txt'):
+            parent = os.path.dirname(source)
+            with open(source, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        images.append(line if os.path.isabs(line) else os.path.normpath(os.path.join(parent, line)))
+        elif os.path.isfile(source):
+            images.append(source)
+        else:
+            raise FileNotFoundError(source)
+    return sorted(images)
+
+
+def _check_image(path, result):
+    from PIL import Image
+
+    try:
+        with Image.open(path) as im:
+            # Image.open chỉ đọc header, chưa decode pixel
+            width, height = im.size
+            fmt = (im.format or '').lower()
+    except FileNotFoundError:
+        result.errors.append((path, "image not found"))
+        return
+    except Exception as e:
+        result.errors.append((path, f"unreadable image: {e}"))
+        return
+    if width < 10 or height < 10:
+        result.errors.append((path, f"image size {width}x{height} < 10 pixels"))
+        return
+    if fmt == 'jpeg':
+        with open(path, 'rb') as f:
+            f.seek(-2, 2)
+            if f.read() != b'\xff\xd9':
+                result.warnings.append((path, "truncated JPEG (missing end marker)"))
+    result.width, result.height = width, height
+
+
+def _check_label(path, nc, result):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        result.label_found = False
+        return
+    except (OSError, UnicodeDecodeError) as e:
+        result.errors.append((path, f"unreadable label: {e}"))
+        return
+
+    seen = set()
+    for number, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        where = f"line {number}"
+        try:
+            values = [float(v) for v in parts]
+        except ValueError:
+            result.errors.append((path, f"{where}: non-numeric value"))
+            continue
+        cls, coords = values[0], values[1:]
+        if cls != int(cls) or not 0 <= cls < nc:
+            result.errors.append((path, f"{where}: class id {parts[0]} outside [0, {nc - 1}]"))
+            continue
+        if len(coords) != 4 and (len(coords) < 6 or len(coords) % 2):
+            result.errors.append((path, f"{where}: expected 5 values (class x y w h), got {len(parts)}"))
+            continue
+        if min(coords) < 0 or max(coords) > 1:
+            result.errors.append((path, f"{where}: coordinates not normalized to [0, 1]"))
+            continue
+        if len(coords) == 4:
+            degenerate = coords[2] <= 0 or coords[3] <= 0
+        else:
+            xs, ys = coords[0::2], coords[1::2]
+            degenerate = max(xs) - min(xs) <= 0 or max(ys) - min(ys) <= 0
+        if degenerate:
+            result.errors.append((path, f"{where}: degenerate box (zero width or height)"))
+            continue
+        key = tuple(values)
+        if key in seen:
+            result.warnings.append((path, f"{where}: duplicate row"))
+            continue
+        seen.add(key)
+        result.classes.append(int(cls))
+
+
+def check_file(image_path, nc):
+    """Validate one image and its label file"""
+    result = FileResult(image_path, img2label_path(image_path))
+    _check_image(image_path, result)
+    _check_label(result.label, nc, result)
+    return result
+
+
+def _check_chunk(image_paths, nc):
+    return [check_file(path, nc) for path in image_paths]
+
+
+def check_files(image_paths, nc, workers=None):
+    """check_file() over many images, in a process pool when the list is large"""
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 16)
+    if len(image_paths) < MIN_FILES_FOR_POOL or workers < 2:
+        return _check_chunk(image_paths, nc)
+    chunks = [image_paths[i:i + CHUNK_SIZE] for i in range(0, len(image_paths), CHUNK_SIZE)]
+    # spawn: an toàn khi gọi từ thread của giao diện Tk
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        results = []
+        for chunk_results in executor.map(_check_chunk, chunks, [nc] * len(chunks)):
+            results.extend(chunk_results)
+        return results
+
+
+def _scan_split(images, nc, workers, index, split):
+    """FileResults of one split, re-checking only files changed since the index was written"""
+    if index is None:
+        return check_files(images, nc, workers), 0
+    cached = index.load(split)
+    results, todo, keys = [], [], {}
+    for image in images:
+        try:
+            key = file_key(image, img2label_path(image))
+        except OSError:
+            key = None
+        entry = cached.get(image)
+        if key is not None and entry is not None and entry[0] == key:
+            results.append(FileResult(image, img2label_path(image), *entry[1]))
+        else:
+            todo.append(image)
+            if key is not None:
+                keys[image] = key
+    fresh = check_files(todo, nc, workers)
+    index.store(split, [r for r in fresh if r.image in keys], keys)
+    index.prune(split, set(images))
+    return results + fresh, len(results)
+
+
+def scan_dataset(yaml_path, workers=None, use_index=True):
+    """Scan every split of a data.yaml and return a DatasetReport.
+
+    With use_index, per-image results are cached in <yaml>.index.sqlite and
+    only files whose mtime/size changed are read again.
+    """
+    start = time.perf_counter()
+    report = DatasetReport(str(yaml_path))
+    try:
+        data = load_data_yaml(yaml_path)
+    except Exception as e:
+        report.errors.append(f"Cannot read {yaml_path}: {e}")
+        return report
+    report.nc, report.names = data['nc'], data['names']
+    if not report.nc:
+        report.errors.append("data.yaml defines no classes (nc / names)")
+        return report
+
+    if data.get('packed'):
+        # Dataset dạng shard đã được kiểm tra lúc đóng gói: chỉ đọc thống kê từ index
+        from dataset_pack import pack_summary
+        try:
+            summary = pack_summary(yaml_path)
+        except (OSError, ValueError, KeyError) as e:
+            report.errors.append(f"Cannot read packed dataset: {e}")
+            summary = {}
+        for split, (images, instances, counts) in summary.items():
+            report.splits[split] = SplitReport(
+                split, images=images, labels_found=images, instances=instances, cached=images,
+                class_counts=Counter({c: int(n) for c, n in enumerate(counts) if n}))
+        report.seconds = time.perf_counter() - start
+        return report
+
+    index = None
+    if use_index:
+        try:
+            index = DatasetIndex(yaml_path, report.nc)
+        except sqlite3.Error:
+            # Thư mục dataset chỉ đọc: quét bình thường, không cache
+            index = None
+
+    for split in SPLITS:
+        if not data.get(split):
+            if split != 'test':
+                report.errors.append(f"data.yaml has no '{split}' split")
+            continue
+        try:
+            images = list_images(data[split])
+        except FileNotFoundError as e:
+            report.errors.append(f"{split}: path not found: {e}")
+            continue
+        split_report = SplitReport(split)
+        try:
+            results, split_report.cached = _scan_split(images, report.nc, workers, index, split)
+        except sqlite3.Error:
+            index = None
+            results = check_files(images, report.nc, workers)
+        for result in results:
+            split_report.add(result)
+        if not images:
+            report.errors.append(f"{split}: no images found in {', '.join(data[split])}")
+        report.splits[split] = split_report
+
+    if index is not None:
+        index.close()
+    report.seconds = time.perf_counter() - start
+    return report
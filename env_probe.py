@@ -0,0 +1,83 @@
+"""
+Environment Probe
+Kiểm tra môi trường mà không import torch/ultralytics vào process giao diện:
+- quick_probe(): find_spec + version metadata, chỉ vài mili giây
+- deep_check(): kiểm tra CUDA trong một process riêng (import torch ở đó)
+"""
+
+import importlib.metadata
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+# (tên hiển thị, module import, các distribution có thể cung cấp module)
+PACKAGES = (
+    ('ultralytics', 'ultralytics', ('ultralytics',)),
+    ('torch', 'torch', ('torch',)),
+    ('torchvision', 'torchvision', ('torchvision',)),
+    ('opencv-python', 'cv2', ('opencv-python', 'opencv-python-headless',
+                              'opencv-contrib-python', 'opencv-contrib-python-headless')),
+    ('numpy', 'numpy', ('numpy',)),
+)
+
+
+@dataclass
+class PackageInfo:
+    name: str
+    module: str
+    installed: bool
+    version: str = ''
+
+
+@dataclass
+class CudaInfo:
+    torch_version: str = ''
+    cuda_available: bool = False
+    cuda_version: str = ''
+    devices: list = field(default_factory=list)
+    error: str = ''
+
+
+def probe_package(name, module, distributions=()):
+    """Check one package without importing it"""
+    try:
+        installed = importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        installed = False
+    version = ''
+    if installed:
+        for dist in distributions or (name,):
+            try:
+                version = importlib.metadata.version(dist)
+                break
+            except importlib.metadata.PackageNotFoundError:
+                continue
+    return PackageInfo(name, module, installed, version)
+
+
+def quick_probe(packages=PACKAGES):
+    return [probe_package(*package) for package in packages]
+
+
+def _cuda_info():
+    """Runs in the deep-check process"""
+    try:
+        import torch
+    except Exception as e:
+        return CudaInfo(error=f"{type(e).__name__}: {e}")
+    info = CudaInfo(torch_version=torch.__version__, cuda_version=torch.version.cuda or '')
+    try:
+        info.cuda_available = torch.cuda.is_available()
+        if info.cuda_available:
+            info.devices = [torch.cuda.get_device_name(i) for i in range(torch.cuda.device_count())]
+    except Exception as e:
+        info.error = f"{type(e).__name__}: {e}"
+    return info
+
+
+def deep_check():
+    """Import torch in a spawned process and report CUDA availability"""
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        return executor.submit(_cuda_info).result()
@@ -0,0 +1,206 @@
+"""
+Image Viewer
+Cửa sổ xem ảnh trong app (thay cho os.startfile): zoom bằng con lăn, kéo để di
+chuyển, mũi tên trái/phải để chuyển ảnh. Ảnh đã decode được giữ lại (LRU) và
+được vẽ theo từng tile; tile đã render ở một mức zoom được dùng lại khi kéo.
+"""
+
+import math
+import os
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+TILE_SIZE = 256
+# Số tile đã render giữ lại cho mỗi ảnh
+MAX_TILES = 192
+# Số ảnh đã decode giữ lại khi chuyển qua lại giữa các ảnh
+MAX_DECODED = 3
+MIN_ZOOM, MAX_ZOOM, ZOOM_STEP = 0.02, 8.0, 1.25
+
+_decoded = OrderedDict()
+
+
+class TiledImage:
+    """A decoded image rendered in TILE_SIZE tiles, with an LRU of converted tiles.
+
+    convert turns a rendered PIL tile into what the caller draws (e.g.
+    ImageTk.PhotoImage); cached tiles are returned as converted.
+    """
+
+    def __init__(self, path, convert=lambda tile: tile):
+        from PIL import Image, ImageOps
+
+        with Image.open(path) as im:
+            im = ImageOps.exif_transpose(im)
+            im.load()
+        self.image = im if im.mode in ('RGB', 'RGBA') else im.convert('RGB')
+        self.width, self.height = self.image.size
+        self.convert = convert
+        self._reduced = {1: self.image}
+        self._tiles = OrderedDict()
+
+    def _source(self, zoom):
+        """(image, scale): a 1/2^k reduced copy when zoomed out, so tiles resize less"""
+        factor = 1
+        while factor * 2 * zoom <= 1 and min(self.width, self.height) // (factor * 2) >= 16:
+            factor *= 2
+        if factor not in self._reduced:
+            self._reduced[factor] = self.image.reduce(factor)
+        return self._reduced[factor], zoom * factor
+
+    def tile(self, zoom, tx, ty):
+        key = (zoom, tx, ty)
+        cached = self._tiles.get(key)
+        if cached is not None:
+            self._tiles.move_to_end(key)
+            return cached
+        from PIL import Image
+
+        source, scale = self._source(zoom)
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        x1 = min(x0 + TILE_SIZE, math.ceil(self.width * zoom))
+        y1 = min(y0 + TILE_SIZE, math.ceil(self.height * zoom))
+        box = (x0 / scale, y0 / scale, min(x1 / scale, source.width), min(y1 / scale, source.height))
+        resample = Image.Resampling.NEAREST if scale >= 2 else Image.Resampling.BILINEAR
+        rendered = source.resize((max(1, x1 - x0), max(1, y1 - y0)), resample, box=box)
+        tile = self.convert(rendered)
+        self._tiles[key] = tile
+        if len(self._tiles) > MAX_TILES:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def tile_range(self, zoom, left, top, right, bottom):
+        """Tile indexes covering the image-space rectangle [left, right) x [top, bottom)"""
+        cols = math.ceil(self.width * zoom / TILE_SIZE)
+        rows = math.ceil(self.height * zoom / TILE_SIZE)
+        tx0, ty0 = max(0, int(left // TILE_SIZE)), max(0, int(top // TILE_SIZE))
+        tx1, ty1 = min(cols, int(right // TILE_SIZE) + 1), min(rows, int(bottom // TILE_SIZE) + 1)
+        return [(tx, ty) for ty in range(ty0, ty1) for tx in range(tx0, tx1)]
+
+
+def open_tiled(path, convert):
+    """TiledImage for path, reusing a recently decoded one if the file is unchanged"""
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    image = _decoded.get(key)
+    if image is None:
+        image = TiledImage(path, convert)
+        _decoded[key] = image
+        if len(_decoded) > MAX_DECODED:
+            _decoded.popitem(last=False)
+    _decoded.move_to_end(key)
+    return image
+
+
+class ImageViewer(tk.Toplevel):
+    """Zoomable, pannable viewer for a list of images"""
+
+    def __init__(self, master, paths, index=0, colors=None):
+        super().__init__(master)
+        self.paths = list(paths)
+        self.index = index
+        colors = colors or {}
+        self.configure(bg=colors.get('bg_dark', '#1e1e2e'))
+        self.geometry("1100x800")
+
+        self.canvas = tk.Canvas(self, bg=colors.get('bg_dark', '#1e1e2e'), highlightthickness=0)
+        self.canvas.pack(fill='both', expand=True)
+        self.status = ttk.Label(self, text="")
+        self.status.pack(fill='x', padx=10, pady=4)
+
+        self.image = None
+        self.zoom = 1.0
+        self.fit = True
+        self.origin = (0.0, 0.0)  # tọa độ canvas của góc trên-trái ảnh
+        self._drag = None
+        self._render_job = None
+
+        self.canvas.bind('<Configure>', lambda e: self.schedule_render())
+        self.canvas.bind('<MouseWheel>', lambda e: self.zoom_at(e.x, e.y, ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP))
+        self.canvas.bind('<Button-4>', lambda e: self.zoom_at(e.x, e.y, ZOOM_STEP))
+        self.canvas.bind('<Button-5>', lambda e: self.zoom_at(e.x, e.y, 1 / ZOOM_STEP))
+        self.canvas.bind('<ButtonPress-1>', self.start_drag)
+        self.canvas.bind('<B1-Motion>', self.drag)
+        self.bind('<Left>', lambda e: self.show(self.index - 1))
+        self.bind('<Right>', lambda e: self.show(self.index + 1))
+        self.bind('f', lambda e: self.fit_to_window())
+        self.bind('1', lambda e: self.zoom_at(self.canvas.winfo_width() / 2, self.canvas.winfo_height() / 2,
+                                              1 / self.zoom))
+        self.bind('<Escape>', lambda e: self.destroy())
+        self.focus_set()
+        self.show(index)
+
+    def show(self, index):
+        if not self.paths:
+            return
+        from PIL import ImageTk
+
+        self.index = index % len(self.paths)
+        path = self.paths[self.index]
+        try:
+            self.image = open_tiled(path, ImageTk.PhotoImage)
+        except Exception as e:
+            self.image = None
+            self.canvas.delete('all')
+            self.status.config(text=f"✗ {os.path.basename(path)}: {e}")
+            return
+        self.title(os.path.basename(path))
+        self.fit = True
+        self.schedule_render()
+
+    def fit_to_window(self):
+        self.fit = True
+        self.schedule_render()
+
+    def _apply_fit(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        zoom = min(width / self.image.width, height / self.image.height, 1.0)
+        self.zoom = round(max(MIN_ZOOM, zoom), 4)
+        self.origin = ((width - self.image.width * self.zoom) / 2, (height - self.image.height * self.zoom) / 2)
+
+    def zoom_at(self, x, y, factor):
+        if self.image is None:
+            return
+        zoom = round(min(MAX_ZOOM, max(MIN_ZOOM, self.zoom * factor)), 4)
+        # Giữ điểm ảnh dưới con trỏ đứng yên
+        ox, oy = self.origin
+        self.origin = (x - (x - ox) * zoom / self.zoom, y - (y - oy) * zoom / self.zoom)
+        self.zoom = zoom
+        self.fit = False
+        self.schedule_render()
+
+    def start_drag(self, event):
+        self._drag = (event.x, event.y)
+
+    def drag(self, event):
+        if self._drag is None:
+            return
+        dx, dy = event.x - self._drag[0], event.y - self._drag[1]
+        self._drag = (event.x, event.y)
+        self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+        self.fit = False
+        self.schedule_render()
+
+    def schedule_render(self):
+        # Gộp nhiều sự kiện (kéo, con lăn) thành một lần vẽ
+        if self._render_job is None:
+            self._render_job = self.after_idle(self.render)
+
+    def render(self):
+        self._render_job = None
+        if self.image is None:
+            return
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width < 2 or height < 2:
+            return
+        if self.fit:
+            self._apply_fit()
+        ox, oy = self.origin
+        self.canvas.delete('tile')
+        # Chỉ render các tile nằm trong vùng nhìn thấy
+        for tx, ty in self.image.tile_range(self.zoom, -ox, -oy, width - ox, height - oy):
+            self.canvas.create_image(ox + tx * TILE_SIZE, oy + ty * TILE_SIZE, anchor='nw',
+                                     image=self.image.tile(self.zoom, tx, ty), tags='tile')
+        self.status.config(text=f"{self.index + 1}/{len(self.paths)}  {os.path.basename(self.paths[self.index])}  "
+                                f"{self.image.width}x{self.image.height}  {self.zoom:.0%}   "
+                                f"(wheel: zoom, drag: pan, ←/→: previous/next, f: fit, 1: 100%)")
@@ -0,0 +1,445 @@
+"""
+Inference Pipeline
+Chạy một file weights trên thư mục ảnh hoặc video theo pipeline 3 stage nối
+bằng queue có giới hạn: decode/prefetch (nhiều thread) -> forward theo batch
+-> vẽ box, ghi ảnh/video và predictions.jsonl (thread riêng). Mỗi stage đo
+thời gian bận của nó nên thấy được stage nào là nút thắt (frames/s).
+Chạy trong process riêng.
+"""
+
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+
+from dataset_scan import IMG_FORMATS, list_images
+from model_export import Exporter
+from tiled_inference import TILE_OVERLAP, predict_tiled, to_results
+from training_log import next_run_dir
+
+VIDEO_FORMATS = {'mp4', 'avi', 'mov', 'mkv', 'webm', 'm4v', 'mpg', 'mpeg', 'wmv'}
+DEFAULT_BATCH = 8
+DECODE_THREADS = min(4, os.cpu_count() or 1)
+# Số batch chờ giữa 2 stage; queue đầy = stage sau là nút thắt
+QUEUE_BATCHES = 2
+PROGRESS_INTERVAL_S = 1.0
+PREDICTIONS_NAME = "predictions.jsonl"
+PREDICT_PROJECT = "runs/detect"
+
+
+@dataclass
+class InferenceSettings:
+    weights: str
+    # Thư mục ảnh, một ảnh hoặc một file video
+    source: str
+    # Mặc định: runs/detect/predict, predict2, ...
+    out_dir: str = ''
+    # 0 = imgsz lúc train của weights
+    imgsz: int = 0
+    conf: float = 0.25
+    iou: float = 0.7
+    batch: int = DEFAULT_BATCH
+    device: str = ''
+    decode_threads: int = DECODE_THREADS
+    save_images: bool = True
+    save_json: bool = True
+    # 0 = tất cả
+    max_frames: int = 0
+    # Ảnh lớn (4K): cắt thành tile chồng lấn, 0 = tắt
+    tile_size: int = 0
+    tile_overlap: float = TILE_OVERLAP
+    # 'nms' hoặc 'wbf' để gộp box ở biên tile
+    tile_merge: str = 'nms'
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int = 1
+    frames: int = 0
+    # Tổng thời gian bận của các thread trong stage
+    busy_s: float = 0.0
+    # Số frame/s stage này xử lý được nếu không phải chờ stage khác
+    fps: float = 0.0
+
+
+@dataclass
+class InferenceProgress:
+    frames: int
+    total: int = 0
+    fps: float = 0.0
+    stages: list = field(default_factory=list)
+
+
+@dataclass
+class InferenceResult:
+    out_dir: str = ''
+    frames: int = 0
+    skipped: int = 0
+    # Tổng số tile đã forward (chế độ tile)
+    tiles: int = 0
+    seconds: float = 0.0
+    fps: float = 0.0
+    stages: list = field(default_factory=list)
+    bottleneck: str = ''
+    json_path: str = ''
+    stopped: bool = False
+    error: str = ''
+
+
+@dataclass
+class _Frame:
+    index: int
+    # Đường dẫn tương đối (ảnh) hoặc tên video
+    name: str
+    image: object
+
+
+class _StageTimer:
+    """Thread-safe busy time and frame count of one stage"""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.frames = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, frames, seconds):
+        with self._lock:
+            self.frames += frames
+            self.busy += seconds
+
+    def stats(self):
+        with self._lock:
+            fps = self.frames * self.workers / self.busy if self.busy > 0 else 0.0
+            return StageStats(self.name, self.workers, self.frames, self.busy, fps)
+
+
+def is_video(path):
+    return os.path.isfile(path) and path.rsplit('.', 1)[-1].lower() in VIDEO_FORMATS
+
+
+def list_source(source):
+    """('video', [path]) or ('images', [paths]) for a folder, image or video file"""
+    if is_video(source):
+        return 'video', [source]
+    if os.path.isdir(source):
+        return 'images', list_images([source])
+    if os.path.isfile(source) and source.rsplit('.', 1)[-1].lower() in IMG_FORMATS:
+        return 'images', [source]
+    raise FileNotFoundError(f"Not an image folder, image or video: {source}")
+
+
+def video_info(path):
+    """(frame count, fps) of a video, 0 when unknown"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), float(cap.get(cv2.CAP_PROP_FPS) or 0)
+    finally:
+        cap.release()
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up when the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _decode_images(paths, root, frames, timer, stop, max_frames, skipped):
+    import cv2
+
+    # Các thread decode lấy index từ cùng một iterator
+    lock = threading.Lock()
+    items = iter(enumerate(paths[:max_frames] if max_frames else paths))
+
+    def work():
+        while not stop.is_set():
+            with lock:
+                item = next(items, None)
+            if item is None:
+                return
+            index, path = item
+            start = time.perf_counter()
+            image = cv2.imread(path)
+            timer.add(1, time.perf_counter() - start)
+            if image is None:
+                skipped.append(path)
+                continue
+            name = os.path.relpath(path, root) if root else os.path.basename(path)
+            if not _put(frames, _Frame(index, name, image), stop):
+                return
+
+    return [threading.Thread(target=work, name=f"decode-{i}", daemon=True) for i in range(timer.workers)]
+
+
+def _decode_video(path, frames, timer, stop, max_frames):
+    import cv2
+
+    def work():
+        cap = cv2.VideoCapture(path)
+        name = os.path.basename(path)
+        index = 0
+        try:
+            while not stop.is_set() and (not max_frames or index < max_frames):
+                start = time.perf_counter()
+                ok, image = cap.read()
+                if not ok:
+                    return
+                timer.add(1, time.perf_counter() - start)
+                if not _put(frames, _Frame(index, name, image), stop):
+                    return
+                index += 1
+        finally:
+            cap.release()
+
+    return [threading.Thread(target=work, name="decode-video", daemon=True)]
+
+
+def detections(result):
+    """JSON-friendly boxes of one ultralytics Results"""
+    boxes = result.boxes
+    if boxes is None or not len(boxes):
+        return []
+    xyxy = boxes.xyxy.cpu().numpy().astype(float).round(1).tolist()
+    conf = boxes.conf.cpu().numpy().astype(float).round(4).tolist()
+    cls = boxes.cls.cpu().numpy().astype(int).tolist()
+    return [{'class': c, 'name': result.names.get(c, str(c)), 'conf': p, 'xyxy': b}
+            for b, p, c in zip(xyxy, conf, cls)]
+
+
+class _Writer:
+    """Annotated images / video and predictions.jsonl"""
+
+    def __init__(self, settings, out_dir, kind, video_fps):
+        self.settings = settings
+        self.out_dir = out_dir
+        self.kind = kind
+        self.video_fps = video_fps or 25.0
+        self.video = None
+        self.json_path = os.path.join(out_dir, PREDICTIONS_NAME) if settings.save_json else ''
+        self.json_file = open(self.json_path, 'w', encoding='utf-8') if self.json_path else None
+
+    def write(self, frame, result):
+        import cv2
+
+        if self.settings.save_images:
+            annotated = result.plot()
+            if self.kind == 'video':
+                if self.video is None:
+                    h, w = annotated.shape[:2]
+                    path = os.path.join(self.out_dir, os.path.splitext(frame.name)[0] + '.mp4')
+                    self.video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), self.video_fps, (w, h))
+                self.video.write(annotated)
+            else:
+                path = os.path.join(self.out_dir, frame.name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                cv2.imwrite(path, annotated)
+        if self.json_file:
+            record = {'source': frame.name, 'frame': frame.index, 'detections': detections(result)}
+            self.json_file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+        if self.json_file:
+            self.json_file.close()
+
+
+def run_inference(settings, on_progress=None, stop=None):
+    """Run the decode -> forward -> write pipeline; returns an InferenceResult"""
+    import numpy as np
+    from ultralytics import YOLO
+
+    stop = stop or threading.Event()
+    result = InferenceResult()
+    if not settings.weights or not os.path.isfile(settings.weights):
+        result.error = f"Weights not found: {settings.weights or '(none)'}"
+        return result
+    kind, paths = list_source(settings.source)
+    if kind == 'video':
+        total, video_fps = video_info(paths[0])
+    else:
+        total, video_fps = len(paths), 0.0
+    if settings.max_frames:
+        total = min(total, settings.max_frames) if total else settings.max_frames
+    out_dir = settings.out_dir or str(next_run_dir(PREDICT_PROJECT, "predict"))
+    os.makedirs(out_dir, exist_ok=True)
+    result.out_dir = out_dir
+
+    batch = max(1, settings.batch)
+    frames = queue.Queue(maxsize=batch * QUEUE_BATCHES)
+    batches = queue.Queue(maxsize=QUEUE_BATCHES)
+    decode = _StageTimer('decode', 1 if kind == 'video' else max(1, settings.decode_threads))
+    forward = _StageTimer('forward')
+    write = _StageTimer('write')
+    skipped, errors = [], []
+
+    model = YOLO(settings.weights)
+    predict_args = {'conf': settings.conf, 'iou': settings.iou, 'verbose': False}
+    if settings.imgsz:
+        predict_args['imgsz'] = settings.imgsz
+    if settings.device:
+        predict_args['device'] = settings.device
+
+    if kind == 'video':
+        decoders = _decode_video(paths[0], frames, decode, stop, settings.max_frames)
+    else:
+        root = settings.source if os.path.isdir(settings.source) else ''
+        decoders = _decode_images(paths, root, frames, decode, stop, settings.max_frames, skipped)
+    writer = _Writer(settings, out_dir, kind, video_fps)
+
+    def decode_all():
+        for thread in decoders:
+            thread.start()
+        for thread in decoders:
+            thread.join()
+        _put(frames, None, stop)
+
+    def write_all():
+        try:
+            while True:
+                item = batches.get()
+                if item is None:
+                    return
+                start = time.perf_counter()
+                for frame, prediction in zip(*item):
+                    writer.write(frame, prediction)
+                write.add(len(item[0]), time.perf_counter() - start)
+        except Exception:
+            errors.append(traceback.format_exc())
+            stop.set()
+        finally:
+            writer.close()
+
+    def put_batch(item):
+        # Writer luôn đọc đến None (trừ khi đã lỗi) nên batch đã forward không bị bỏ khi dừng
+        while write_thread.is_alive():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # Warmup trước khi đo: lần forward đầu gồm cả fuse/khởi tạo model
+    model.predict(np.zeros((64, 64, 3), dtype=np.uint8), **predict_args)
+    start = time.perf_counter()
+    decode_thread = threading.Thread(target=decode_all, name="decode", daemon=True)
+    write_thread = threading.Thread(target=write_all, name="write", daemon=True)
+    decode_thread.start()
+    write_thread.start()
+
+    last_report = start
+    done = False
+    try:
+        while not done and not stop.is_set():
+            try:
+                item = frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            # Gom thêm các frame đã decode sẵn, tối đa batch
+            group = [item]
+            while len(group) < batch:
+                try:
+                    item = frames.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                group.append(item)
+            forward_start = time.perf_counter()
+            if settings.tile_size:
+                # Tile của cả nhóm frame đi chung các batch forward
+                merged, tiles = predict_tiled(model, [f.image for f in group], settings.tile_size,
+                                              settings.tile_overlap, settings.tile_merge,
+                                              tile_batch=batch, **predict_args)
+                predictions = [to_results(f.image, dets, model.names, f.name) for f, dets in zip(group, merged)]
+                result.tiles += tiles
+            else:
+                predictions = model.predict([f.image for f in group], **predict_args)
+            forward.add(len(group), time.perf_counter() - forward_start)
+            if not put_batch((group, predictions)):
+                break
+            now = time.perf_counter()
+            if on_progress and now - last_report >= PROGRESS_INTERVAL_S:
+                last_report = now
+                on_progress(InferenceProgress(forward.frames, total, forward.frames / (now - start),
+                                              [s.stats() for s in (decode, forward, write)]))
+    finally:
+        result.stopped = stop.is_set() and not errors
+        # Dừng giữa chừng: bỏ các frame còn chờ decode nhưng vẫn ghi nốt batch đã forward
+        stop.set()
+        put_batch(None)
+        write_thread.join()
+        decode_thread.join()
+
+    result.seconds = time.perf_counter() - start
+    result.frames = write.frames
+    result.skipped = len(skipped)
+    result.fps = result.frames / result.seconds if result.seconds > 0 else 0.0
+    result.stages = [s.stats() for s in (decode, forward, write)]
+    measured = [s for s in result.stages if s.frames]
+    if measured:
+        result.bottleneck = min(measured, key=lambda s: s.fps).name
+    result.json_path = writer.json_path
+    if errors:
+        result.error = errors[0]
+    return result
+
+
+def format_stages(result):
+    """Plain-text per-stage throughput, bottleneck marked"""
+    lines = [f"{'stage':<8} {'workers':>7} {'frames':>7} {'busy s':>8} {'fps':>8}"]
+    for s in result.stages:
+        mark = "  ← bottleneck" if s.name == result.bottleneck else ""
+        lines.append(f"{s.name:<8} {s.workers:>7} {s.frames:>7} {s.busy_s:>8.2f} {s.fps:>8.1f}{mark}")
+    return "\n".join(lines)
+
+
+def _inference_main(conn, settings, stop):
+    # Ctrl+C của CLI được xử lý ở process cha (request_stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    try:
+        result = run_inference(settings, conn.send, stop)
+    except BaseException:
+        result = InferenceResult(error=traceback.format_exc())
+    conn.send(result)
+    conn.close()
+
+
+class Inferencer(Exporter):
+    """Runs run_inference() in a spawned process.
+
+    on_message receives InferenceProgress messages and finally one
+    InferenceResult. request_stop() finishes the frames already forwarded
+    and closes the outputs; stop() terminates the process.
+    """
+
+    target = staticmethod(_inference_main)
+    result_type = InferenceResult
+    name = "inference"
+
+    def process_args(self, ctx):
+        self._stop_event = ctx.Event()
+        return (self._stop_event,)
+
+    def request_stop(self):
+        if self.is_alive():
+            self._stop_event.set()
@@ -0,0 +1,263 @@
+"""
+Job Queue
+Hàng đợi nhiều job training, chạy tuần tự hoặc song song theo số slot,
+tự phân bổ device/workers cho từng job để không tranh chấp CPU
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from metrics_parser import EpochStart, BatchProgress, ValMetrics
+from run_catalog import resumable_checkpoint
+from training_backend import (TrainingJob, TrainingWorker, LogOutput, TrainingFinished,
+                              build_train_args, resume_job)
+from training_log import ConsoleLineSplitter, LogSpool, next_run_dir
+
+QUEUED, RUNNING, DONE, FAILED, STOPPED = 'queued', 'running', 'done', 'failed', 'stopped'
+
+_job_ids = itertools.count(1)
+
+
+@dataclass
+class QueuedJob:
+    name: str
+    model: str
+    dataset: str
+    params: dict = field(default_factory=dict)
+    bool_params: dict = field(default_factory=dict)
+    project: str = "runs/detect"
+    job_id: int = field(default_factory=lambda: next(_job_ids))
+    status: str = QUEUED
+    device: str = ''
+    workers: int = 0
+    epoch: int = 0
+    epochs: int = 0
+    best_map50_95: float = None
+    eta_seconds: float = None
+    run_dir: str = ''
+    error: str = ''
+    # Số lần đã tự resume từ last.pt sau khi worker crash
+    resumes: int = 0
+    started_at: float = None
+    finished_at: float = None
+    # (epoch, mAP50, mAP50-95) sau mỗi lần validation
+    history: list = field(default_factory=list)
+
+    @classmethod
+    def from_config(cls, config, name=''):
+        """Create a job from a config saved by the Setup tab (Save Config)"""
+        return cls(name=name,
+                   model=config.get('custom_model') or config.get('model', 'yolov8n.pt'),
+                   dataset=config.get('dataset', ''),
+                   params=dict(config.get('params', {})),
+                   bool_params=dict(config.get('bool_params', {})))
+
+    @classmethod
+    def from_config_file(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_config(json.load(f), name=Path(path).stem)
+
+
+@dataclass
+class JobUpdated:
+    job: QueuedJob
+
+
+def split_devices(text):
+    """'0,1' -> ['0', '1'], 'cpu' -> ['cpu'], '' -> []"""
+    return [d.strip() for d in str(text).split(',') if d.strip()]
+
+
+class JobQueue:
+    """Schedules QueuedJobs on up to `max_concurrent` one-shot training workers.
+
+    on_update(JobUpdated) is called from worker reader threads whenever a
+    job's status, progress or ETA changes. A job that fails after saving a
+    checkpoint is resumed from its last.pt up to `max_resumes` times.
+    """
+
+    def __init__(self, on_update, max_concurrent=1, devices=None, max_resumes=0):
+        self.on_update = on_update
+        self.max_concurrent = max_concurrent
+        self.devices = devices or []
+        self.max_resumes = max_resumes
+        self.jobs = []
+        self.running = False
+        self._workers = {}
+        self._lock = threading.RLock()
+
+    # Quản lý danh sách job
+    def add(self, job):
+        with self._lock:
+            self.jobs.append(job)
+        self._notify(job)
+        self._schedule()
+        return job
+
+    def remove(self, job_id):
+        """Remove a job that is not running"""
+        with self._lock:
+            self.jobs = [j for j in self.jobs if j.job_id != job_id or j.status == RUNNING]
+
+    def get(self, job_id):
+        with self._lock:
+            return next((j for j in self.jobs if j.job_id == job_id), None)
+
+    def start(self):
+        self.running = True
+        self._schedule()
+
+    def stop_all(self):
+        """Pause scheduling and terminate every running job"""
+        self.running = False
+        with self._lock:
+            for job_id, worker in self._workers.items():
+                self.get(job_id).status = STOPPED
+                worker.stop()
+
+    def stop_job(self, job_id, status=STOPPED):
+        """Terminate one running job, recording `status` as its final state"""
+        with self._lock:
+            worker = self._workers.get(job_id)
+            if worker:
+                self.get(job_id).status = status
+                worker.stop()
+
+    @property
+    def active(self):
+        with self._lock:
+            return bool(self._workers)
+
+    # Phân bổ tài nguyên
+    def _assign_resources(self, job):
+        """Pick the least-loaded device and a CPU budget for one job"""
+        cpu_count = os.cpu_count() or 1
+        cores_per_job = max(1, cpu_count // max(1, self.max_concurrent))
+
+        devices = self.devices or split_devices(job.params.get('device', 'cpu')) or ['cpu']
+        if len(devices) > 1 and not self.devices:
+            # Job tự khai báo nhiều GPU (DDP) -> giữ nguyên
+            job.device = ",".join(devices)
+        else:
+            in_use = [j.device for j in self.jobs if j.status == RUNNING]
+            job.device = min(devices, key=in_use.count)
+
+        requested = int(job.params.get('workers', 4) or 0)
+        if job.device == 'cpu':
+            # Ít nhất một core cho vòng train chính, phần còn lại cho dataloader; thread torch
+            # dùng phần ngân sách dataloader không lấy, để tổng các job không vượt số core
+            job.workers = min(requested, max(0, cores_per_job - 1))
+            return max(1, cores_per_job - job.workers)
+        job.workers = min(requested, cores_per_job)
+        return 0
+
+    def _schedule(self):
+        with self._lock:
+            if not self.running:
+                return
+            for job in self.jobs:
+                if len(self._workers) >= self.max_concurrent:
+                    break
+                if job.status == QUEUED:
+                    self._launch(job)
+
+    def _launch(self, job):
+        torch_threads = self._assign_resources(job)
+
+        run_dir = next_run_dir(job.project)
+        run_dir.mkdir(parents=True, exist_ok=True)  # giữ chỗ cho các job chạy song song
+        job.run_dir = str(run_dir)
+
+        params = dict(job.params, device=job.device, workers=str(job.workers))
+        train_args = build_train_args(job.dataset, params, job.bool_params, run_dir)
+        job.epochs = int(train_args.get('epochs', 0) or 0)
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._start_worker(job, TrainingJob(job.model, train_args, torch_threads))
+
+    def _start_worker(self, job, training_job):
+        spool = LogSpool(job.run_dir)
+        splitter = ConsoleLineSplitter()
+        progress = {'t0': None, 'first_epoch': 1, 'notified': 0.0}
+
+        def on_message(message):
+            self._handle(job, message, spool, splitter, progress)
+
+        worker = TrainingWorker(on_message)
+        self._workers[job.job_id] = worker
+        try:
+            worker.start()
+            worker.submit(training_job)
+            worker.shutdown()
+        except Exception as e:
+            self._workers.pop(job.job_id, None)
+            job.status, job.error = FAILED, str(e)
+        self._notify(job)
+
+    def _handle(self, job, message, spool, splitter, progress):
+        if isinstance(message, LogOutput):
+            # Chỉ lưu các dòng đã hoàn chỉnh ra file log của job
+            text = "".join(text for kind, text in splitter.feed(message.text) if kind == 'line')
+            if text:
+                spool.write(text)
+            return
+
+        if isinstance(message, EpochStart):
+            job.epoch, job.epochs = message.epoch, message.epochs
+            if progress['t0'] is None:
+                progress['t0'], progress['first_epoch'] = time.time(), message.epoch
+        elif isinstance(message, BatchProgress):
+            now = time.time()
+            if progress['t0'] is None or not message.batches or now - progress['notified'] < 1.0:
+                return
+            progress['notified'] = now
+            done = message.epoch - progress['first_epoch'] + message.batch / message.batches
+            remaining = message.epochs - (message.epoch - 1 + message.batch / message.batches)
+            job.eta_seconds = (now - progress['t0']) / done * remaining if done else None
+        elif isinstance(message, ValMetrics):
+            job.history.append((message.epoch, message.map50, message.map50_95))
+            if job.best_map50_95 is None or message.map50_95 > job.best_map50_95:
+                job.best_map50_95 = message.map50_95
+        elif isinstance(message, TrainingFinished):
+            for kind, text in splitter.close():
+                spool.write(text)
+            spool.close()
+            job.finished_at = time.time()
+            job.eta_seconds = None
+            if message.save_dir:
+                job.run_dir = message.save_dir
+            with self._lock:
+                self._workers.pop(job.job_id, None)
+                checkpoint = ''
+                if job.status == RUNNING and not message.ok and job.resumes < self.max_resumes:
+                    checkpoint = resumable_checkpoint(job.run_dir)
+                if checkpoint:
+                    self._resume(job, checkpoint, message.error)
+                    return
+            if job.status == RUNNING:
+                job.status = DONE if message.ok else FAILED
+                job.error = message.error
+            self._notify(job)
+            self._schedule()
+            return
+        else:
+            return
+        self._notify(job)
+
+    def _resume(self, job, checkpoint, error):
+        """Restart a crashed job from its last checkpoint (called with the lock held)"""
+        job.resumes += 1
+        reason = error.strip().splitlines()[-1] if error.strip() else "worker crashed"
+        job.error = f"resumed {job.resumes}/{self.max_resumes} after: {reason}"
+        job.finished_at = None
+        torch_threads = self._assign_resources(job)
+        overrides = {'device': job.device, 'workers': job.workers}
+        self._start_worker(job, resume_job(checkpoint, overrides, torch_threads))
+
+    def _notify(self, job):
+        self.on_update(JobUpdated(job))
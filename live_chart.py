@@ -0,0 +1,125 @@
+"""
+Live Chart
+Vẽ đường loss / mAP từ ResultsTail (hoặc nhiều run chồng lên nhau) lên Tk canvas
+(không cần matplotlib). Chuỗi dài được downsample theo độ rộng canvas nên vẽ
+lại luôn nhanh.
+"""
+
+import numpy as np
+
+from results_tail import downsample
+
+# (tiêu đề panel, điều kiện chọn cột results.csv)
+PANELS = (
+    ("Loss", lambda name: name.endswith('loss')),
+    ("Metrics", lambda name: name.startswith('metrics/')),
+)
+SERIES_COLORS = ('#4fc3f7', '#ffb74d', '#81c784', '#e57373', '#ba68c8', '#fff176', '#4db6ac', '#f06292')
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 56, 12, 24, 24
+
+
+def _short_name(column):
+    # 'metrics/mAP50-95(B)' -> 'mAP50-95', 'val/box_loss' -> 'val box_loss'
+    name = column.replace('metrics/', '').replace('(B)', '')
+    return name.replace('/', ' ')
+
+
+def _flat_coords(xs, ys):
+    """Split a series at NaNs into canvas coordinate lists"""
+    parts, current = [], []
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        if y != y:  # NaN
+            if len(current) >= 4:
+                parts.append(current)
+            current = []
+        else:
+            current += (x, y)
+    if len(current) >= 4:
+        parts.append(current)
+    return parts
+
+
+class LiveChart:
+    """Loss and metric panels drawn on one tk.Canvas"""
+
+    def __init__(self, canvas, colors):
+        self.canvas = canvas
+        self.colors = colors
+
+    def _begin(self, empty_text, empty):
+        """Clear the canvas; returns its size, or None when there is nothing to draw"""
+        canvas = self.canvas
+        canvas.delete('all')
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width < 100 or height < 100:
+            return None
+        if empty:
+            canvas.create_text(width / 2, height / 2, text=empty_text, fill=self.colors['text_dim'])
+            return None
+        return width, height
+
+    def draw(self, tail):
+        """One panel per PANELS entry from the columns of a ResultsTail"""
+        size = self._begin("Waiting for results.csv...", not tail.rows or 'epoch' not in tail.columns)
+        if size is None:
+            return
+        width, height = size
+        epochs = tail.column('epoch')
+        panel_height = height / len(PANELS)
+        for number, (title, select) in enumerate(PANELS):
+            series = [(_short_name(c), epochs, tail.column(c)) for c in tail.columns if select(c)]
+            self._draw_panel(title, series, number * panel_height, width, panel_height)
+
+    def draw_overlay(self, title, series, empty_text="Select runs to compare"):
+        """A single panel with one (label, epochs, values) series per run"""
+        size = self._begin(empty_text, not series)
+        if size is not None:
+            self._draw_panel(title, series, 0, *size)
+
+    def _draw_panel(self, title, series, top, width, height):
+        canvas = self.canvas
+        x0, x1 = MARGIN_LEFT, width - MARGIN_RIGHT
+        y0, y1 = top + MARGIN_TOP, top + height - MARGIN_BOTTOM
+        canvas.create_text(x0, top + 4, text=title, anchor='nw', fill=self.colors['text'],
+                           font=('Segoe UI', 10, 'bold'))
+        canvas.create_rectangle(x0, y0, x1, y1, outline=self.colors['text_dim'])
+        series = [s for s in series if len(s[1])]
+        if not series or y1 - y0 < 20:
+            return
+
+        # Mỗi pixel ngang tối đa 1 điểm (min/max theo bucket giữ lại đỉnh)
+        max_points = max(4, int(x1 - x0))
+        series = [(label, *downsample(xs, ys, max_points)) for label, xs, ys in series]
+        values = np.concatenate([ys for _, _, ys in series])
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        lo, hi = float(values.min()), float(values.max())
+        if hi - lo < 1e-12:
+            lo, hi = lo - 0.5, hi + 0.5
+        first = min(float(xs[0]) for _, xs, _ in series)
+        last = max(float(xs[-1]) for _, xs, _ in series)
+        span = max(last - first, 1.0)
+
+        for fraction in (0.0, 0.5, 1.0):
+            y = y1 - fraction * (y1 - y0)
+            canvas.create_text(x0 - 4, y, text=f"{lo + fraction * (hi - lo):.3g}", anchor='e',
+                               fill=self.colors['text_dim'], font=('Consolas', 8))
+        canvas.create_text(x0, y1 + 4, text=f"{first:g}", anchor='nw', fill=self.colors['text_dim'],
+                           font=('Consolas', 8))
+        canvas.create_text(x1, y1 + 4, text=f"epoch {last:g}", anchor='ne', fill=self.colors['text_dim'],
+                           font=('Consolas', 8))
+
+        legend_x = x0 + 70
+        for index, (label, xs, ys) in enumerate(series):
+            color = SERIES_COLORS[index % len(SERIES_COLORS)]
+            px = x0 + (xs - first) / span * (x1 - x0)
+            py = y1 - (ys - lo) / (hi - lo) * (y1 - y0)
+            for coords in _flat_coords(px, py):
+                canvas.create_line(*coords, fill=color, width=1.5)
+            if len(px) == 1 and np.isfinite(py[0]):
+                canvas.create_oval(px[0] - 2, py[0] - 2, px[0] + 2, py[0] + 2, fill=color, outline=color)
+            item = canvas.create_text(legend_x, top + 4, text=f"■ {label}", anchor='nw', fill=color,
+                                      font=('Segoe UI', 8))
+            bbox = canvas.bbox(item)
+            legend_x = (bbox[2] if bbox else legend_x + 8 * len(label)) + 10
@@ -0,0 +1,141 @@
+"""
+Metrics Parser
+Phân tích output console của ultralytics thành các sự kiện có cấu trúc
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# Số theo định dạng %g của ultralytics (0.812, 1e-05, nan, ...)
+_NUM = r'[-+]?(?:\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|nan|inf)'
+
+# Một regex duy nhất, compile một lần, nhận diện mọi loại dòng quan tâm:
+#   header:  "      Epoch    GPU_mem   box_loss   cls_loss   dfl_loss  Instances       Size"
+#   train:   "      1/100      2.51G      1.234      2.345      1.456         45        640: 45%|... | 54/120 [..."
+#            (bản mới hơn vẽ bar không có '|': "640: 45% ━━━━━─────── 54/120 1.2s")
+#   val:     "                   all        100        250      0.812      0.745      0.801      0.567"
+_LINE = re.compile(
+    r'^\s*(?:'
+    r'(?P<header>Epoch\s+GPU_mem\s+(?P<columns>[^\n]*?))\s*$'
+    r'|(?P<epoch>\d+)/(?P<epochs>\d+)\s+(?P<mem>\d[\d.]*[KMGT]?)\s+'
+    rf'(?P<values>{_NUM}(?:\s+{_NUM})*)'
+    r'(?:\s*:\s*\d+%(?:[^|\n]*\|[^|\n]*\||[^\d\n]*?)\s*(?P<batch>\d+)/(?P<batches>\d+))?'
+    rf'|all\s+(?P<images>\d+)\s+(?P<instances>\d+)\s+(?P<p>{_NUM})\s+(?P<r>{_NUM})'
+    rf'\s+(?P<map50>{_NUM})\s+(?P<map>{_NUM})'
+    r')'
+)
+
+DEFAULT_LOSS_NAMES = ('box_loss', 'cls_loss', 'dfl_loss')
+
+
+@dataclass
+class EpochStart:
+    epoch: int
+    epochs: int
+
+
+@dataclass
+class BatchProgress:
+    epoch: int
+    epochs: int
+    batch: int
+    batches: int
+    losses: dict = field(default_factory=dict)
+    gpu_mem: str = ''
+
+    @property
+    def loss(self):
+        return sum(self.losses.values())
+
+
+@dataclass
+class ValMetrics:
+    epoch: int
+    precision: float
+    recall: float
+    map50: float
+    map50_95: float
+
+    @property
+    def fitness(self):
+        return fitness(self.map50, self.map50_95)
+
+
+@dataclass
+class BestFitness:
+    epoch: int
+    fitness: float
+
+
+def fitness(map50, map50_95):
+    """Default ultralytics detection fitness: 0.1 * mAP50 + 0.9 * mAP50-95"""
+    return 0.1 * map50 + 0.9 * map50_95
+
+
+class TrainingOutputParser:
+    """Single-pass parser for ultralytics training output.
+
+    feed() takes one console line and returns the events it produced. Events
+    are only emitted when something actually changed, so repeated progress
+    states and duplicated summary rows cost nothing downstream.
+    """
+
+    def __init__(self):
+        self.loss_names = DEFAULT_LOSS_NAMES
+        self.epoch = 0
+        self.epochs = 0
+        self.best_fitness = None
+        self._last_batch = None
+        self._last_val = None
+
+    def feed(self, line):
+        m = _LINE.match(line)
+        if m is None:
+            return []
+
+        if m.group('header') is not None:
+            columns = m.group('columns').split()
+            # Các cột sau GPU_mem: <loss names...> Instances Size
+            if len(columns) > 2:
+                self.loss_names = tuple(columns[:-2])
+            return []
+
+        if m.group('epoch') is not None:
+            return self._train_row(m)
+
+        return self._val_row(m)
+
+    def _train_row(self, m):
+        events = []
+        epoch, epochs, values, batch, batches, mem = m.group(
+            'epoch', 'epochs', 'values', 'batch', 'batches', 'mem')
+        epoch, epochs = int(epoch), int(epochs)
+        if epoch != self.epoch or epochs != self.epochs:
+            self.epoch, self.epochs = epoch, epochs
+            self._last_batch = None
+            events.append(EpochStart(epoch, epochs))
+
+        # So sánh chuỗi thô trước, chỉ convert số khi dòng thực sự thay đổi
+        key = (values, batch, batches)
+        if key != self._last_batch:
+            self._last_batch = key
+            losses = dict(zip(self.loss_names, map(float, values.split()[:len(self.loss_names)])))
+            events.append(BatchProgress(epoch, epochs, int(batch or 0), int(batches or 0),
+                                        losses, mem))
+        return events
+
+    def _val_row(self, m):
+        p, r = float(m.group('p')), float(m.group('r'))
+        map50, map50_95 = float(m.group('map50')), float(m.group('map'))
+
+        key = (self.epoch, p, r, map50, map50_95)
+        if key == self._last_val:
+            return []
+        self._last_val = key
+
+        metrics = ValMetrics(self.epoch, p, r, map50, map50_95)
+        events = [metrics]
+        if self.best_fitness is None or metrics.fitness > self.best_fitness:
+            self.best_fitness = metrics.fitness
+            events.append(BestFitness(self.epoch, metrics.fitness))
+        return events
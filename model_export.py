@@ -0,0 +1,389 @@
+"""
+Model Export
+Xuất weights/best.pt của một run sang ONNX, OpenVINO, TorchScript (tùy chọn
+dynamic batch, FP16/INT8) rồi đo latency trên CPU máy hiện tại: warmup, sau
+đó p50/p95/p99 và throughput với nhiều batch size. Kết quả (artifact + bảng
+so sánh benchmark.md/.csv) nằm trong <run>/export. Chạy trong process riêng.
+"""
+
+import csv
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+EXPORT_FORMATS = ('onnx', 'openvino', 'torchscript')
+PRECISIONS = ('fp32', 'fp16', 'int8')
+DEFAULT_BATCH_SIZES = (1, 4, 8)
+WARMUP_ITERATIONS = 10
+MEASURE_ITERATIONS = 50
+# Dừng đo sớm nếu một cấu hình chạy quá lâu (model lớn, batch lớn trên CPU yếu)
+MAX_MEASURE_SECONDS = 30.0
+EXPORT_DIR = "export"
+TABLE_NAME = "benchmark"
+
+
+@dataclass
+class ExportSettings:
+    weights: str
+    formats: tuple = EXPORT_FORMATS
+    precisions: tuple = ('fp32',)
+    dynamic: bool = False
+    imgsz: int = 640
+    # Dataset dùng để calibrate INT8
+    data: str = ''
+    batch_sizes: tuple = DEFAULT_BATCH_SIZES
+    warmup: int = WARMUP_ITERATIONS
+    iterations: int = MEASURE_ITERATIONS
+    # Mặc định: <run>/export
+    out_dir: str = ''
+
+
+@dataclass
+class ExportedModel:
+    format: str
+    precision: str
+    dynamic: bool = False
+    path: str = ''
+    size_mb: float = 0.0
+    seconds: float = 0.0
+    error: str = ''
+
+
+@dataclass
+class LatencyResult:
+    format: str
+    precision: str
+    dynamic: bool
+    batch: int
+    # None khi không đo được (xem error)
+    p50_ms: float = None
+    p95_ms: float = None
+    p99_ms: float = None
+    mean_ms: float = None
+    images_per_sec: float = None
+    iterations: int = 0
+    error: str = ''
+
+
+@dataclass
+class ExportProgress:
+    text: str
+
+
+@dataclass
+class ExportResult:
+    out_dir: str = ''
+    artifacts: list = field(default_factory=list)
+    benchmarks: list = field(default_factory=list)
+    table_path: str = ''
+    error: str = ''
+
+
+def run_weights(run_dir):
+    """best.pt of a run, or last.pt when training never validated"""
+    for name in ('best.pt', 'last.pt'):
+        path = os.path.join(run_dir, 'weights', name)
+        if os.path.isfile(path):
+            return path
+    return ''
+
+
+def settings_for_run(run_dir, **overrides):
+    """ExportSettings for a run directory, taking imgsz and dataset from its args.yaml"""
+    import yaml
+
+    try:
+        with open(os.path.join(run_dir, 'args.yaml'), 'r', encoding='utf-8') as f:
+            args = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        args = {}
+    settings = ExportSettings(run_weights(run_dir), imgsz=int(args.get('imgsz') or 640),
+                              data=str(args.get('data') or ''),
+                              out_dir=os.path.join(run_dir, EXPORT_DIR))
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return settings
+
+
+def unsupported_reason(fmt, precision, cuda=False):
+    """Why ultralytics cannot export this variant on this machine, or ''"""
+    if precision == 'fp16' and fmt != 'openvino' and not cuda:
+        return "FP16 export needs a CUDA GPU for this format"
+    if precision == 'int8' and fmt != 'openvino':
+        return "INT8 export is only available for OpenVINO"
+    return ''
+
+
+def artifact_name(stem, fmt, precision, dynamic):
+    """best + onnx/fp16/dynamic -> best-fp16-dynamic.onnx"""
+    tag = f"{stem}-{precision}{'-dynamic' if dynamic else ''}"
+    if fmt == 'openvino':
+        return f"{tag}_openvino_model"
+    return tag + ('.onnx' if fmt == 'onnx' else '.torchscript')
+
+
+def _path_size_mb(path):
+    if os.path.isdir(path):
+        return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file()) / 2**20
+    return os.path.getsize(path) / 2**20
+
+
+def export_variant(settings, fmt, precision, out_dir):
+    """Export one format/precision with ultralytics and move it into out_dir"""
+    from ultralytics import YOLO
+
+    start = time.perf_counter()
+    artifact = ExportedModel(fmt, precision, settings.dynamic and fmt != 'torchscript')
+    # FP16 ONNX/TorchScript chỉ export được trên GPU (trên CPU ultralytics tắt half và ra model FP32)
+    device = 0 if precision == 'fp16' and fmt != 'openvino' else 'cpu'
+    args = {'format': fmt, 'imgsz': settings.imgsz, 'device': device,
+            'half': precision == 'fp16', 'int8': precision == 'int8'}
+    if artifact.dynamic:
+        args['dynamic'] = True
+    if precision == 'int8':
+        args['data'] = settings.data
+    # ultralytics ghi artifact cạnh file .pt -> chuyển vào thư mục export với tên theo biến thể
+    exported = YOLO(settings.weights).export(**args)
+    target = os.path.join(out_dir, artifact_name(Path(settings.weights).stem, fmt, precision, artifact.dynamic))
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(str(exported), target)
+    artifact.path = target
+    artifact.size_mb = _path_size_mb(target)
+    artifact.seconds = time.perf_counter() - start
+    return artifact
+
+
+def load_runner(fmt, path):
+    """Callable running one float32 NCHW batch through an exported model on the CPU"""
+    if fmt == 'onnx':
+        import numpy as np
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        inp = session.get_inputs()[0]
+        dtype = np.float16 if 'float16' in inp.type else np.float32
+        return lambda x: session.run(None, {inp.name: x.astype(dtype, copy=False)})
+    if fmt == 'openvino':
+        import openvino as ov
+
+        xml = next(Path(path).glob('*.xml'))
+        compiled = ov.Core().compile_model(str(xml), 'CPU', {'PERFORMANCE_HINT': 'LATENCY'})
+        request = compiled.create_infer_request()
+        return lambda x: request.infer({0: x})
+    if fmt in ('torchscript', 'pytorch'):
+        import torch
+
+        if fmt == 'torchscript':
+            model = torch.jit.load(path, map_location='cpu')
+        else:
+            from ultralytics import YOLO
+            model = YOLO(path).model.float().fuse()
+        model.eval()
+        # TorchScript FP16 có weights half: input phải cùng dtype
+        dtype = next(model.parameters()).dtype
+
+        def run(x):
+            with torch.inference_mode():
+                return model(torch.from_numpy(x).to(dtype))
+        return run
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def measure_latency(run, batch, imgsz, warmup=WARMUP_ITERATIONS, iterations=MEASURE_ITERATIONS,
+                    max_seconds=MAX_MEASURE_SECONDS):
+    """Per-call latencies (ms, float64 array) of run() on a random batch, after warmup"""
+    import numpy as np
+
+    x = np.random.default_rng(0).random((batch, 3, imgsz, imgsz), dtype=np.float32)
+    for _ in range(warmup):
+        run(x)
+    times = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run(x)
+        end = time.perf_counter()
+        times.append((end - start) * 1000)
+        if end > deadline and len(times) >= 5:
+            break
+    return np.array(times)
+
+
+def benchmark_artifact(artifact, settings, report=print):
+    """LatencyResult rows for one exported model at each batch size"""
+    import numpy as np
+
+    rows = []
+    try:
+        run = load_runner(artifact.format, artifact.path)
+    except Exception as e:
+        return [LatencyResult(artifact.format, artifact.precision, artifact.dynamic, b, error=f"load: {e}")
+                for b in settings.batch_sizes]
+    for batch in settings.batch_sizes:
+        row = LatencyResult(artifact.format, artifact.precision, artifact.dynamic, batch)
+        rows.append(row)
+        # ONNX/OpenVINO không dynamic: shape batch cố định = 1
+        if batch != 1 and not artifact.dynamic and artifact.format in ('onnx', 'openvino'):
+            row.error = "static batch 1 (export with dynamic batch)"
+            continue
+        try:
+            times = measure_latency(run, batch, settings.imgsz, settings.warmup, settings.iterations)
+        except Exception as e:
+            row.error = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            report(f"  {artifact.format} {artifact.precision} batch {batch}: {row.error}")
+            continue
+        row.p50_ms, row.p95_ms, row.p99_ms = (float(v) for v in np.percentile(times, (50, 95, 99)))
+        row.mean_ms = float(times.mean())
+        row.images_per_sec = batch * 1000 / row.mean_ms
+        row.iterations = len(times)
+        report(f"  {artifact.format} {artifact.precision} batch {batch}: p50 {row.p50_ms:.1f} ms, "
+               f"{row.images_per_sec:.1f} img/s")
+    return rows
+
+
+def format_table(artifacts, rows):
+    """Markdown comparison table (one line per format/precision/batch)"""
+    sizes = {(a.format, a.precision, a.dynamic): a.size_mb for a in artifacts}
+    lines = ["| format | precision | dynamic | batch | size MB | p50 ms | p95 ms | p99 ms | img/s | note |",
+             "|---|---|---|---|---|---|---|---|---|---|"]
+    for r in rows:
+        size = sizes.get((r.format, r.precision, r.dynamic), 0.0)
+        if r.error:
+            timing = "| - | - | - | - "
+        else:
+            timing = f"| {r.p50_ms:.2f} | {r.p95_ms:.2f} | {r.p99_ms:.2f} | {r.images_per_sec:.1f} "
+        lines.append(f"| {r.format} | {r.precision} | {'yes' if r.dynamic else 'no'} | {r.batch} "
+                     f"| {size:.1f} {timing}| {r.error} |")
+    failed = [a for a in artifacts if a.error]
+    if failed:
+        lines.append("")
+        lines += [f"- {a.format} {a.precision}: {a.error}" for a in failed]
+    return "\n".join(lines) + "\n"
+
+
+def write_table(out_dir, artifacts, rows):
+    """Write benchmark.md and benchmark.csv; returns the markdown path"""
+    md_path = os.path.join(out_dir, f"{TABLE_NAME}.md")
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write(format_table(artifacts, rows))
+    with open(os.path.join(out_dir, f"{TABLE_NAME}.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(asdict(rows[0]).keys()) if rows else ['format'])
+        writer.writeheader()
+        writer.writerows(asdict(r) for r in rows)
+    return md_path
+
+
+def run_export(settings, report=print):
+    """Export every requested variant, benchmark them and write the table"""
+    import torch
+
+    result = ExportResult()
+    if not settings.weights or not os.path.isfile(settings.weights):
+        result.error = f"Weights not found: {settings.weights or '(none)'}"
+        return result
+    out_dir = settings.out_dir or os.path.join(os.path.dirname(os.path.dirname(settings.weights)), EXPORT_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    result.out_dir = out_dir
+    cuda = torch.cuda.is_available()
+
+    # PyTorch gốc làm mốc so sánh
+    baseline = ExportedModel('pytorch', 'fp32', False, settings.weights, _path_size_mb(settings.weights))
+    result.artifacts.append(baseline)
+    for fmt in settings.formats:
+        for precision in settings.precisions:
+            reason = unsupported_reason(fmt, precision, cuda)
+            if precision == 'int8' and not reason and not settings.data:
+                reason = "INT8 needs a calibration dataset"
+            if reason:
+                result.artifacts.append(ExportedModel(fmt, precision, settings.dynamic, error=reason))
+                continue
+            report(f"Exporting {fmt} {precision}{' (dynamic batch)' if settings.dynamic else ''}...")
+            try:
+                artifact = export_variant(settings, fmt, precision, out_dir)
+            except Exception as e:
+                artifact = ExportedModel(fmt, precision, settings.dynamic,
+                                         error=str(e).strip().splitlines()[-1] if str(e).strip() else type(e).__name__)
+                report(f"  ✗ {artifact.error}")
+            else:
+                report(f"  ✓ {os.path.basename(artifact.path)} ({artifact.size_mb:.1f} MB, {artifact.seconds:.1f}s)")
+            result.artifacts.append(artifact)
+
+    report(f"Benchmarking on CPU ({torch.get_num_threads()} threads, imgsz {settings.imgsz})...")
+    for artifact in result.artifacts:
+        if not artifact.error:
+            result.benchmarks += benchmark_artifact(artifact, settings, report)
+    result.table_path = write_table(out_dir, result.artifacts, result.benchmarks)
+    return result
+
+
+def _export_main(conn, settings):
+    # Log của ultralytics/exporter không cần thiết ở đây
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    try:
+        result = run_export(settings, lambda text: conn.send(ExportProgress(text)))
+    except BaseException:
+        result = ExportResult(error=traceback.format_exc())
+    conn.send(result)
+    conn.close()
+
+
+class Exporter:
+    """Runs run_export() in a spawned process.
+
+    on_message receives ExportProgress messages and finally one
+    ExportResult, from a background reader thread. Subclasses run another
+    stage by overriding the class attributes.
+    """
+
+    target = staticmethod(_export_main)
+    result_type = ExportResult
+    name = "export"
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.process = None
+
+    def start(self, settings):
+        ctx = multiprocessing.get_context('spawn')
+        conn, child_conn = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(target=self.target, args=(child_conn, settings, *self.process_args(ctx)),
+                                   name=f"yolo-{self.name}")
+        self.process.start()
+        child_conn.close()
+        threading.Thread(target=self._read_messages, args=(conn,), daemon=True).start()
+
+    def process_args(self, ctx):
+        """Extra arguments for target after (conn, settings)"""
+        return ()
+
+    def _read_messages(self, conn):
+        finished = False
+        try:
+            while True:
+                message = conn.recv()
+                finished = finished or isinstance(message, self.result_type)
+                self.on_message(message)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            self.process.join()
+            if not finished:
+                self.on_message(self.result_type(
+                    error=f"{self.name.capitalize()} process exited with code {self.process.exitcode}"))
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self):
+        if self.is_alive():
+            self.process.terminate()
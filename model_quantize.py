@@ -0,0 +1,350 @@
+"""
+Model Quantize
+Post-training quantization INT8 (static) cho một run đã train xong: lấy mẫu ảnh
+calibration từ split train của data.yaml, quantize ONNX (ONNX Runtime, QDQ) và
+OpenVINO (NNCF) trên CPU, rồi val mAP của từng model so với best.pt FP32 và đo
+latency. Bảng "latency nhanh hơn bao nhiêu / mất bao nhiêu mAP" nằm trong
+<run>/export/quantization.md/.csv. Chạy trong process riêng.
+"""
+
+import csv
+import os
+import random
+import shutil
+import sys
+import time
+import traceback
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from dataset_scan import load_data_yaml, list_images
+from model_export import (Exporter, ExportSettings, ExportedModel, EXPORT_DIR, artifact_name,
+                          benchmark_artifact, export_variant, run_weights, _path_size_mb)
+
+QUANTIZE_FORMATS = ('onnx', 'openvino')
+CALIBRATION_IMAGES = 128
+CALIBRATION_SEED = 0
+# Cảnh báo khi mAP50-95 giảm nhiều hơn mức này (điểm tuyệt đối) so với best.pt
+MAX_MAP_DROP = 0.01
+QUANT_TABLE_NAME = "quantization"
+PAD_VALUE = 114
+
+
+@dataclass
+class QuantizeSettings:
+    weights: str
+    # data.yaml: split train để calibrate, split val để đo mAP
+    data: str
+    formats: tuple = QUANTIZE_FORMATS
+    imgsz: int = 640
+    calibration_images: int = CALIBRATION_IMAGES
+    seed: int = CALIBRATION_SEED
+    max_map_drop: float = MAX_MAP_DROP
+    # Dùng bởi benchmark_artifact (model tĩnh batch 1)
+    batch_sizes: tuple = (1,)
+    warmup: int = 10
+    iterations: int = 50
+    # Mặc định: <run>/export
+    out_dir: str = ''
+
+
+@dataclass
+class QuantizedModel:
+    format: str
+    precision: str
+    path: str = ''
+    size_mb: float = 0.0
+    # None khi chưa val / không đo được
+    map50: float = None
+    map50_95: float = None
+    p50_ms: float = None
+    images_per_sec: float = None
+    seconds: float = 0.0
+    error: str = ''
+
+
+@dataclass
+class QuantizeProgress:
+    text: str
+
+
+@dataclass
+class QuantizeResult:
+    out_dir: str = ''
+    models: list = field(default_factory=list)
+    calibration_images: int = 0
+    table_path: str = ''
+    error: str = ''
+
+
+def quantize_settings_for_run(run_dir, data, **overrides):
+    """QuantizeSettings for a run directory, taking imgsz from its args.yaml"""
+    import yaml
+
+    try:
+        with open(os.path.join(run_dir, 'args.yaml'), 'r', encoding='utf-8') as f:
+            args = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        args = {}
+    settings = QuantizeSettings(run_weights(run_dir), data, imgsz=int(args.get('imgsz') or 640),
+                                out_dir=os.path.join(run_dir, EXPORT_DIR))
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return settings
+
+
+def sample_calibration_images(data_yaml, count=CALIBRATION_IMAGES, seed=CALIBRATION_SEED):
+    """A reproducible random subset of the train split"""
+    data = load_data_yaml(data_yaml)
+    if not data.get('train'):
+        raise ValueError(f"No train split in {data_yaml}")
+    images = list_images(data['train'])
+    if not images:
+        raise ValueError(f"No images in the train split of {data_yaml}")
+    if len(images) <= count:
+        return images
+    return sorted(random.Random(seed).sample(images, count))
+
+
+def letterbox(image, imgsz):
+    """Resize keeping the aspect ratio and pad to imgsz x imgsz, as ultralytics does for inference"""
+    import cv2
+    import numpy as np
+
+    h, w = image.shape[:2]
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = round(w * ratio), round(h * ratio)
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    out = np.full((imgsz, imgsz, 3), PAD_VALUE, dtype=np.uint8)
+    out[top:top + new_h, left:left + new_w] = image
+    return out
+
+
+def load_calibration_batch(path, imgsz):
+    """1x3xHxW float32 RGB in [0, 1], the input layout of the exported models"""
+    import cv2
+    import numpy as np
+
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Cannot read image: {path}")
+    image = letterbox(image, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+def _head_prefix(names):
+    """'/model.22/' for the Detect head, from graph node names"""
+    import re
+
+    indices = [int(m.group(1)) for n in names if (m := re.search(r"/model\.(\d+)/", n))]
+    return f"/model.{max(indices)}/" if indices else None
+
+
+def quantize_onnx(fp32_path, out_path, batches):
+    """Static QDQ quantization with ONNX Runtime; only Conv/Gemm/MatMul go INT8"""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+    model = onnx.load(fp32_path)
+    input_name = model.graph.input[0].name
+    # Phần decode của head (box pixel 0..640 lẫn xác suất 0..1) phải giữ float, DFL cũng vậy
+    exclude = [n.name for n in model.graph.node
+               if n.op_type not in ('Conv', 'Gemm', 'MatMul') or '/dfl/' in n.name]
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.iterator = iter(batches)
+
+        def get_next(self):
+            batch = next(self.iterator, None)
+            return None if batch is None else {input_name: batch}
+
+        def rewind(self):
+            self.iterator = iter(batches)
+
+    quantize_static(fp32_path, out_path, Reader(), nodes_to_exclude=exclude, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    # Metadata (names, stride, imgsz) để ultralytics load được model INT8
+    quantized = onnx.load(out_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, out_path)
+    return out_path
+
+
+def quantize_openvino(fp32_dir, out_dir, batches):
+    """Static INT8 quantization with NNCF; the Detect head and sigmoids stay float"""
+    import nncf
+    import openvino as ov
+
+    xml = next(Path(fp32_dir).glob('*.xml'))
+    model = ov.Core().read_model(str(xml))
+    operations = model.get_ordered_ops()
+    head = _head_prefix([op.get_friendly_name() for op in operations])
+    ignored = [op.get_friendly_name() for op in operations
+               if op.get_type_name() == 'Sigmoid' or (head and op.get_friendly_name().startswith(head))]
+    quantized = nncf.quantize(model, nncf.Dataset(batches), preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(batches),
+                              ignored_scope=nncf.IgnoredScope(names=ignored) if ignored else None)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    ov.save_model(quantized, os.path.join(out_dir, xml.name), compress_to_fp16=False)
+    metadata = Path(fp32_dir) / 'metadata.yaml'
+    if metadata.exists():
+        shutil.copy(metadata, out_dir)
+    return out_dir
+
+
+def validate_map(path, settings, name):
+    """(mAP50, mAP50-95) of a model on the val split of settings.data, on the CPU"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(path, task='detect').val(
+        data=settings.data, imgsz=settings.imgsz, batch=1, device='cpu', plots=False, verbose=False,
+        project=os.path.join(settings.out_dir, 'val'), name=name, exist_ok=True)
+    return float(metrics.box.map50), float(metrics.box.map)
+
+
+def _error_text(e):
+    text = str(e).strip()
+    return text.splitlines()[-1] if text else type(e).__name__
+
+
+def format_quant_table(models, max_map_drop=MAX_MAP_DROP):
+    """Markdown table: mAP loss vs best.pt and speedup vs the FP32 model of the same runtime"""
+    base = next((m for m in models if m.format == 'pytorch' and m.map50_95 is not None), None)
+    fp32 = {m.format: m for m in models if m.precision == 'fp32' and m.p50_ms}
+    lines = ["| format | precision | size MB | mAP50 | mAP50-95 | Δ mAP50-95 | p50 ms | speedup | note |",
+             "|---|---|---|---|---|---|---|---|---|"]
+    for m in models:
+        map50 = '-' if m.map50 is None else f"{m.map50:.4f}"
+        map50_95 = '-' if m.map50_95 is None else f"{m.map50_95:.4f}"
+        delta, note = '-', m.error
+        if base is not None and m.map50_95 is not None and m is not base:
+            drop = base.map50_95 - m.map50_95
+            # + 0.0: hiệu rất nhỏ làm tròn thành -0.0 -> in "+0.0000" thay vì "-0.0000"
+            delta = f"{round(-drop, 4) + 0.0:+.4f}"
+            if drop > max_map_drop and not note:
+                note = f"⚠ mAP50-95 drop > {max_map_drop:g}"
+        p50 = '-' if m.p50_ms is None else f"{m.p50_ms:.2f}"
+        reference = fp32.get(m.format)
+        speedup = '-'
+        if m.p50_ms and reference is not None and reference is not m:
+            speedup = f"{reference.p50_ms / m.p50_ms:.2f}x"
+        lines.append(f"| {m.format} | {m.precision} | {m.size_mb:.1f} | {map50} | {map50_95} | {delta} "
+                     f"| {p50} | {speedup} | {note} |")
+    return "\n".join(lines) + "\n"
+
+
+def write_quant_table(out_dir, models, max_map_drop=MAX_MAP_DROP):
+    """Write quantization.md and quantization.csv; returns the markdown path"""
+    md_path = os.path.join(out_dir, f"{QUANT_TABLE_NAME}.md")
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write(format_quant_table(models, max_map_drop))
+    with open(os.path.join(out_dir, f"{QUANT_TABLE_NAME}.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(asdict(models[0]).keys()) if models else ['format'])
+        writer.writeheader()
+        writer.writerows(asdict(m) for m in models)
+    return md_path
+
+
+def _measure(model, settings, report):
+    """Validate and benchmark one model in place"""
+    name = f"{model.format}-{model.precision}"
+    try:
+        model.map50, model.map50_95 = validate_map(model.path, settings, name)
+    except Exception as e:
+        model.error = f"val: {_error_text(e)}"
+        report(f"  ✗ {name} val: {model.error}")
+        return
+    artifact = ExportedModel(model.format, model.precision, False, model.path, model.size_mb)
+    row = benchmark_artifact(artifact, settings, lambda text: None)[0]
+    if row.error:
+        model.error = row.error
+    else:
+        model.p50_ms, model.images_per_sec = row.p50_ms, row.images_per_sec
+    report(f"  {name}: mAP50-95 {model.map50_95:.4f}"
+           + (f", p50 {model.p50_ms:.1f} ms" if model.p50_ms else ""))
+
+
+def run_quantize(settings, report=print):
+    """Calibrate, quantize every requested format, then validate and benchmark against best.pt"""
+    result = QuantizeResult()
+    if not settings.weights or not os.path.isfile(settings.weights):
+        result.error = f"Weights not found: {settings.weights or '(none)'}"
+        return result
+    if not settings.data or not os.path.isfile(settings.data):
+        result.error = f"Dataset not found: {settings.data or '(none)'}"
+        return result
+    out_dir = settings.out_dir or os.path.join(os.path.dirname(os.path.dirname(settings.weights)), EXPORT_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    settings.out_dir = result.out_dir = out_dir
+
+    images = sample_calibration_images(settings.data, settings.calibration_images, settings.seed)
+    report(f"Loading {len(images)} calibration images from the train split...")
+    batches = [load_calibration_batch(path, settings.imgsz) for path in images]
+    result.calibration_images = len(batches)
+
+    # Mốc so sánh: best.pt FP32 (mAP) và model FP32 cùng runtime (latency)
+    baseline = QuantizedModel('pytorch', 'fp32', settings.weights, _path_size_mb(settings.weights))
+    result.models.append(baseline)
+    stem = Path(settings.weights).stem
+    export_settings = ExportSettings(settings.weights, imgsz=settings.imgsz)
+    for fmt in settings.formats:
+        report(f"Exporting {fmt} fp32...")
+        try:
+            fp32 = export_variant(export_settings, fmt, 'fp32', out_dir)
+        except Exception as e:
+            result.models.append(QuantizedModel(fmt, 'fp32', error=f"export: {_error_text(e)}"))
+            report(f"  ✗ {result.models[-1].error}")
+            continue
+        result.models.append(QuantizedModel(fmt, 'fp32', fp32.path, fp32.size_mb, seconds=fp32.seconds))
+
+        report(f"Quantizing {fmt} INT8 ({len(batches)} calibration images)...")
+        start = time.perf_counter()
+        target = os.path.join(out_dir, artifact_name(stem, fmt, 'int8-ptq', False))
+        try:
+            if fmt == 'onnx':
+                quantize_onnx(fp32.path, target, batches)
+            else:
+                quantize_openvino(fp32.path, target, batches)
+        except Exception as e:
+            result.models.append(QuantizedModel(fmt, 'int8', error=f"quantize: {_error_text(e)}"))
+            report(f"  ✗ {result.models[-1].error}")
+            continue
+        result.models.append(QuantizedModel(fmt, 'int8', target, _path_size_mb(target),
+                                            seconds=time.perf_counter() - start))
+        report(f"  ✓ {os.path.basename(target)} ({result.models[-1].size_mb:.1f} MB)")
+
+    report(f"Validating on the val split and benchmarking (imgsz {settings.imgsz}, batch 1)...")
+    for model in result.models:
+        if not model.error:
+            _measure(model, settings, report)
+    result.table_path = write_quant_table(out_dir, result.models, settings.max_map_drop)
+    return result
+
+
+def _quantize_main(conn, settings):
+    # Log của ultralytics/nncf không cần thiết ở đây
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    try:
+        result = run_quantize(settings, lambda text: conn.send(QuantizeProgress(text)))
+    except BaseException:
+        result = QuantizeResult(error=traceback.format_exc())
+    conn.send(result)
+    conn.close()
+
+
+class Quantizer(Exporter):
+    """Runs run_quantize() in a spawned process.
+
+    on_message receives QuantizeProgress messages and finally one
+    QuantizeResult, from a background reader thread.
+    """
+
+    target = staticmethod(_quantize_main)
+    result_type = QuantizeResult
+    name = "quantize"
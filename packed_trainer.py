@@ -0,0 +1,18 @@
+"""
+Packed Trainer
+DetectionTrainer đọc dataset dạng shard (dataset_pack). Class nằm ở module
+level vì training multi-GPU (DDP) của ultralytics chạy một script tạm import
+trainer theo __module__ / __name__; module riêng để import dataset_pack không
+kéo theo ultralytics.
+"""
+
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from dataset_pack import build_dataset
+
+
+class PackedDetectionTrainer(DetectionTrainer):
+    def build_dataset(self, img_path, mode='train', batch=None):
+        model = getattr(self.model, 'module', self.model)  # DDP
+        gs = max(int(model.stride.max()), 32)
+        return build_dataset(self.args, img_path, batch, self.data, mode=mode, rect=mode == 'val', stride=gs)
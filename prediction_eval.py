@@ -0,0 +1,469 @@
+"""
+Prediction Eval
+Tính lại precision/recall/mAP50/mAP50-95 theo class mà không chạy lại model:
+predictions (conf thấp, sau NMS) và label của một split được cache một lần
+thành các mảng NumPy phẳng (<run>/eval/*.npz), kèm các cặp (prediction, label)
+và (prediction, prediction) chồng nhau. Đổi conf / NMS iou / ngưỡng IoU chỉ còn
+vài phép toán vector trên các mảng đó. Matching giống COCO (và ultralytics 8.4):
+prediction theo thứ tự conf giảm dần lấy label chưa bị lấy có IoU cao nhất.
+NMS iou thấp hơn lúc cache là xấp xỉ: NMS lại trên box đã NMS ở CACHE_IOU không
+giống chạy lại model (box bị một box đã loại đè ở CACHE_IOU có thể đã sống sót
+khi NMS thẳng ở iou thấp), nên kết quả được đánh dấu approximate.
+"""
+
+import json
+import os
+import sys
+import time
+import traceback
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from dataset_scan import img2label_path, list_images, load_data_yaml
+from model_export import Exporter, run_weights
+from tiled_inference import box_overlap
+
+CACHE_CONF = 0.001
+CACHE_IOU = 0.7
+MAX_DET = 300
+IOU_THRESHOLDS = tuple(round(t, 2) for t in np.linspace(0.5, 0.95, 10))
+# Cặp prediction/label có IoU thấp hơn không bao giờ được match
+MIN_PAIR_IOU = 0.1
+# NMS iou thấp nhất tính lại được từ cache (cặp prediction/prediction được lưu từ mức này)
+MIN_NMS_IOU = 0.3
+EVAL_DIR = "eval"
+CACHE_VERSION = 1
+
+
+@dataclass
+class EvalSettings:
+    weights: str
+    data: str
+    split: str = 'val'
+    # 0 = imgsz lúc train của weights
+    imgsz: int = 0
+    # conf/iou khi cache: conf thấp nhất và NMS iou cao nhất sẽ đánh giá
+    conf: float = CACHE_CONF
+    iou: float = CACHE_IOU
+    batch: int = 16
+    device: str = ''
+    # Mặc định: <run>/eval/<weights>-<split>.npz
+    cache_path: str = ''
+
+
+@dataclass
+class ClassMetrics:
+    name: str
+    labels: int
+    predictions: int
+    precision: float
+    recall: float
+    ap50: float
+    ap50_95: float
+
+
+@dataclass
+class EvalMetrics:
+    conf: float
+    iou: float
+    images: int = 0
+    labels: int = 0
+    predictions: int = 0
+    # Trung bình trên các class có label; precision/recall ở conf và IoU 0.5
+    precision: float = 0.0
+    recall: float = 0.0
+    map50: float = 0.0
+    map50_95: float = 0.0
+    classes: list = field(default_factory=list)
+    seconds: float = 0.0
+    # NMS iou < iou lúc cache: NMS lại trên box đã NMS, không giống chạy lại model
+    approximate: bool = False
+
+
+@dataclass
+class EvalProgress:
+    done: int
+    total: int
+
+
+@dataclass
+class EvalCacheResult:
+    path: str = ''
+    images: int = 0
+    predictions: int = 0
+    seconds: float = 0.0
+    error: str = ''
+
+
+def load_labels(image_path, width, height):
+    """(N, 5) cls, x1, y1, x2, y2 in pixels from the YOLO label file of an image"""
+    try:
+        rows = np.loadtxt(img2label_path(image_path), ndmin=2, dtype=np.float64)
+    except (OSError, ValueError):
+        return np.zeros((0, 5))
+    if not rows.size:
+        return np.zeros((0, 5))
+    cls, cx, cy, w, h = rows[:, :5].T
+    return np.stack([cls, (cx - w / 2) * width, (cy - h / 2) * height,
+                     (cx + w / 2) * width, (cy + h / 2) * height], axis=1)
+
+
+def default_cache_path(weights, split='val'):
+    """<run>/eval/<stem>-<split>.npz for weights inside <run>/weights, else next to the weights"""
+    directory = os.path.dirname(os.path.abspath(weights))
+    if os.path.basename(directory) == 'weights':
+        directory = os.path.dirname(directory)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    return os.path.join(directory, EVAL_DIR, f"{stem}-{split}.npz")
+
+
+def eval_settings_for_run(run_dir, **overrides):
+    """EvalSettings for a run directory, taking dataset and imgsz from its args.yaml"""
+    import yaml
+
+    try:
+        with open(os.path.join(run_dir, 'args.yaml'), 'r', encoding='utf-8') as f:
+            args = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        args = {}
+    settings = EvalSettings(run_weights(run_dir), str(args.get('data') or ''), imgsz=int(args.get('imgsz') or 0))
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return settings
+
+
+def build_cache(preds, labels):
+    """Flat cache arrays from per-image (N, 6) predictions and (M, 5) labels.
+
+    Predictions are stored in descending confidence per image, so a lower
+    global index always means a more confident box of the same image.
+    """
+    pred_counts = np.array([len(p) for p in preds], dtype=np.int64)
+    label_counts = np.array([len(g) for g in labels], dtype=np.int64)
+    pred_offsets = np.concatenate([[0], np.cumsum(pred_counts)])
+    label_offsets = np.concatenate([[0], np.cumsum(label_counts)])
+    match_pairs, nms_pairs = [], []
+    sorted_preds = []
+    for k, (pred, label) in enumerate(zip(preds, labels)):
+        pred = np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+        pred = pred[np.argsort(-pred[:, 4], kind='stable')]
+        sorted_preds.append(pred)
+        if not len(pred):
+            continue
+        same = pred[:, None, 5] == pred[None, :, 5]
+        overlap = box_overlap(pred[:, None, :4], pred[None, :, :4]) * same
+        i, j = np.nonzero(np.triu(overlap > MIN_NMS_IOU, 1))
+        nms_pairs.append(np.stack([i + pred_offsets[k], j + pred_offsets[k], overlap[i, j]], axis=1))
+        if len(label):
+            label = np.asarray(label, dtype=np.float32).reshape(-1, 5)
+            same = pred[:, None, 5] == label[None, :, 0]
+            overlap = box_overlap(pred[:, None, :4], label[None, :, 1:5]) * same
+            i, j = np.nonzero(overlap >= MIN_PAIR_IOU)
+            match_pairs.append(np.stack([i + pred_offsets[k], j + label_offsets[k], overlap[i, j]], axis=1))
+
+    def stacked(pairs):
+        return np.concatenate(pairs) if pairs else np.zeros((0, 3))
+
+    pred = np.concatenate(sorted_preds) if sorted_preds else np.zeros((0, 6), dtype=np.float32)
+    label = np.concatenate([np.asarray(g, dtype=np.float32).reshape(-1, 5) for g in labels]) \
+        if len(labels) else np.zeros((0, 5), dtype=np.float32)
+    match, nms = stacked(match_pairs), stacked(nms_pairs)
+    return {
+        'pred_offsets': pred_offsets, 'pred_box': pred[:, :4].astype(np.float32),
+        'pred_conf': pred[:, 4].astype(np.float32), 'pred_cls': pred[:, 5].astype(np.int16),
+        'label_offsets': label_offsets, 'label_box': label[:, 1:5].astype(np.float32),
+        'label_cls': label[:, 0].astype(np.int16),
+        'match_pred': match[:, 0].astype(np.int32), 'match_label': match[:, 1].astype(np.int32),
+        'match_iou': match[:, 2].astype(np.float32),
+        'nms_i': nms[:, 0].astype(np.int32), 'nms_j': nms[:, 1].astype(np.int32),
+        'nms_iou': nms[:, 2].astype(np.float32),
+    }
+
+
+def _weights_signature(weights):
+    st = os.stat(weights)
+    return f"{os.path.abspath(weights)}|{st.st_mtime_ns}|{st.st_size}"
+
+
+def cache_predictions(settings, report=None):
+    """Run the model once over the split and write the cache; returns an EvalCacheResult"""
+    from ultralytics import YOLO
+
+    start = time.perf_counter()
+    result = EvalCacheResult()
+    data = load_data_yaml(settings.data)
+    if not data.get(settings.split):
+        result.error = f"No '{settings.split}' split in {settings.data}"
+        return result
+    images = list_images(data[settings.split])
+    model = YOLO(settings.weights)
+    predict_args = {'conf': settings.conf, 'iou': settings.iou, 'max_det': MAX_DET, 'verbose': False,
+                    'stream': True, 'batch': settings.batch}
+    if settings.imgsz:
+        predict_args['imgsz'] = settings.imgsz
+    if settings.device:
+        predict_args['device'] = settings.device
+
+    preds, labels = [], []
+    for start_index in range(0, len(images), settings.batch):
+        chunk = images[start_index:start_index + settings.batch]
+        for path, prediction in zip(chunk, model.predict(chunk, **predict_args)):
+            height, width = prediction.orig_shape
+            preds.append(prediction.boxes.data.cpu().numpy()[:, :6] if prediction.boxes is not None
+                         else np.zeros((0, 6)))
+            labels.append(load_labels(path, width, height))
+        if report:
+            report(EvalProgress(min(start_index + settings.batch, len(images)), len(images)))
+
+    arrays = build_cache(preds, labels)
+    meta = {'version': CACHE_VERSION, 'weights': _weights_signature(settings.weights),
+            'data': os.path.abspath(settings.data), 'split': settings.split, 'imgsz': settings.imgsz,
+            'conf': settings.conf, 'iou': settings.iou, 'names': [model.names[k] for k in sorted(model.names)],
+            'images': images}
+    path = settings.cache_path or default_cache_path(settings.weights, settings.split)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, path)
+    result.path, result.images, result.predictions = path, len(images), len(arrays['pred_conf'])
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _cluster_nms(keep, i, j, iou, threshold):
+    """Greedy NMS on the kept boxes from precomputed overlap pairs (i more confident than j).
+
+    Iterates "suppressed by a surviving box" until it stops changing
+    (Cluster-NMS); the fixed point equals sequential greedy NMS of the kept
+    boxes. Those already went through NMS at the cache iou, so this only
+    approximates NMS of the raw model output at the lower threshold.
+    """
+    pairs = (iou > threshold) & keep[i] & keep[j]
+    i, j = i[pairs], j[pairs]
+    alive = keep.copy()
+    for _ in range(len(keep) + 1):
+        suppressed = np.zeros(len(keep), dtype=bool)
+        suppressed[j[alive[i]]] = True
+        new = keep & ~suppressed
+        if np.array_equal(new, alive):
+            break
+        alive = new
+    return alive
+
+
+def _greedy_match(pred, label, iou, thresholds, n_label):
+    """(prediction, threshold index) arrays of the true positives of COCO greedy matching,
+    at every threshold at once; pairs are sorted by prediction, descending IoU, label.
+
+    Every (threshold, prediction) walks its candidate labels by descending
+    IoU; each (threshold, label) keeps the most confident proposer. Since all
+    labels rank predictions the same way (confidence), this deferred
+    acceptance ends in the unique stable matching, which is exactly the
+    sequential "most confident prediction takes the best free label" result.
+    """
+    rows = [np.flatnonzero(iou >= t) for t in thresholds]
+    level = np.repeat(np.arange(len(thresholds)), [len(r) for r in rows])
+    rows = np.concatenate(rows)
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64), level
+    cand_pred = pred[rows]
+    cand_label = level * n_label + label[rows]
+    # Mỗi (ngưỡng, prediction) là một owner với các ứng viên liền nhau; index owner nhỏ = conf cao
+    starts = np.flatnonzero(np.r_[True, (cand_pred[1:] != cand_pred[:-1]) | (level[1:] != level[:-1])])
+    ends = np.r_[starts[1:], len(rows)]
+
+    pointer = starts.copy()
+    holder = np.full(len(thresholds) * n_label, -1, dtype=np.int64)  # owner đang giữ label
+    matched = np.zeros(len(starts), dtype=bool)
+    active = np.arange(len(starts))
+    while len(active):
+        # active tăng dần + sort ổn định: proposer đầu tiên của mỗi label là tự tin nhất
+        targets = cand_label[pointer[active]]
+        order = np.argsort(targets, kind='stable')
+        active, targets = active[order], targets[order]
+        first = np.r_[True, targets[1:] != targets[:-1]]
+        best, best_target = active[first], targets[first]
+        current = holder[best_target]
+        wins = (current < 0) | (best < current)
+        displaced = current[wins & (current >= 0)]
+        holder[best_target[wins]] = best[wins]
+        matched[best[wins]] = True
+        matched[displaced] = False
+        losers = np.sort(np.concatenate([active[~first], best[~wins], displaced]))
+        pointer[losers] += 1
+        active = losers[pointer[losers] < ends[losers]]
+    return cand_pred[starts[matched]], level[starts[matched]]
+
+
+def _average_precision(ranks, n_preds, n_labels):
+    """COCO 101-point AP (as ultralytics compute_ap) of one class from its true positives only.
+
+    ranks are the sorted 1-based confidence ranks of the true positives
+    among n_preds predictions. The precision envelope only changes at a
+    true positive, so the curve is reduced to two points per true positive
+    (start and end of its equal-recall run) which np.interp reads exactly
+    like the full per-prediction curve.
+    """
+    if not len(ranks):
+        return 0.0
+    count = np.arange(1, len(ranks) + 1)
+    recall = count / n_labels
+    envelope = np.flip(np.maximum.accumulate(np.flip(count / ranks)))
+    following = np.append(envelope[1:], 0.0)
+    run_end = np.append(ranks[1:] - 1, n_preds)
+    mrec = np.concatenate(([0.0, 0.0], np.repeat(recall, 2), [recall[-1], 1.0]))
+    mpre = np.concatenate(([1.0, envelope[0] if ranks[0] > 1 else 1.0],
+                           np.stack([envelope, np.maximum(count / run_end, following)], axis=1).ravel(),
+                           [0.0, 0.0]))
+    x = np.linspace(0, 1, 101)
+    trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+    return float(trapezoid(np.interp(x, mrec, mpre), x))
+
+
+class PredictionCache:
+    """Cached predictions and labels of one split; evaluate() is cheap to call repeatedly"""
+
+    def __init__(self, arrays, meta=None):
+        self.meta = meta or {}
+        for key, value in arrays.items():
+            setattr(self, key, value)
+        self.names = self.meta.get('names') or [str(c) for c in range(int(self.label_cls.max(initial=-1)) + 1)]
+        # Cặp prediction/label theo prediction, IoU giảm dần: lọc theo ngưỡng giữ nguyên thứ tự
+        order = np.lexsort((self.match_label, -self.match_iou, self.match_pred))
+        self.match_pred, self.match_label, self.match_iou = \
+            self.match_pred[order], self.match_label[order], self.match_iou[order]
+        self.conf = float(self.meta.get('conf', 0.0))
+        self.iou = float(self.meta.get('iou', 1.0))
+        # Sắp xếp một lần: theo class rồi conf giảm dần (đường precision/recall)
+        self.class_order = np.lexsort((np.arange(len(self.pred_conf)), -self.pred_conf, self.pred_cls))
+        self.class_rank = np.empty_like(self.class_order)
+        self.class_rank[self.class_order] = np.arange(len(self.class_order))
+        self.num_classes = max(len(self.names), int(self.label_cls.max(initial=-1)) + 1,
+                               int(self.pred_cls.max(initial=-1)) + 1)
+        self.class_bounds = np.searchsorted(self.pred_cls[self.class_order], np.arange(self.num_classes + 1))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            arrays = {key: f[key] for key in f.files if key != 'meta'}
+            meta = json.loads(str(f['meta']))
+        if meta.get('version') != CACHE_VERSION:
+            raise ValueError(f"Prediction cache {path} has an old format, rebuild it")
+        return cls(arrays, meta)
+
+    def matches(self, settings):
+        """Whether this cache can answer settings (same weights/data/split, looser conf and NMS)"""
+        meta = self.meta
+        try:
+            signature = _weights_signature(settings.weights)
+        except OSError:
+            return False
+        return (meta.get('weights') == signature and meta.get('data') == os.path.abspath(settings.data)
+                and meta.get('split') == settings.split and meta.get('imgsz') == settings.imgsz
+                and self.conf <= settings.conf and self.iou >= settings.iou)
+
+    def evaluate(self, conf=None, iou=None, iou_thresholds=IOU_THRESHOLDS):
+        """EvalMetrics for predictions with confidence >= conf after NMS at iou.
+
+        iou below the cache iou re-runs NMS on the cached boxes, an
+        approximation of running the model at that iou (metrics.approximate).
+        """
+        start = time.perf_counter()
+        conf = self.conf if conf is None else conf
+        iou = self.iou if iou is None else iou
+        if conf < self.conf or iou > self.iou:
+            raise ValueError(f"Cache holds conf >= {self.conf:g} and NMS iou <= {self.iou:g}; rebuild it "
+                             f"for conf {conf:g} / iou {iou:g}")
+        if iou < MIN_NMS_IOU:
+            raise ValueError(f"NMS iou below {MIN_NMS_IOU} cannot be recomputed from the cache")
+        thresholds = np.asarray(iou_thresholds, dtype=np.float32)
+        if thresholds.min() < MIN_PAIR_IOU:
+            raise ValueError(f"IoU thresholds must be >= {MIN_PAIR_IOU}")
+
+        keep = self.pred_conf >= conf
+        if iou < self.iou:
+            keep = _cluster_nms(keep, self.nms_i, self.nms_j, self.nms_iou, iou)
+        pairs = keep[self.match_pred]
+        tp_pred, tp_level = _greedy_match(self.match_pred[pairs], self.match_label[pairs], self.match_iou[pairs],
+                                          thresholds, len(self.label_cls))
+
+        metrics = EvalMetrics(conf, iou, images=len(self.pred_offsets) - 1, labels=len(self.label_cls),
+                              predictions=int(keep.sum()), approximate=bool(iou < self.iou))
+        # Hạng (1-based) theo conf trong class của mỗi true positive, chỉ tính prediction được giữ
+        kept = np.concatenate([[0], np.cumsum(keep[self.class_order])])
+        class_start = kept[self.class_bounds]
+        tp_cls = self.pred_cls[tp_pred]
+        tp_rank = kept[self.class_rank[tp_pred] + 1] - class_start[tp_cls]
+        levels = len(thresholds)
+        group = tp_cls.astype(np.int64) * levels + tp_level
+        order = np.lexsort((tp_rank, group))
+        tp_rank = tp_rank[order]
+        groups = np.searchsorted(group[order], np.arange(self.num_classes * levels + 1))
+        n_labels = np.bincount(self.label_cls, minlength=self.num_classes)
+        for c in np.flatnonzero(n_labels):
+            n_preds = int(class_start[c + 1] - class_start[c])
+            ranks = [tp_rank[groups[c * levels + k]:groups[c * levels + k + 1]] for k in range(levels)]
+            aps = [_average_precision(r, n_preds, n_labels[c]) for r in ranks]
+            metrics.classes.append(ClassMetrics(
+                self.names[c] if c < len(self.names) else str(c), int(n_labels[c]), n_preds,
+                len(ranks[0]) / n_preds if n_preds else 0.0, len(ranks[0]) / n_labels[c],
+                aps[0], float(np.mean(aps))))
+        if metrics.classes:
+            for key in ('precision', 'recall', 'ap50', 'ap50_95'):
+                value = float(np.mean([getattr(r, key) for r in metrics.classes]))
+                setattr(metrics, {'ap50': 'map50', 'ap50_95': 'map50_95'}.get(key, key), value)
+        metrics.seconds = time.perf_counter() - start
+        return metrics
+
+
+def format_metrics(metrics):
+    """Per-class table in the layout of ultralytics val"""
+    lines = [f"conf {metrics.conf:g}, NMS iou {metrics.iou:g}: {metrics.images} images, "
+             f"{metrics.predictions} predictions ({metrics.seconds * 1000:.0f} ms)"
+             + (" [approximate]" if metrics.approximate else ""),
+             f"{'Class':>20} {'Labels':>8} {'Preds':>8} {'P':>7} {'R':>7} {'mAP50':>7} {'mAP50-95':>9}",
+             f"{'all':>20} {metrics.labels:>8} {metrics.predictions:>8} {metrics.precision:>7.3f} "
+             f"{metrics.recall:>7.3f} {metrics.map50:>7.3f} {metrics.map50_95:>9.3f}"]
+    for r in metrics.classes:
+        lines.append(f"{r.name:>20} {r.labels:>8} {r.predictions:>8} {r.precision:>7.3f} {r.recall:>7.3f} "
+                     f"{r.ap50:>7.3f} {r.ap50_95:>9.3f}")
+    if metrics.approximate:
+        lines.append("approximate: NMS iou below the cache iou re-runs NMS on the cached boxes, not on the raw "
+                     "model output (exact numbers: ultralytics val at this iou)")
+    return "\n".join(lines)
+
+
+def load_cache(settings):
+    """The cache that can answer settings, or None when it is missing or stale"""
+    path = settings.cache_path or default_cache_path(settings.weights, settings.split)
+    if not os.path.isfile(path):
+        return None
+    try:
+        cache = PredictionCache.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return cache if cache.matches(settings) else None
+
+
+def _cache_main(conn, settings):
+    # Log của ultralytics không cần thiết ở đây
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    try:
+        result = cache_predictions(settings, conn.send)
+    except BaseException:
+        result = EvalCacheResult(error=traceback.format_exc())
+    conn.send(result)
+    conn.close()
+
+
+class PredictionCacher(Exporter):
+    """Runs cache_predictions() in a spawned process.
+
+    on_message receives EvalProgress messages and finally one
+    EvalCacheResult, from a background reader thread.
+    """
+
+    target = staticmethod(_cache_main)
+    result_type = EvalCacheResult
+    name = "evaluation"
@@ -0,0 +1,109 @@
+"""
+Results Tail
+Đọc results.csv của ultralytics theo kiểu "tail": nhớ offset đã đọc, mỗi lần
+poll chỉ parse các dòng mới và nối vào mảng NumPy. Dùng cho biểu đồ live trong
+tab Results (không đọc lại cả file mỗi lần refresh).
+"""
+
+import os
+
+import numpy as np
+
+INITIAL_CAPACITY = 256
+
+
+class ResultsTail:
+    """Incrementally parsed results.csv: columns plus a growing float64 row array"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.reset()
+
+    def reset(self):
+        # Tăng mỗi lần đọc lại từ đầu -> giao diện biết phải xóa dữ liệu cũ
+        self.generation = getattr(self, 'generation', -1) + 1
+        self.offset = 0
+        self.file_id = None
+        self.columns = []
+        self._data = np.empty((0, 0))
+        self.rows = 0
+        # Dòng cuối chưa có '\n' (ultralytics đang ghi dở)
+        self._partial = b''
+
+    @property
+    def data(self):
+        """(rows, columns) view of the parsed values"""
+        return self._data[:self.rows]
+
+    def column(self, name):
+        return self._data[:self.rows, self.columns.index(name)]
+
+    def _append(self, values):
+        if self.rows == len(self._data):
+            grown = np.full((max(INITIAL_CAPACITY, 2 * len(self._data)), len(self.columns)), np.nan)
+            grown[:self.rows] = self._data[:self.rows]
+            self._data = grown
+        self._data[self.rows, :len(values)] = values[:len(self.columns)]
+        self.rows += 1
+
+    def poll(self):
+        """Read what was appended since the last call; returns the new raw lines"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            if self.file_id is not None:
+                self.reset()
+            return []
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self.file_id or st.st_size < self.offset:
+            # File mới hoặc bị ghi lại từ đầu (resume, chạy lại cùng thư mục)
+            self.reset()
+            self.file_id = file_id
+        if st.st_size == self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        self.offset += len(chunk)
+        lines = (self._partial + chunk).split(b'\n')
+        self._partial = lines.pop()
+
+        new_lines = []
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            cells = [cell.strip() for cell in line.split(',')]
+            if not self.columns:
+                self.columns = cells
+                self._data = np.empty((0, len(cells)))
+            else:
+                try:
+                    values = [float(cell) for cell in cells]
+                except ValueError:
+                    continue
+                self._append(values)
+            new_lines.append(line)
+        return new_lines
+
+
+def downsample(x, y, max_points):
+    """Reduce a series to about max_points, keeping each bucket's min and max.
+
+    Spikes (loss blow-ups, mAP drops) stay visible however long the run is.
+    """
+    n = len(x)
+    if n <= max_points or max_points < 4:
+        return x, y
+    buckets = max_points // 2
+    size = -(-n // buckets)
+    # NaN (epoch chưa có val) không được chọn làm min/max; phần đệm lặp lại giá trị cuối
+    filled = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    padded = np.concatenate([filled, np.full(buckets * size - n, filled[-1])]).reshape(buckets, size)
+    base = np.arange(buckets) * size
+    i_lo = np.minimum(base + padded.argmin(axis=1), n - 1)
+    i_hi = np.minimum(base + padded.argmax(axis=1), n - 1)
+    # Giữ thứ tự thời gian trong từng bucket
+    picked = np.stack([np.minimum(i_lo, i_hi), np.maximum(i_lo, i_hi)], axis=1).reshape(-1)
+    return x[picked], y[picked]
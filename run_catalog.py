@@ -0,0 +1,310 @@
+"""
+Run Catalog
+Chỉ mục các lần training trong thư mục runs/ (runs/detect/train*, runs/sweep/...):
+args.yaml, metrics tốt nhất, kích thước weights và đường cong metrics được cache
+trong runs/catalog.sqlite. Lần quét sau chỉ đọc lại run có file thay đổi.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from results_tail import ResultsTail
+
+RUNS_ROOT = "runs"
+CATALOG_NAME = "catalog.sqlite"
+# Tăng khi cách tính các cột thay đổi -> quét lại toàn bộ
+CATALOG_VERSION = 1
+# runs/<project>/<name> hoặc runs/sweep/<sweep>/<trial>
+MAX_DEPTH = 4
+BEST_METRIC = 'metrics/mAP50-95(B)'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    signature TEXT,
+    name TEXT, model TEXT, data TEXT,
+    epochs INTEGER, epochs_done INTEGER, best_epoch INTEGER,
+    map50 REAL, map50_95 REAL, precision REAL, recall REAL,
+    best_size INTEGER, last_size INTEGER,
+    modified REAL,
+    curve_columns TEXT, curve BLOB
+);
+"""
+
+_INFO_COLUMNS = ('path', 'name', 'model', 'data', 'epochs', 'epochs_done', 'best_epoch',
+                 'map50', 'map50_95', 'precision', 'recall', 'best_size', 'last_size', 'modified')
+
+
+@dataclass
+class RunInfo:
+    path: str
+    name: str = ''
+    model: str = ''
+    data: str = ''
+    epochs: int = 0
+    epochs_done: int = 0
+    best_epoch: int = 0
+    map50: float = float('nan')
+    map50_95: float = float('nan')
+    precision: float = float('nan')
+    recall: float = float('nan')
+    # bytes, 0 = không có file
+    best_size: int = 0
+    last_size: int = 0
+    modified: float = 0.0
+
+
+@dataclass
+class CatalogScan:
+    runs: list
+    scanned: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+    error: str = ''
+
+
+def find_run_dirs(root):
+    """Directories below root that contain an args.yaml (one per ultralytics run)"""
+    runs = []
+    stack = [(str(root), 0)]
+    while stack:
+        directory, depth = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        if any(e.name == 'args.yaml' for e in entries):
+            runs.append(directory)
+            continue
+        if depth < MAX_DEPTH:
+            stack.extend((e.path, depth + 1) for e in entries if e.is_dir(follow_symlinks=False))
+    return sorted(runs)
+
+
+def run_signature(run_dir):
+    """mtime/size of the files a catalog row is built from"""
+    parts = []
+    for rel in ('args.yaml', 'results.csv', 'weights/best.pt', 'weights/last.pt'):
+        try:
+            st = os.stat(os.path.join(run_dir, rel))
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def read_run(run_dir):
+    """(RunInfo, curve columns, float32 curve array) parsed from a run directory"""
+    import yaml
+
+    info = RunInfo(str(run_dir), name=os.path.basename(run_dir))
+    try:
+        with open(os.path.join(run_dir, 'args.yaml'), 'r', encoding='utf-8') as f:
+            args = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        args = {}
+    info.model = str(args.get('model') or '')
+    info.data = str(args.get('data') or '')
+    info.epochs = int(args.get('epochs') or 0)
+    info.best_size = _file_size(os.path.join(run_dir, 'weights', 'best.pt'))
+    info.last_size = _file_size(os.path.join(run_dir, 'weights', 'last.pt'))
+    info.modified = max((os.path.getmtime(os.path.join(run_dir, f)) for f in ('args.yaml', 'results.csv')
+                         if os.path.exists(os.path.join(run_dir, f))), default=0.0)
+
+    tail = ResultsTail(os.path.join(run_dir, 'results.csv'))
+    tail.poll()
+    columns, curve = tail.columns, tail.data.astype(np.float32)
+    if tail.rows and 'epoch' in columns:
+        info.epochs_done = int(np.nanmax(tail.column('epoch')))
+        if BEST_METRIC in columns and np.isfinite(tail.column(BEST_METRIC)).any():
+            best = int(np.nanargmax(tail.column(BEST_METRIC)))
+            row = dict(zip(columns, tail.data[best].tolist()))
+            info.best_epoch = int(row['epoch'])
+            info.map50_95 = row[BEST_METRIC]
+            info.map50 = row.get('metrics/mAP50(B)', float('nan'))
+            info.precision = row.get('metrics/precision(B)', float('nan'))
+            info.recall = row.get('metrics/recall(B)', float('nan'))
+    return info, columns, curve
+
+
+class _Stub(dict):
+    """Stand-in for every class/function referenced by a checkpoint pickle"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+    def append(self, item):
+        pass
+
+    def extend(self, items):
+        pass
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    """Reads the top-level dict of a torch.save() zip without torch/ultralytics"""
+
+    def find_class(self, module, name):
+        if module in ('builtins', 'collections'):
+            return super().find_class(module, name)
+        return _Stub
+
+    def persistent_load(self, pid):
+        return None
+
+
+_resumable_cache = {}
+
+
+def checkpoint_resumable(path):
+    """Whether a checkpoint still has the optimizer state ultralytics needs to resume.
+
+    Same test as the training worker (optimizer present, epoch >= 0).
+    ultralytics strips the optimizer when a run finishes, including runs
+    stopped early by patience. Cached by mtime and size.
+    """
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _resumable_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with zipfile.ZipFile(path) as archive:
+        name = next(n for n in archive.namelist() if n.endswith('/data.pkl') or n == 'data.pkl')
+        with archive.open(name) as f:
+            ckpt = _CheckpointUnpickler(f).load()
+    epoch = ckpt.get('epoch', -1) if isinstance(ckpt, dict) else -1
+    resumable = isinstance(ckpt, dict) and ckpt.get('optimizer') is not None \
+        and isinstance(epoch, int) and epoch >= 0
+    _resumable_cache[path] = (key, resumable)
+    return resumable
+
+
+def resumable_checkpoint(run_dir):
+    """weights/last.pt of a run that can be resumed, or ''"""
+    last = os.path.join(run_dir, 'weights', 'last.pt')
+    if not os.path.isfile(last) or not os.path.isfile(os.path.join(run_dir, 'args.yaml')):
+        return ''
+    try:
+        return last if checkpoint_resumable(last) else ''
+    except (OSError, zipfile.BadZipFile, StopIteration, pickle.UnpicklingError, EOFError):
+        # Checkpoint không đọc được (định dạng cũ, đang ghi dở): dựa vào results.csv
+        info = read_run(run_dir)[0]
+        if info.epochs and info.epochs_done >= info.epochs:
+            return ''
+        return last
+
+
+class RunCatalog:
+    """SQLite index of every run below a runs/ directory"""
+
+    def __init__(self, root=RUNS_ROOT):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.root / CATALOG_NAME), timeout=30)
+        self.conn.executescript(_SCHEMA)
+        version = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if version is None or version[0] != str(CATALOG_VERSION):
+            with self.conn:
+                self.conn.execute("DELETE FROM runs")
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(CATALOG_VERSION),))
+
+    def scan(self):
+        """Update the index from disk; returns a CatalogScan with every run"""
+        start = time.perf_counter()
+        known = dict(self.conn.execute("SELECT path, signature FROM runs"))
+        found = [os.path.abspath(d) for d in find_run_dirs(self.root)]
+        result = CatalogScan(runs=[])
+
+        rows = []
+        for run_dir in found:
+            signature = run_signature(run_dir)
+            if known.get(run_dir) == signature:
+                continue
+            info, columns, curve = read_run(run_dir)
+            rows.append((run_dir, signature, *[getattr(info, c) for c in _INFO_COLUMNS[1:]],
+                         json.dumps(columns), curve.tobytes()))
+        found_set = set(found)
+        stale = [(path,) for path in known if path not in found_set]
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO runs VALUES ({','.join('?' * 17)})", rows)
+            self.conn.executemany("DELETE FROM runs WHERE path = ?", stale)
+        result.scanned, result.removed = len(rows), len(stale)
+        result.runs = self.runs()
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def runs(self):
+        rows = self.conn.execute(f"SELECT {', '.join(_INFO_COLUMNS)} FROM runs ORDER BY modified DESC")
+        return [RunInfo(*[float('nan') if v is None else v for v in row]) for row in rows]
+
+    def curve(self, path, column):
+        """(epochs, values) of one results.csv column from the index, or None"""
+        row = self.conn.execute("SELECT curve_columns, curve FROM runs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        columns = json.loads(row[0])
+        if column not in columns or 'epoch' not in columns or not row[1]:
+            return None
+        data = np.frombuffer(row[1], dtype=np.float32).reshape(-1, len(columns))
+        return data[:, columns.index('epoch')], data[:, columns.index(column)]
+
+    def curve_columns(self, path):
+        row = self.conn.execute("SELECT curve_columns FROM runs WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def close(self):
+        self.conn.close()
+
+
+def scan_runs(root=RUNS_ROOT):
+    """One-shot scan (opens and closes the catalog, safe from any thread)"""
+    if not os.path.isdir(root):
+        return CatalogScan(runs=[])
+    try:
+        catalog = RunCatalog(root)
+    except (OSError, sqlite3.Error) as e:
+        return CatalogScan(runs=[], error=str(e))
+    try:
+        return catalog.scan()
+    except sqlite3.Error as e:
+        return CatalogScan(runs=[], error=str(e))
+    finally:
+        catalog.close()
+
+
+def filter_runs(runs, text):
+    """Runs whose name, path, model or dataset contains every word of text"""
+    words = text.lower().split()
+    if not words:
+        return list(runs)
+    return [r for r in runs
+            if all(w in f"{r.name} {r.path} {r.model} {r.data}".lower() for w in words)]
+
+
+def sort_runs(runs, key, descending=False):
+    """Sort by a RunInfo field; NaN and empty values always go last"""
+    def missing(run):
+        value = getattr(run, key)
+        return value is None or value == '' or (isinstance(value, float) and value != value)
+
+    present = [r for r in runs if not missing(r)]
+    absent = [r for r in runs if missing(r)]
+    return sorted(present, key=lambda r: getattr(r, key), reverse=descending) + absent
@@ -0,0 +1,244 @@
+"""
+Hyperparameter Sweep
+Sinh các cấu hình thử (grid / random / Sobol) từ lưới Training Parameters,
+chạy song song qua JobQueue và dừng sớm các trial kém (successive halving)
+
+Cú pháp giá trị trong ô tham số:
+    0.004               giá trị cố định
+    0.001,0.004,0.01    danh sách lựa chọn
+    0.001:0.01          khoảng liên tục (grid lấy 3 điểm)
+    0.001:0.01:log      khoảng theo thang log
+    0.001:0.01:5        khoảng, grid lấy 5 điểm
+"""
+
+import csv
+import itertools
+import math
+import random
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from job_queue import JobQueue, QueuedJob, QUEUED, RUNNING, DONE
+from training_backend import parse_param_value
+from training_log import next_run_dir
+
+METHODS = ('grid', 'random', 'sobol')
+PRUNED = 'pruned'
+
+# Các key tài nguyên không được sweep (device "0,1" là danh sách GPU, không phải lựa chọn)
+FIXED_KEYS = ('device', 'workers', 'epochs')
+
+DEFAULT_GRID_POINTS = 3
+
+
+@dataclass
+class SweepDim:
+    key: str
+    choices: list = None
+    low: float = None
+    high: float = None
+    log: bool = False
+    points: int = DEFAULT_GRID_POINTS
+
+    @property
+    def is_int(self):
+        return isinstance(self.low, int) and isinstance(self.high, int)
+
+    def grid_values(self):
+        if self.choices is not None:
+            return list(self.choices)
+        n = max(2, self.points)
+        return [self.from_unit(i / (n - 1)) for i in range(n)]
+
+    def from_unit(self, u):
+        """Map u in [0, 1] onto this dimension"""
+        if self.choices is not None:
+            return self.choices[min(int(u * len(self.choices)), len(self.choices) - 1)]
+        if self.log:
+            value = math.exp(math.log(self.low) + u * (math.log(self.high) - math.log(self.low)))
+        else:
+            value = self.low + u * (self.high - self.low)
+        return int(round(value)) if self.is_int else round(value, 8)
+
+
+def parse_sweep_space(params):
+    """Split Setup-tab parameters into fixed values and sweep dimensions"""
+    fixed, dims = {}, []
+    for key, text in params.items():
+        text = str(text).strip()
+        if key in FIXED_KEYS:
+            fixed[key] = text
+        elif ',' in text:
+            dims.append(SweepDim(key, choices=[parse_param_value(key, v) for v in text.split(',') if v.strip()]))
+        elif ':' in text:
+            parts = [p.strip() for p in text.split(':')]
+            dim = SweepDim(key, low=parse_param_value(key, parts[0]), high=parse_param_value(key, parts[1]))
+            for extra in parts[2:]:
+                if extra.lower() == 'log':
+                    dim.log = True
+                elif extra:
+                    dim.points = int(extra)
+            if not all(isinstance(v, (int, float)) for v in (dim.low, dim.high)):
+                raise ValueError(f"Invalid range for {key}: {text}")
+            if dim.log and min(dim.low, dim.high) <= 0:
+                raise ValueError(f"Log range for {key} must be positive: {text}")
+            dims.append(dim)
+        else:
+            fixed[key] = text
+    return fixed, dims
+
+
+def _halton(index, base):
+    result, f = 0.0, 1.0
+    while index > 0:
+        f /= base
+        result += f * (index % base)
+        index //= base
+    return result
+
+
+def unit_samples(method, count, ndim, seed=0):
+    """`count` points in [0, 1)^ndim for random or Sobol sampling"""
+    if method == 'random':
+        rng = random.Random(seed)
+        return [[rng.random() for _ in range(ndim)] for _ in range(count)]
+    try:
+        from scipy.stats import qmc
+        return qmc.Sobol(d=ndim, scramble=True, seed=seed).random(count).tolist()
+    except ImportError:
+        # Không có scipy: dùng chuỗi Halton (cũng là low-discrepancy)
+        primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71]
+        return [[_halton(i + 1, primes[d % len(primes)]) for d in range(ndim)] for i in range(count)]
+
+
+def generate_trials(dims, method='grid', samples=10, seed=0):
+    """List of {key: value} dicts, one per trial"""
+    if not dims:
+        return [{}]
+    if method == 'grid':
+        keys = [d.key for d in dims]
+        return [dict(zip(keys, combo)) for combo in itertools.product(*(d.grid_values() for d in dims))]
+    if method not in METHODS:
+        raise ValueError(f"Unknown sweep method: {method}")
+    return [{d.key: d.from_unit(u) for d, u in zip(dims, point)}
+            for point in unit_samples(method, samples, len(dims), seed)]
+
+
+def rung_epochs(first_rung, eta, epochs):
+    """Successive-halving checkpoints: K, K*eta, K*eta^2, ... < epochs"""
+    rungs = []
+    if first_rung > 0 and eta > 1:
+        rung = first_rung
+        while rung < epochs:
+            rungs.append(rung)
+            rung *= eta
+    return rungs
+
+
+@dataclass
+class Trial:
+    index: int
+    values: dict
+    job: QueuedJob = None
+    rungs_passed: set = field(default_factory=set)
+
+
+class Sweep:
+    """Runs a set of trials through a JobQueue with successive-halving pruning.
+
+    At every rung epoch a trial keeps running only if its mAP50-95 is within
+    the top 1/eta of all trials that reached that rung so far. Call
+    handle_update() with every JobUpdated coming from the queue.
+    """
+
+    def __init__(self, model, dataset, params, bool_params, method='grid', samples=10,
+                 first_rung=0, eta=3, seed=0, queue=None, sweep_dir=None, on_finished=None):
+        fixed, self.dims = parse_sweep_space(params)
+        self.model = model
+        self.dataset = dataset
+        self.fixed = fixed
+        self.bool_params = dict(bool_params)
+        self.epochs = int(parse_param_value('epochs', fixed.get('epochs', '100')))
+        self.rungs = rung_epochs(first_rung, eta, self.epochs)
+        self.eta = eta
+        self.sweep_dir = Path(sweep_dir) if sweep_dir else next_run_dir("runs/sweep", "sweep")
+        self.queue = queue or JobQueue(self.handle_update)
+        self.on_finished = on_finished
+        self.finished = False
+        self.trials = [Trial(i + 1, values)
+                       for i, values in enumerate(generate_trials(self.dims, method, samples, seed))]
+        self._rung_values = {rung: [] for rung in self.rungs}
+        self._by_job = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.sweep_dir.mkdir(parents=True, exist_ok=True)
+        for trial in self.trials:
+            params = dict(self.fixed, **{k: str(v) for k, v in trial.values.items()})
+            trial.job = QueuedJob(name=f"{self.sweep_dir.name} #{trial.index}",
+                                  model=self.model, dataset=self.dataset,
+                                  params=params, bool_params=self.bool_params,
+                                  project=str(self.sweep_dir))
+            self._by_job[trial.job.job_id] = trial
+            self.queue.add(trial.job)
+        self.queue.start()
+
+    def handle_update(self, update):
+        trial = self._by_job.get(update.job.job_id)
+        if trial is None:
+            return
+        finished = False
+        with self._lock:
+            prune = self._should_prune(trial)
+            if update.job.status not in (QUEUED, RUNNING):
+                self.write_leaderboard()
+                if not self.finished and all(t.job.status not in (QUEUED, RUNNING) for t in self.trials):
+                    self.finished = finished = True
+
+        # Gọi queue ngoài lock của sweep (queue có thể đang gọi ngược vào handle_update)
+        if prune:
+            self.queue.stop_job(trial.job.job_id, status=PRUNED)
+        if finished and self.on_finished:
+            self.on_finished(self)
+
+    def _should_prune(self, trial):
+        job = trial.job
+        if job.status != RUNNING:
+            return False
+        for epoch, map50, map50_95 in job.history:
+            if epoch not in self._rung_values or epoch in trial.rungs_passed:
+                continue
+            trial.rungs_passed.add(epoch)
+            values = self._rung_values[epoch]
+            values.append(map50_95)
+            top_k = max(1, len(values) // self.eta)
+            if map50_95 < sorted(values, reverse=True)[top_k - 1]:
+                return True
+        return False
+
+    def leaderboard(self):
+        """Trials sorted by best mAP50-95 (best first)"""
+        def best(trial):
+            return trial.job.best_map50_95 if trial.job and trial.job.best_map50_95 is not None else -1.0
+        return sorted(self.trials, key=best, reverse=True)
+
+    def write_leaderboard(self):
+        keys = [d.key for d in self.dims]
+        path = self.sweep_dir / "leaderboard.csv"
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", "trial", "status", "best_mAP50-95", "best_mAP50",
+                             "epochs_run", *keys, "run_dir"])
+            for rank, trial in enumerate(self.leaderboard(), 1):
+                job = trial.job
+                best_map50 = max((h[1] for h in job.history), default=None)
+                writer.writerow([rank, trial.index, job.status,
+                                 "" if job.best_map50_95 is None else f"{job.best_map50_95:.5f}",
+                                 "" if best_map50 is None else f"{best_map50:.5f}",
+                                 job.epoch, *[trial.values.get(k, "") for k in keys], job.run_dir])
+        return path
+
+    @property
+    def completed(self):
+        return sum(1 for t in self.trials if t.job and t.job.status == DONE)
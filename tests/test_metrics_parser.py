@@ -0,0 +1,78 @@
+"""Parser tests on console lines captured from ultralytics training runs"""
+
+import pytest
+
+from metrics_parser import BatchProgress, BestFitness, EpochStart, TrainingOutputParser, ValMetrics
+from training_log import ConsoleLineSplitter
+
+HEADER = "      Epoch    GPU_mem   box_loss   cls_loss   dfl_loss  Instances       Size"
+
+# ultralytics 8.4 (bar ━━━───, không có '|')
+CURRENT_TRAIN = [
+    "\x1b[K      3/100      2.51G      1.234      2.345      1.456         45        640: 45% ━━━━━─────── "
+    "54/120 5.2it/s 10.4s<12.6s",
+    "        1/4         0G  9.354e-05     0.3193  5.554e-05          8         64: 100% ━━━━━━━━━━━━ "
+    "4/4 15.1it/s 0.3s",
+]
+CURRENT_VAL = [
+    "                 Class     Images  Instances      Box(P          R      mAP50  mAP50-95): 100% "
+    "━━━━━━━━━━━━ 1/1 28.4it/s 0.0s",
+    "                   all          8         16      0.812      0.745      0.801      0.567",
+]
+
+# ultralytics 8.3.x (tqdm)
+LEGACY_TRAIN = [
+    "      3/100      2.51G      1.234      2.345      1.456         45        640:  45%|████▌     | "
+    "54/120 [00:10<00:12,  5.20it/s]",
+    "        1/4         0G  9.354e-05     0.3193  5.554e-05          8         64: 100%|██████████| "
+    "4/4 [00:00<00:00, 15.10it/s]",
+]
+LEGACY_VAL = [
+    "                 Class     Images  Instances      Box(P          R      mAP50  mAP50-95): 100%|██████████| "
+    "1/1 [00:00<00:00, 28.40it/s]",
+    "                   all          8         16      0.812      0.745      0.801      0.567",
+]
+
+
+def _clean(line):
+    splitter = ConsoleLineSplitter(raw=True)
+    return [text for _, text in splitter.feed(line + "\n")][0]
+
+
+@pytest.mark.parametrize('train', [CURRENT_TRAIN, LEGACY_TRAIN], ids=['current', 'legacy'])
+def test_train_rows(train):
+    parser = TrainingOutputParser()
+    assert parser.feed(HEADER) == []
+
+    events = parser.feed(_clean(train[0]))
+    assert events == [EpochStart(3, 100),
+                      BatchProgress(3, 100, 54, 120, {'box_loss': 1.234, 'cls_loss': 2.345, 'dfl_loss': 1.456},
+                                    '2.51G')]
+
+    events = parser.feed(_clean(train[1]))
+    assert events[0] == EpochStart(1, 4)
+    assert events[1] == BatchProgress(1, 4, 4, 4, {'box_loss': 9.354e-05, 'cls_loss': 0.3193,
+                                                   'dfl_loss': 5.554e-05}, '0G')
+    # Cùng trạng thái vẽ lại -> không có sự kiện mới
+    assert parser.feed(_clean(train[1])) == []
+
+
+@pytest.mark.parametrize('val', [CURRENT_VAL, LEGACY_VAL], ids=['current', 'legacy'])
+def test_val_rows(val):
+    parser = TrainingOutputParser()
+    parser.feed(_clean(CURRENT_TRAIN[0]))
+    assert parser.feed(_clean(val[0])) == []
+
+    events = parser.feed(_clean(val[1]))
+    assert events[0] == ValMetrics(3, 0.812, 0.745, 0.801, 0.567)
+    assert events[1] == BestFitness(3, pytest.approx(0.1 * 0.801 + 0.9 * 0.567))
+    assert parser.feed(_clean(val[1])) == []
+
+
+def test_custom_loss_header():
+    parser = TrainingOutputParser()
+    parser.feed("      Epoch    GPU_mem   box_loss   seg_loss   cls_loss   dfl_loss  Instances       Size")
+    events = parser.feed("      1/10      1.2G      1.1      2.2      3.3      4.4         12        640: 10% "
+                         "━─────────── 3/30 4.0it/s 0.8s<7.2s")
+    assert events[-1].losses == {'box_loss': 1.1, 'seg_loss': 2.2, 'cls_loss': 3.3, 'dfl_loss': 4.4}
+    assert (events[-1].batch, events[-1].batches) == (3, 30)
@@ -0,0 +1,137 @@
+"""PredictionCache.evaluate against ultralytics' matching (match_predictions) and AP (compute_ap)"""
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('ultralytics')
+
+from prediction_eval import CACHE_IOU, IOU_THRESHOLDS, PredictionCache, build_cache  # noqa: E402
+
+CLASSES = 3
+
+
+def synthetic_split(seed=0, images=40):
+    """Small split with tied confidences, images without predictions and images without labels"""
+    rng = np.random.default_rng(seed)
+    preds, labels = [], []
+    for k in range(images):
+        m = 0 if k % 7 == 3 else int(rng.integers(1, 6))
+        wh = rng.uniform(10, 120, (m, 2))
+        xy = rng.uniform(0, 320 - wh)
+        label = np.column_stack([rng.integers(0, CLASSES, m), xy, xy + wh])
+        near = np.repeat(label, rng.integers(1, 4, m), axis=0)
+        jitter = rng.normal(0, 6, (len(near), 4))
+        # Conf làm tròn 0.1 -> rất nhiều conf bằng nhau, cả trong một ảnh lẫn giữa các ảnh
+        # Đôi khi sai class, kể cả class CLASSES không có label nào
+        cls = np.where(rng.random(len(near)) < 0.85, near[:, 0], rng.integers(0, CLASSES + 1, len(near)))
+        pred = np.column_stack([near[:, 1:5] + jitter, np.round(rng.uniform(0.05, 1, len(near)), 1), cls])
+        n = int(rng.integers(0, 4))
+        wh = rng.uniform(10, 120, (n, 2))
+        xy = rng.uniform(0, 320 - wh)
+        noise = np.column_stack([xy, xy + wh, np.round(rng.uniform(0.05, 0.5, n), 1), rng.integers(0, CLASSES, n)])
+        pred = np.concatenate([pred, noise])
+        if k % 11 == 5:
+            pred = pred[:0]
+        preds.append(pred.astype(np.float32))
+        labels.append(label.astype(np.float32))
+    return preds, labels
+
+
+def reference(preds, labels, conf):
+    """Per-class (true positives at IoU 0.5, AP50, AP50-95) computed by ultralytics.
+
+    Ties in confidence keep image order, then the order within the image
+    (the order PredictionCache uses).
+    """
+    from ultralytics.models.yolo.detect import DetectionValidator
+    from ultralytics.utils.metrics import box_iou, compute_ap
+
+    validator = DetectionValidator()
+    validator.iouv = torch.tensor(IOU_THRESHOLDS)
+    tps, confs, clss = [], [], []
+    for pred, label in zip(preds, labels):
+        pred = pred[np.argsort(-pred[:, 4], kind='stable')]
+        pred = pred[pred[:, 4] >= conf]
+        iou = box_iou(torch.from_numpy(label[:, 1:5]), torch.from_numpy(pred[:, :4]))
+        tps.append(validator.match_predictions(torch.from_numpy(pred[:, 5]), torch.from_numpy(label[:, 0]),
+                                               iou).numpy())
+        confs.append(pred[:, 4])
+        clss.append(pred[:, 5])
+    tp, conf_all, cls = np.concatenate(tps), np.concatenate(confs), np.concatenate(clss)
+    target = np.concatenate([label[:, 0] for label in labels])
+    result = {}
+    for c in np.unique(target).astype(int):
+        n_l = int((target == c).sum())
+        rows = np.flatnonzero(cls == c)
+        rows = rows[np.argsort(-conf_all[rows], kind='stable')]
+        ap = np.zeros(len(IOU_THRESHOLDS))
+        if len(rows):
+            tpc = tp[rows].cumsum(0)
+            recall = tpc / n_l
+            precision = tpc / np.arange(1, len(rows) + 1)[:, None]
+            ap = np.array([compute_ap(recall[:, k], precision[:, k])[0] for k in range(len(IOU_THRESHOLDS))])
+        result[str(c)] = (int(tp[rows, 0].sum()), len(rows), ap[0], ap.mean())
+    return result
+
+
+@pytest.fixture(scope='module')
+def split():
+    preds, labels = synthetic_split()
+    return preds, labels, PredictionCache(build_cache(preds, labels), {'conf': 0.001, 'iou': CACHE_IOU})
+
+
+@pytest.mark.parametrize('conf', [0.001, 0.3, 0.65])
+def test_matches_ultralytics(split, conf):
+    preds, labels, cache = split
+    ref = reference(preds, labels, conf)
+    metrics = cache.evaluate(conf, CACHE_IOU)
+    assert not metrics.approximate
+    assert {r.name for r in metrics.classes} == set(ref)
+    for r in metrics.classes:
+        tp50, n_preds, ap50, ap50_95 = ref[r.name]
+        assert r.predictions == n_preds
+        assert r.recall * r.labels == pytest.approx(tp50)
+        assert r.ap50 == pytest.approx(ap50, abs=1e-9)
+        assert r.ap50_95 == pytest.approx(ap50_95, abs=1e-9)
+    assert metrics.map50 == pytest.approx(np.mean([v[2] for v in ref.values()]), abs=1e-9)
+
+
+def test_empty_split_and_no_predictions():
+    labels = [np.array([[0, 10, 10, 50, 50]], dtype=np.float32), np.zeros((0, 5), dtype=np.float32)]
+    preds = [np.zeros((0, 6), dtype=np.float32), np.array([[10, 10, 50, 50, 0.9, 0]], dtype=np.float32)]
+    metrics = PredictionCache(build_cache(preds, labels), {'conf': 0.001, 'iou': CACHE_IOU}).evaluate()
+    # Prediction duy nhất nằm ở ảnh không có label -> false positive
+    assert (metrics.images, metrics.labels, metrics.predictions) == (2, 1, 1)
+    assert (metrics.precision, metrics.recall, metrics.map50, metrics.map50_95) == (0.0, 0.0, 0.0, 0.0)
+
+
+def test_lower_nms_iou_is_greedy_nms_of_cached_boxes(split):
+    from torchvision.ops import batched_nms
+
+    preds, labels, cache = split
+    for iou in (0.3, 0.5):
+        kept = 0
+        for pred in preds:
+            pred = pred[np.argsort(-pred[:, 4], kind='stable')]
+            t = torch.from_numpy(pred)
+            kept += len(batched_nms(t[:, :4], t[:, 4], t[:, 5].long(), iou))
+        metrics = cache.evaluate(0.001, iou)
+        assert metrics.approximate
+        assert metrics.predictions == kept
+
+
+def test_lower_nms_iou_is_approximate():
+    from torchvision.ops import nms
+
+    # IoU(A,B)=0.6, IoU(B,C)=0.75, IoU(A,C)~0.44
+    c = 2.5 + 10 / 7
+    raw = np.array([[0, 0, 10, 10, 0.9, 0], [2.5, 0, 12.5, 10, 0.8, 0], [c, 0, c + 10, 10, 0.7, 0]], dtype=np.float32)
+    t = torch.from_numpy(raw)
+    cached = raw[np.sort(nms(t[:, :4], t[:, 4], CACHE_IOU).numpy())]
+    assert len(cached) == 2  # C bị B đè ở 0.7
+    label = np.zeros((0, 5), dtype=np.float32)
+    metrics = PredictionCache(build_cache([cached], [label]), {'conf': 0.001, 'iou': CACHE_IOU}).evaluate(0.001, 0.5)
+    # Chạy lại model ở 0.5 giữ A và C; từ cache chỉ còn A
+    assert len(nms(t[:, :4], t[:, 4], 0.5)) == 2
+    assert metrics.approximate and metrics.predictions == 1
@@ -0,0 +1,83 @@
+"""Tile grid and box merging of tiled_inference against brute-force / torchvision references"""
+
+import numpy as np
+import pytest
+
+from tiled_inference import box_overlap, merge_nms, overlap_pairs, tile_grid
+
+
+def random_dets(n, classes=3, seed=0, size=1000):
+    rng = np.random.default_rng(seed)
+    wh = rng.uniform(5, 120, (n, 2))
+    xy = rng.uniform(0, size - wh)
+    # Conf khác nhau từng đôi: thứ tự của box bằng conf không được torchvision cố định
+    conf = rng.permutation(n) / n + 0.5 / n
+    return np.column_stack([xy, xy + wh, conf, rng.integers(0, classes, n)]).astype(np.float32)
+
+
+def test_tile_grid_edge_alignment():
+    np.testing.assert_array_equal(tile_grid(641, 640), [[0, 0, 640, 640], [1, 0, 641, 640]])
+    np.testing.assert_array_equal(tile_grid(640, 640), [[0, 0, 640, 640]])
+
+
+@pytest.mark.parametrize('width, height', [(300, 200), (300, 1000), (640, 100)])
+def test_tile_grid_smaller_than_tile(width, height):
+    tiles = tile_grid(width, height, tile=640)
+    assert tiles[:, [0, 1]].min() == 0
+    assert (tiles[:, 2] <= width).all() and (tiles[:, 3] <= height).all()
+    if width <= 640 and height <= 640:
+        np.testing.assert_array_equal(tiles, [[0, 0, width, height]])
+    else:
+        assert (tiles[:, 2] - tiles[:, 0] == width).all()
+
+
+@pytest.mark.parametrize('width, height, overlap', [(3840, 2160, 0.2), (1000, 1000, 0.5), (1281, 700, 0.0)])
+def test_tile_grid_covers_image(width, height, overlap):
+    tiles = tile_grid(width, height, tile=640, overlap=overlap)
+    assert ((tiles[:, 2] - tiles[:, 0]) == min(width, 640)).all()
+    assert ((tiles[:, 3] - tiles[:, 1]) == min(height, 640)).all()
+    covered = np.zeros((height, width), dtype=bool)
+    for x0, y0, x1, y1 in tiles:
+        covered[y0:y1, x0:x1] = True
+    assert covered.all()
+    assert tiles[:, 2].max() == width and tiles[:, 3].max() == height
+
+
+@pytest.mark.parametrize('metric', ['iou', 'ios'])
+@pytest.mark.parametrize('threshold', [0.0, 0.3, 0.5, 0.9])
+def test_overlap_pairs_matches_brute_force(metric, threshold):
+    boxes = random_dets(400, seed=1)[:, :4].astype(np.float64)
+    # Thêm box trùng hệt và box chạm cạnh phải (x1 của box mới = x2 của box cũ)
+    touching = boxes[20:40].copy()
+    touching[:, [0, 2]] += touching[:, 2:3] - touching[:, 0:1]
+    boxes = np.concatenate([boxes, boxes[:20], touching])
+    i, j = overlap_pairs(boxes, threshold, metric)
+    overlap = box_overlap(boxes[:, None], boxes[None], metric)
+    ref_i, ref_j = np.nonzero(np.triu(overlap > threshold, 1))
+    assert (i < j).all()
+    assert set(zip(i.tolist(), j.tolist())) == set(zip(ref_i.tolist(), ref_j.tolist()))
+    assert len(i) == len(ref_i)
+
+
+def test_overlap_pairs_empty():
+    i, j = overlap_pairs(np.zeros((0, 4)), 0.5)
+    assert len(i) == len(j) == 0
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.5, 0.7])
+def test_merge_nms_matches_torchvision(threshold):
+    torch = pytest.importorskip('torch')
+    from torchvision.ops import batched_nms
+
+    dets = random_dets(2000, seed=2)
+    t = torch.from_numpy(dets)
+    keep = batched_nms(t[:, :4], t[:, 4], t[:, 5].long(), threshold).numpy()
+    merged = merge_nms(dets, threshold, metric='iou')
+    # Cả hai trả về theo conf giảm dần
+    np.testing.assert_array_equal(merged, dets[keep])
+
+
+def test_merge_nms_small_inputs():
+    assert len(merge_nms(np.zeros((0, 6), dtype=np.float32))) == 0
+    one = random_dets(1)
+    np.testing.assert_array_equal(merge_nms(one), one)
@@ -0,0 +1,141 @@
+"""
+Thumbnail Cache
+Tạo thumbnail cho ảnh kết quả (plots, train/val batch) bằng thread pool, dùng
+JPEG draft + Image.thumbnail để không decode full độ phân giải. Thumbnail được
+lưu trên đĩa (PNG, Tk đọc trực tiếp) với key = đường dẫn + mtime + size, nên
+mở lại một run đã xem gần như tức thì.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+THUMB_SIZE = 192
+THUMB_WORKERS = 4
+# Xóa bớt thumbnail cũ nhất khi cache vượt quá dung lượng này
+MAX_CACHE_BYTES = 256 * 2**20
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+@dataclass
+class ThumbnailReady:
+    path: str
+    thumb_path: str = ''
+    error: str = ''
+
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'YOLOTrainingStudio', 'thumbnails')
+
+
+def list_result_images(directory):
+    """Images of a run directory: plots first, then train/val batch mosaics"""
+    try:
+        names = [e.name for e in os.scandir(directory)
+                 if e.is_file() and e.name.lower().endswith(IMAGE_SUFFIXES)]
+    except OSError:
+        return []
+    # Ảnh batch (train_batch*.jpg, val_batch*) sau các biểu đồ
+    names.sort(key=lambda n: ('batch' in n, n.lower()))
+    return [os.path.join(directory, n) for n in names]
+
+
+def thumb_path_for(path, size, cache_dir):
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{size}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, digest[:2], digest + '.png')
+
+
+def make_thumbnail(path, size=THUMB_SIZE, cache_dir=None):
+    """Return the cached thumbnail of path, creating it if needed"""
+    from PIL import Image, ImageOps
+
+    thumb = thumb_path_for(path, size, cache_dir or default_cache_dir())
+    if os.path.exists(thumb):
+        return thumb
+    with Image.open(path) as im:
+        if im.format == 'JPEG':
+            # Decoder JPEG giảm 1/2..1/8 ngay khi decode
+            im.draft('RGB', (size, size))
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'transparency' in im.info else 'RGB')
+        os.makedirs(os.path.dirname(thumb), exist_ok=True)
+        # Ghi file tạm rồi đổi tên: thread khác không bao giờ đọc phải PNG dở dang
+        tmp = f"{thumb}.{threading.get_ident()}.tmp"
+        im.save(tmp, 'PNG')
+    os.replace(tmp, thumb)
+    return thumb
+
+
+def prune_cache(cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """Delete the least recently written thumbnails above max_bytes; returns files removed"""
+    cache_dir = cache_dir or default_cache_dir()
+    files = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class ThumbnailLoader:
+    """Generates thumbnails on a thread pool.
+
+    on_ready(ThumbnailReady) is called from a worker thread. Requests for a
+    path already pending are ignored; cancel_pending() drops queued work
+    when the user switches to another run.
+    """
+
+    def __init__(self, on_ready, size=THUMB_SIZE, cache_dir=None, workers=THUMB_WORKERS):
+        self.on_ready = on_ready
+        self.size = size
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def request(self, path):
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending[path] = self.executor.submit(self._load, path)
+
+    def _load(self, path):
+        try:
+            ready = ThumbnailReady(path, make_thumbnail(path, self.size, self.cache_dir))
+        except Exception as e:
+            ready = ThumbnailReady(path, error=str(e))
+        with self._lock:
+            self._pending.pop(path, None)
+        self.on_ready(ready)
+
+    def cancel_pending(self):
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if future.cancel():
+                    del self._pending[path]
+
+    def shutdown(self):
+        self.cancel_pending()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,169 @@
+"""
+Tiled Inference
+Inference kiểu SAHI cho ảnh độ phân giải cao (camera 4K, người ở xa rất nhỏ):
+cắt ảnh thành các tile chồng lấn, đưa tile qua model theo batch (một lần
+forward cho nhiều tile), dịch box về tọa độ ảnh gốc rồi gộp các box trùng ở
+biên tile bằng NMS hoặc WBF (các cặp box chồng nhau tính vector hóa bằng numpy).
+"""
+
+import numpy as np
+
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2
+TILE_BATCH = 16
+MERGE_METHODS = ('nms', 'wbf')
+# IoS (giao / box nhỏ hơn): box bị cắt ở biên tile nằm gọn trong box đầy đủ
+MATCH_METRICS = ('ios', 'iou')
+MATCH_THRESHOLD = 0.5
+
+
+def tile_grid(width, height, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """(N, 4) int array of x0, y0, x1, y1 tiles covering the image; the last row/column ends at the edge"""
+    def starts(length):
+        if length <= tile:
+            return np.zeros(1, dtype=np.int64)
+        stride = max(1, int(tile * (1 - overlap)))
+        return np.append(np.arange(0, length - tile, stride), length - tile)
+
+    x0, y0 = (a.ravel() for a in np.meshgrid(starts(width), starts(height)))
+    return np.stack([x0, y0, np.minimum(x0 + tile, width), np.minimum(y0 + tile, height)], axis=1)
+
+
+def box_overlap(a, b, metric='iou'):
+    """IoU or IoS of xyxy boxes; a and b broadcast, e.g. (M, 1, 4) x (1, N, 4) -> (M, N)"""
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    lt = np.maximum(a[..., :2], b[..., :2])
+    rb = np.minimum(a[..., 2:4], b[..., 2:4])
+    inter = np.clip(rb - lt, 0, None).prod(axis=-1)
+    if metric == 'ios':
+        denom = np.minimum(area_a, area_b)
+    else:
+        denom = area_a + area_b - inter
+    return inter / np.maximum(denom, 1e-9)
+
+
+def overlap_pairs(boxes, threshold, metric='iou'):
+    """(i, j) index arrays, i < j, of every box pair overlapping above threshold.
+
+    Boxes are swept in x1 order: a box can only overlap the boxes starting
+    before its right edge, so candidate pairs are generated with one
+    searchsorted instead of an N x N matrix.
+    """
+    n = len(boxes)
+    order = np.argsort(boxes[:, 0], kind='stable')
+    x1 = boxes[order, 0]
+    first = np.arange(1, n + 1)
+    counts = np.maximum(np.searchsorted(x1, boxes[order, 2], side='left') - first, 0)
+    left = np.repeat(np.arange(n), counts)
+    right = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    a, b = order[left], order[right]
+    matched = box_overlap(boxes[a], boxes[b], metric) > threshold
+    a, b = a[matched], b[matched]
+    return np.minimum(a, b), np.maximum(a, b)
+
+
+def _greedy_clusters(dets, threshold, metric):
+    """Yield (sorted dets, member indexes): the most confident unassigned box and every
+    unassigned box of the same class overlapping it above threshold."""
+    dets = dets[np.argsort(-dets[:, 4], kind='stable')]
+    # Dịch box theo class trên trục x: box khác class không bao giờ chồng nhau
+    boxes = dets[:, :4].astype(np.float64)
+    boxes[:, [0, 2]] += dets[:, 5:6] * (float(np.abs(boxes).max()) + 1)
+    i, j = overlap_pairs(boxes, threshold, metric)
+    order = np.argsort(i, kind='stable')
+    i, j = i[order], j[order]
+    indptr = np.searchsorted(i, np.arange(len(dets) + 1))
+    assigned = np.zeros(len(dets), dtype=bool)
+    for k in range(len(dets)):
+        if assigned[k]:
+            continue
+        neighbours = j[indptr[k]:indptr[k + 1]]
+        members = np.append(k, neighbours[~assigned[neighbours]])
+        assigned[members] = True
+        yield dets, members
+
+
+def merge_nms(dets, threshold=MATCH_THRESHOLD, metric='ios'):
+    """Class-aware greedy NMS over (N, 6) x1, y1, x2, y2, conf, cls detections"""
+    if len(dets) < 2:
+        return dets
+    keep = [(sorted_dets, members[0]) for sorted_dets, members in _greedy_clusters(dets, threshold, metric)]
+    return keep[0][0][[i for _, i in keep]]
+
+
+def merge_wbf(dets, threshold=MATCH_THRESHOLD, metric='ios'):
+    """Class-aware weighted box fusion: each cluster becomes its confidence-weighted mean box.
+
+    The fused confidence is the cluster maximum, so a box cut by a tile
+    border does not lower the score of the whole object. NMS keeps the
+    most confident box unchanged and is usually better for tile merging.
+    """
+    if len(dets) < 2:
+        return dets
+    fused = []
+    for sorted_dets, members in _greedy_clusters(dets, threshold, metric):
+        cluster = sorted_dets[members]
+        weights = cluster[:, 4:5]
+        box = (cluster[:, :4] * weights).sum(axis=0) / weights.sum()
+        fused.append(np.concatenate([box, cluster[0, 4:6]]))
+    return np.array(fused, dtype=dets.dtype)
+
+
+def merge_detections(dets, method='nms', threshold=MATCH_THRESHOLD, metric='ios'):
+    if method == 'wbf':
+        return merge_wbf(dets, threshold, metric)
+    return merge_nms(dets, threshold, metric)
+
+
+def _boxes(result):
+    """(N, 6) float32 x1, y1, x2, y2, conf, cls of one ultralytics Results"""
+    if result.boxes is None:
+        return np.zeros((0, 6), dtype=np.float32)
+    return result.boxes.data.cpu().numpy().astype(np.float32)[:, :6]
+
+
+def predict_tiled(model, images, tile=TILE_SIZE, overlap=TILE_OVERLAP, merge='nms',
+                  threshold=MATCH_THRESHOLD, metric='ios', include_full=True, tile_batch=TILE_BATCH,
+                  **predict_args):
+    """Sliced inference on a list of BGR images.
+
+    Tiles of every image are batched together, tile_batch per forward pass,
+    at imgsz = tile so small objects keep their pixels. include_full adds a
+    whole-image pass for objects larger than a tile. Returns (list of (N, 6)
+    detection arrays, number of tiles).
+    """
+    crops, owners = [], []
+    for k, image in enumerate(images):
+        height, width = image.shape[:2]
+        for x0, y0, x1, y1 in tile_grid(width, height, tile, overlap).tolist():
+            crops.append(np.ascontiguousarray(image[y0:y1, x0:x1]))
+            owners.append((k, x0, y0))
+
+    parts = [[] for _ in images]
+    tile_args = dict(predict_args, imgsz=tile)
+    for start in range(0, len(crops), tile_batch):
+        results = model.predict(crops[start:start + tile_batch], **tile_args)
+        for (k, x0, y0), result in zip(owners[start:start + tile_batch], results):
+            dets = _boxes(result)
+            if len(dets):
+                dets[:, [0, 2]] += x0
+                dets[:, [1, 3]] += y0
+                parts[k].append(dets)
+    if include_full:
+        for k, result in enumerate(model.predict(list(images), **predict_args)):
+            parts[k].append(_boxes(result))
+
+    merged = []
+    for chunks in parts:
+        dets = np.concatenate(chunks) if chunks else np.zeros((0, 6), dtype=np.float32)
+        merged.append(merge_detections(dets, merge, threshold, metric))
+    return merged, len(crops)
+
+
+def to_results(image, dets, names, path=''):
+    """Wrap merged detections in an ultralytics Results (plot(), boxes, ...)"""
+    import torch
+    from ultralytics.engine.results import Results
+
+    return Results(image, path=path, names=names, boxes=torch.from_numpy(np.ascontiguousarray(dets)))
@@ -0,0 +1,479 @@
+"""
+Training Backend
+Chạy YOLO(...).train() trong worker process (multiprocessing) và gửi metrics
+có cấu trúc về giao diện qua pipe bằng callbacks của ultralytics.
+Worker có thể được giữ "warm" giữa các lần chạy: torch/ultralytics đã import
+sẵn và base weights đã load, job mới được gửi qua pipe lệnh.
+"""
+
+import ast
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+
+from metrics_parser import EpochStart, BatchProgress, ValMetrics, BestFitness
+from dataset_pack import is_packed_yaml, packed_trainer_class
+
+# Tham số luôn giữ dạng chuỗi (device "0" khác với "0,1", "cpu", ...)
+STRING_PARAMS = ('optimizer', 'device')
+
+# Gửi tiến độ batch tối đa ~10 lần/giây
+BATCH_EVENT_INTERVAL = 0.1
+# Sau terminate(), đợi ngần này giây rồi mới kill() worker
+KILL_AFTER_SECONDS = 10
+
+
+@dataclass
+class TrainingJob:
+    model: str
+    train_args: dict = field(default_factory=dict)
+    torch_threads: int = 0
+    # Khi dừng êm (request_stop): có chạy validation cho epoch cuối hay không
+    validate_on_stop: bool = True
+
+
+@dataclass
+class LogOutput:
+    text: str
+
+
+@dataclass
+class TrainingFinished:
+    ok: bool
+    error: str = ''
+    save_dir: str = ''
+    # Dừng êm theo yêu cầu: epoch cuối đã xong và last.pt đã lưu (resume được)
+    stopped: bool = False
+    epoch: int = 0
+
+
+@dataclass
+class WorkerReady:
+    import_seconds: float
+    error: str = ''
+
+
+@dataclass
+class FirstBatch:
+    seconds: float
+    warm: bool
+
+
+@dataclass
+class WorkerExited:
+    exitcode: int
+
+
+def parse_param_value(key, value):
+    """Convert a parameter entry from the GUI/config into a Python value"""
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if key in STRING_PARAMS:
+        return value
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def build_train_args(dataset, params, bool_params, run_dir=None):
+    """Build model.train() keyword arguments from the Setup tab values"""
+    args = {'data': dataset}
+    for key, value in params.items():
+        args[key] = parse_param_value(key, value)
+    for key, value in bool_params.items():
+        args[key] = bool(value)
+    if run_dir is not None:
+        args['project'] = str(run_dir.parent)
+        args['name'] = run_dir.name
+        args['exist_ok'] = True
+    return args
+
+
+def resume_job(checkpoint, overrides=None, torch_threads=0):
+    """Job that continues an interrupted run from its weights/last.pt.
+
+    Epochs, dataset and hyperparameters come from the checkpoint; overrides
+    may only change what ultralytics allows on resume (device, workers, ...).
+    """
+    return TrainingJob(str(checkpoint), dict(overrides or {}, resume=True), torch_threads)
+
+
+class StopRequested(Exception):
+    """Raised from a trainer callback to leave model.train() after a checkpoint"""
+
+    def __init__(self, epoch):
+        super().__init__(f"stopped after epoch {epoch}")
+        self.epoch = epoch
+
+
+def _install_atomic_save(trainer):
+    """Make trainer.save_model() write last.pt/best.pt via a temp file + os.replace.
+
+    A process killed while saving then leaves the previous checkpoint intact
+    instead of a truncated one.
+    """
+    save_model = trainer.save_model
+
+    def atomic_save_model():
+        last, best = trainer.last, trainer.best
+        tmp_last, tmp_best = last.with_name(f".{last.name}.tmp"), best.with_name(f".{best.name}.tmp")
+        # Temp file còn sót từ lần crash trước có thể bị ghi dở: xóa để không bao giờ đè lên checkpoint tốt
+        for tmp in (tmp_last, tmp_best):
+            tmp.unlink(missing_ok=True)
+        trainer.last, trainer.best = tmp_last, tmp_best
+        try:
+            result = save_model()
+        finally:
+            trainer.last, trainer.best = last, best
+        # Chỉ còn các temp file vừa được save_model() ghi xong
+        for tmp, path in ((tmp_last, last), (tmp_best, best)):
+            if tmp.exists():
+                os.replace(tmp, path)
+        return result
+
+    trainer.save_model = atomic_save_model
+
+
+class _PipeWriter:
+    """File-like object that forwards console output over the pipe"""
+
+    encoding = 'utf-8'
+    errors = 'replace'
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        if text:
+            with self.lock:
+                self.conn.send(LogOutput(text))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def writable(self):
+        return True
+
+
+def _register_callbacks(model, conn, job_started, warm, stop_event=None, validate_on_stop=True):
+    """Push structured progress from the ultralytics trainer over the pipe.
+
+    When stop_event is set the current epoch is finished, saved, and then
+    StopRequested is raised so the run can be resumed from last.pt.
+    """
+    state = {'batch': 0, 'last_sent': 0.0, 'first_batch': True, 'validated': False, 'in_epoch': False,
+             'best_sent': None}
+
+    def stop_requested():
+        return stop_event is not None and stop_event.is_set()
+
+    def restore_val(trainer):
+        if 'restore_val' in state:
+            trainer.args.val = state.pop('restore_val')
+
+    def on_pretrain_routine_start(trainer):
+        _install_atomic_save(trainer)
+        validate, save_model = trainer.validate, trainer.save_model
+
+        def tracked_validate():
+            state['validated'] = True
+            return validate()
+
+        def guarded_save_model():
+            # train_args trong checkpoint phải giữ val gốc, nếu không run resume sẽ bỏ val mọi epoch
+            restore_val(trainer)
+            if state['validated']:
+                return save_model()
+            # fitness còn là của epoch trước: NaN không bao giờ bằng best_fitness nên best.pt giữ nguyên
+            fitness, trainer.fitness = trainer.fitness, float('nan')
+            try:
+                return save_model()
+            finally:
+                trainer.fitness = fitness
+
+        trainer.validate, trainer.save_model = tracked_validate, guarded_save_model
+
+    def batch_progress(trainer):
+        # tloss là tensor (ultralytics 8.3) hoặc dict theo tên loss (các bản mới hơn)
+        tloss = trainer.tloss
+        if isinstance(tloss, dict):
+            losses = {k: float(v) for k, v in tloss.items()}
+        elif tloss is not None:
+            values = tloss.tolist()
+            values = values if isinstance(values, list) else [values]
+            losses = dict(zip(trainer.loss_names, values))
+        else:
+            losses = {}
+        memory = getattr(trainer, '_get_memory', lambda: 0)()
+        return BatchProgress(trainer.epoch + 1, trainer.epochs, state['batch'],
+                             len(trainer.train_loader), losses, f"{memory:.3g}G")
+
+    def on_train_start(trainer):
+        # Resume: best_fitness của checkpoint không phải là thay đổi mới
+        state['best_sent'] = trainer.best_fitness
+
+    def on_train_epoch_start(trainer):
+        state['batch'] = 0
+        state['validated'] = False
+        state['in_epoch'] = True
+        conn.send(EpochStart(trainer.epoch + 1, trainer.epochs))
+
+    def on_train_batch_end(trainer):
+        state['batch'] += 1
+        if state['first_batch']:
+            state['first_batch'] = False
+            conn.send(FirstBatch(time.perf_counter() - job_started, warm))
+        now = time.monotonic()
+        if now - state['last_sent'] >= BATCH_EVENT_INTERVAL:
+            state['last_sent'] = now
+            conn.send(batch_progress(trainer))
+
+    def on_train_epoch_end(trainer):
+        # Loss trung bình chính xác của cả epoch
+        conn.send(batch_progress(trainer))
+        if stop_requested() and not validate_on_stop:
+            # Chỉ tắt val cho epoch này; args gốc được trả lại trước khi lưu checkpoint
+            state['restore_val'] = trainer.args.val
+            trainer.args.val = False
+
+    def on_fit_epoch_end(trainer):
+        restore_val(trainer)
+        # final_eval() gọi lại callback này với metrics của best.pt (epoch + 1) ngoài mọi epoch: bỏ qua
+        if not state['in_epoch']:
+            return
+        metrics = trainer.metrics or {}
+        if not state['validated'] or 'metrics/mAP50-95(B)' not in metrics:
+            return
+        epoch = trainer.epoch + 1
+        conn.send(ValMetrics(epoch,
+                             float(metrics.get('metrics/precision(B)', 0)),
+                             float(metrics.get('metrics/recall(B)', 0)),
+                             float(metrics.get('metrics/mAP50(B)', 0)),
+                             float(metrics['metrics/mAP50-95(B)'])))
+        best = trainer.best_fitness
+        if best is not None and (state['best_sent'] is None or best > state['best_sent']):
+            state['best_sent'] = best
+            conn.send(BestFitness(epoch, float(best)))
+
+    def on_fit_epoch_end_stop(trainer):
+        in_epoch, state['in_epoch'] = state['in_epoch'], False
+        # Chạy sau save_model(); epoch cuối cùng thì để ultralytics kết thúc bình thường
+        if in_epoch and stop_requested() and trainer.epoch + 1 < trainer.epochs:
+            raise StopRequested(trainer.epoch + 1)
+
+    model.add_callback('on_pretrain_routine_start', on_pretrain_routine_start)
+    model.add_callback('on_train_start', on_train_start)
+    model.add_callback('on_train_epoch_start', on_train_epoch_start)
+    model.add_callback('on_train_batch_end', on_train_batch_end)
+    model.add_callback('on_train_epoch_end', on_train_epoch_end)
+    model.add_callback('on_fit_epoch_end', on_fit_epoch_end)
+    model.add_callback('on_fit_epoch_end', on_fit_epoch_end_stop)
+
+
+def _run_job(conn, job, model, warm, job_started, stop_event=None):
+    if stop_event is not None:
+        stop_event.clear()
+    try:
+        if job.torch_threads:
+            import torch
+            torch.set_num_threads(job.torch_threads)
+        if model is None:
+            from ultralytics import YOLO
+            model = YOLO(job.model)
+        _register_callbacks(model, conn, job_started, warm, stop_event, job.validate_on_stop)
+        train_args = dict(job.train_args)
+        data = train_args.get('data', '')
+        if train_args.get('resume'):
+            ckpt = getattr(model, 'ckpt', None) or {}
+            # Checkpoint đã strip (run xong) -> ultralytics sẽ train lại từ đầu, nên báo lỗi
+            if ckpt.get('optimizer') is None or ckpt.get('epoch', -1) < 0:
+                raise RuntimeError(f"{job.model} cannot be resumed: the run already finished "
+                                   "or the checkpoint has no optimizer state")
+            data = data or (ckpt.get('train_args') or {}).get('data', '')
+        if is_packed_yaml(data):
+            # Dataset dạng shard (dataset_pack) cần trainer đọc được file .pack.npz
+            train_args['trainer'] = packed_trainer_class()
+        model.train(**train_args)
+        save_dir = str(model.trainer.save_dir) if model.trainer else ''
+        conn.send(TrainingFinished(True, save_dir=save_dir))
+    except StopRequested as e:
+        save_dir = str(model.trainer.save_dir) if model.trainer else ''
+        conn.send(TrainingFinished(False, save_dir=save_dir, stopped=True, epoch=e.epoch))
+    except BaseException:
+        conn.send(TrainingFinished(False, error=traceback.format_exc()))
+
+
+def _worker_main(conn, commands, stop_event=None):
+    """Entry point of the training worker process.
+
+    Commands received on `commands`: ('preload', model_path), ('train', job)
+    and None to exit. stop_event asks the running job to stop after the
+    current epoch.
+    """
+    # Ctrl+C trong terminal gửi SIGINT cho cả process group: process cha quyết định cách dừng
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Chuyển hướng console trước khi import ultralytics để LOGGER ghi vào pipe
+    sys.stdout = sys.stderr = _PipeWriter(conn)
+    start = time.perf_counter()
+    try:
+        from ultralytics import YOLO
+    except BaseException:
+        conn.send(WorkerReady(time.perf_counter() - start, error=traceback.format_exc()))
+        conn.close()
+        return
+    conn.send(WorkerReady(time.perf_counter() - start))
+
+    preload_path = None
+    preloaded = None
+    jobs_done = 0
+
+    def preload(path):
+        try:
+            return YOLO(path)
+        except Exception as e:
+            print(f"⚠ Could not preload {path}: {e}")
+            return None
+
+    try:
+        while True:
+            command = commands.recv()
+            if command is None:
+                break
+            action, arg = command
+            if action == 'preload':
+                if arg != preload_path or preloaded is None:
+                    preload_path, preloaded = arg, preload(arg)
+            elif action == 'train':
+                job_started = time.perf_counter()
+                model = preloaded if preloaded is not None and arg.model == preload_path else None
+                # Job đầu tiên của worker vừa spawn chưa được tính là "warm"
+                warm = jobs_done > 0 or model is not None
+                _run_job(conn, arg, model, warm, job_started, stop_event)
+                jobs_done += 1
+                # model.train() thay đổi model -> load lại base weights khi rảnh
+                preloaded = None
+                if preload_path:
+                    preloaded = preload(preload_path)
+    except EOFError:
+        pass
+    finally:
+        conn.close()
+
+
+class TrainingWorker:
+    """Training worker process that accepts jobs over a command pipe.
+
+    Every message from the worker (WorkerReady, LogOutput, metric events,
+    FirstBatch, TrainingFinished, WorkerExited) is passed to on_message from
+    a background reader thread. A one-shot worker is start() + submit() +
+    shutdown(); a warm worker simply stays alive between submit() calls.
+
+    request_stop() ends the running job after its current epoch (checkpoint
+    saved, worker stays alive); stop() terminates the process.
+    """
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.process = None
+        self.busy = False
+        self._conn = None
+        self._commands = None
+        self._reader = None
+        self._stop_event = None
+        self._import_error = ''
+
+    def start(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe(duplex=False)
+        child_commands, self._commands = ctx.Pipe(duplex=False)
+        self._stop_event = ctx.Event()
+        # Không dùng daemon: dataloader của ultralytics cần tạo process con
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, child_commands, self._stop_event),
+                                   name="yolo-training-worker")
+        self.process.start()
+        child_conn.close()
+        child_commands.close()
+
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+    def _send(self, command):
+        try:
+            self._commands.send(command)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def preload(self, model_path):
+        """Load base weights in the worker ahead of the next job"""
+        self._send(('preload', model_path))
+
+    def submit(self, job):
+        self.busy = True
+        if not self._send(('train', job)):
+            self.busy = False
+            raise RuntimeError("Training worker is not running")
+
+    def shutdown(self):
+        """Ask the worker to exit once the current job is done"""
+        self._send(None)
+
+    def _read_messages(self):
+        try:
+            while True:
+                message = self._conn.recv()
+                if isinstance(message, WorkerReady) and message.error:
+                    self._import_error = message.error
+                if isinstance(message, TrainingFinished):
+                    self.busy = False
+                self.on_message(message)
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._conn.close()
+            self.process.join()
+            if self.busy:
+                self.busy = False
+                self.on_message(TrainingFinished(
+                    False, error=self._import_error or
+                    f"Training worker exited with code {self.process.exitcode}"))
+            self.on_message(WorkerExited(self.process.exitcode))
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def request_stop(self):
+        """Ask the running job to stop once the current epoch is saved"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def stop(self, kill_after=KILL_AFTER_SECONDS):
+        """Terminate the worker process, killing it if it is still alive after kill_after seconds"""
+        if not self.is_alive():
+            return
+        self.process.terminate()
+        if kill_after is not None:
+            threading.Thread(target=self._kill_if_alive, args=(kill_after,), daemon=True).start()
+
+    def _kill_if_alive(self, timeout):
+        # Đợi qua sentinel để không tranh process.join() với reader thread
+        multiprocessing.connection.wait([self.process.sentinel], timeout)
+        if self.process.exitcode is None:
+            self.process.kill()
+
+    def join(self, timeout=None):
+        if self._reader:
+            self._reader.join(timeout)
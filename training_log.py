@@ -0,0 +1,339 @@
+"""
+Training Log
+Hàng đợi log an toàn luồng giữa tiến trình training và giao diện Tk
+"""
+
+import codecs
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from pathlib import Path
+
+# Mặc định: flush 10 lần/giây, tối đa 500 dòng mỗi lần
+DEFAULT_FLUSH_INTERVAL_MS = 100
+DEFAULT_MAX_LINES_PER_FLUSH = 500
+
+# Số dòng tối đa giữ trong widget, phần còn lại chỉ nằm trên đĩa
+DEFAULT_MAX_WIDGET_LINES = 5000
+
+LOG_BASENAME = "train_log"
+DEFAULT_SEGMENT_BYTES = 10 * 1024 * 1024
+
+# Chế độ của message trong queue
+APPEND, COMMIT, PROGRESS = 0, 1, 2
+
+_LINE_BREAK = re.compile(r'(\r\n|\r|\n)')
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+
+
+def next_run_dir(project="runs/detect", name="train"):
+    """Return the run directory ultralytics would create next (train, train2, ...)"""
+    project = Path(project).resolve()
+    path = project / name
+    n = 2
+    while path.exists():
+        path = project / f"{name}{n}"
+        n += 1
+    return path
+
+
+def log_segments(directory, basename=LOG_BASENAME):
+    """List spilled log segments in a run directory, oldest first"""
+    return sorted(Path(directory).glob(f"{basename}.*.log"))
+
+
+class ConsoleLineSplitter:
+    """Incremental console splitter that understands '\\r' progress rewrites.
+
+    feed() returns a list of (kind, text) events:
+      ('line', text)      - a finished line, including its trailing newline
+      ('progress', text)  - the current state of a line rewritten with '\\r'
+    Only the latest progress state of each chunk is reported, so a tqdm bar
+    redrawn hundreds of times between two reads costs a single event.
+    With raw=True every '\\r' segment is reported as its own line instead.
+    """
+
+    def __init__(self, raw=False):
+        self.raw = raw
+        self._partial = ''
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, data):
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        if not data:
+            return []
+        data = _ANSI_ESCAPE.sub('', data)
+
+        events = []
+        progress = None
+        parts = _LINE_BREAK.split(self._partial + data)
+        self._partial = parts.pop()
+
+        for text, sep in zip(parts[0::2], parts[1::2]):
+            if sep == '\r' and not self.raw:
+                if text:
+                    progress = text
+            elif text or sep != '\r':
+                events.append(('line', text + '\n'))
+                progress = None
+
+        if self._partial and not self.raw:
+            progress = self._partial
+        if progress is not None:
+            events.append(('progress', progress))
+        return events
+
+    def close(self):
+        """Flush whatever is left after the stream ends"""
+        tail = self._decoder.decode(b'', final=True)
+        text, self._partial = self._partial + tail, ''
+        return [('line', text + '\n')] if text else []
+
+
+class LogSpool:
+    """Append-only training log on disk, split into fixed-size segments"""
+
+    def __init__(self, directory, basename=LOG_BASENAME,
+                 segment_bytes=DEFAULT_SEGMENT_BYTES):
+        self.directory = Path(directory)
+        self.basename = basename
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._index = len(log_segments(self.directory, basename))
+        self._size = 0
+
+    def _open_next(self):
+        if self._file:
+            self._file.close()
+        self._index += 1
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.basename}.{self._index:03d}.log"
+        self._file = open(path, 'ab')
+        self._size = self._file.tell()
+
+    def write(self, text):
+        data = text.encode('utf-8', errors='replace')
+        with self._lock:
+            if self._file is None or (self._size and self._size + len(data) > self.segment_bytes):
+                self._open_next()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class LogPager:
+    """Read spilled log lines backwards, one page at a time"""
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, directory, basename=LOG_BASENAME):
+        self.segments = log_segments(directory, basename)
+        self._seg = len(self.segments) - 1
+        self._pos = None
+
+    @property
+    def exhausted(self):
+        return self._seg < 0 or (self._seg == 0 and self._pos == 0)
+
+    def older(self, count):
+        """Return up to `count` lines preceding the current position, oldest first"""
+        lines = []
+        while len(lines) < count and self._seg >= 0:
+            path = self.segments[self._seg]
+            if self._pos is None:
+                self._pos = os.path.getsize(path)
+            if self._pos == 0:
+                self._seg -= 1
+                self._pos = None
+                continue
+            page, self._pos = self._read_back(path, self._pos, count - len(lines))
+            lines[:0] = page
+        return lines
+
+    def _read_back(self, path, end, count):
+        block = self.BLOCK_SIZE
+        with open(path, 'rb') as f:
+            while True:
+                start = max(0, end - block)
+                f.seek(start)
+                data = f.read(end - start)
+
+                # Tìm vị trí bắt đầu của `count` dòng cuối trong block
+                starts = []
+                p = len(data) - 1 if data.endswith(b'\n') else len(data)
+                while len(starts) < count:
+                    q = data.rfind(b'\n', 0, p)
+                    if q == -1:
+                        break
+                    starts.append(q + 1)
+                    p = q
+                if len(starts) < count and start == 0:
+                    starts.append(0)
+
+                if len(starts) == count or start == 0:
+                    first = starts[-1] if starts else 0
+                    text = data[first:].decode('utf-8', errors='replace')
+                    return text.splitlines(), start + first
+                block *= 2
+
+
+class LogPump:
+    """Queue-driven log pump feeding a Tk text widget.
+
+    Producer threads call put(); the Tk main loop drains the queue on a
+    root.after tick and writes every pending message with a single insert.
+    Console output goes through put_line()/put_progress(): progress states
+    replace the live last line of the widget instead of appending to it.
+    """
+
+    def __init__(self, root, widget,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 max_lines_per_flush=DEFAULT_MAX_LINES_PER_FLUSH,
+                 max_widget_lines=DEFAULT_MAX_WIDGET_LINES):
+        self.root = root
+        self.widget = widget
+        self.flush_interval_ms = flush_interval_ms
+        self.max_lines_per_flush = max_lines_per_flush
+        self.max_widget_lines = max_widget_lines
+        self.queue = queue.SimpleQueue()
+        self.spool = None
+        self._after_id = None
+        self._live_text = None
+
+        # Dòng "live" (progress bar) luôn nằm cuối widget, bắt đầu tại mark này
+        self.widget.mark_set('live_start', 'end-1c')
+        self.widget.mark_gravity('live_start', tk.LEFT)
+
+    def configure(self, flush_interval_ms=None, max_lines_per_flush=None,
+                  max_widget_lines=None):
+        """Change flush interval, batch size and widget capacity"""
+        if flush_interval_ms is not None:
+            self.flush_interval_ms = max(10, int(flush_interval_ms))
+        if max_lines_per_flush is not None:
+            self.max_lines_per_flush = max(1, int(max_lines_per_flush))
+        if max_widget_lines is not None:
+            self.max_widget_lines = max(100, int(max_widget_lines))
+
+    def set_spool(self, spool):
+        """Stream every flushed message to `spool` (None to stop spilling)"""
+        self.flush()
+        if self.spool:
+            self.spool.close()
+        self.spool = spool
+
+    def put(self, message, tag='info'):
+        """Queue a message (safe to call from any thread)"""
+        self.queue.put((message, tag, APPEND))
+
+    def put_line(self, message, tag='info'):
+        """Queue a finished console line; it replaces the live progress line"""
+        self.queue.put((message, tag, COMMIT))
+
+    def put_progress(self, message, tag='info'):
+        """Queue the current state of a '\\r'-rewritten console line"""
+        self.queue.put((message, tag, PROGRESS))
+
+    def start(self):
+        """Start the periodic flush loop"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.flush_interval_ms, self._tick)
+
+    def stop(self):
+        """Stop the flush loop and write what is still pending"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.flush()
+
+    def clear(self):
+        """Drop pending messages and clear the widget"""
+        self._drain(None)
+        self.widget.delete(1.0, tk.END)
+        self._live_text = None
+
+    def _tick(self):
+        try:
+            self.flush()
+        finally:
+            self._after_id = self.root.after(self.flush_interval_ms, self._tick)
+
+    def _drain(self, limit):
+        items = []
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def flush(self):
+        """Write pending messages to the widget (Tk main thread only)"""
+        items = self._drain(self.max_lines_per_flush)
+        if not items:
+            return
+
+        # Gộp các message liên tiếp cùng tag -> một lần insert duy nhất.
+        # Progress chỉ giữ trạng thái cuối cùng; dòng commit thay thế nó.
+        args = []
+        live = None
+        replace_widget_live = False
+        widget_live = self._live_text is not None
+
+        def append(message, tag):
+            if args and args[-1] == tag:
+                args[-2] += message
+            else:
+                args.extend([message, tag])
+
+        for message, tag, mode in items:
+            if mode == APPEND and live is not None:
+                append(live[0] + '\n', live[1])
+            if widget_live:
+                if mode == APPEND:
+                    # Dòng live trong widget trở thành dòng thường
+                    self._spool_write(self._live_text + '\n')
+                else:
+                    replace_widget_live = True
+                widget_live = False
+            if mode == PROGRESS:
+                live = (message, tag)
+            else:
+                live = None
+                append(message, tag)
+
+        self._spool_write("".join(args[0::2]))
+
+        if replace_widget_live:
+            self.widget.delete('live_start', 'end-1c')
+        if args:
+            self.widget.insert(tk.END, *args)
+        if live is not None:
+            self.widget.mark_set('live_start', 'end-1c')
+            self.widget.insert(tk.END, live[0] + '\n', live[1])
+            self._live_text = live[0]
+        else:
+            self._live_text = None
+
+        self._trim()
+        self.widget.see(tk.END)
+
+    def _spool_write(self, text):
+        if self.spool and text:
+            self.spool.write(text)
+
+    def _trim(self):
+        # Ring buffer: chỉ giữ max_widget_lines dòng cuối trong widget
+        lines = int(self.widget.index('end-1c').split('.')[0])
+        excess = lines - self.max_widget_lines
+        if excess > 0:
+            self.widget.delete('1.0', f'{excess + 1}.0')
@@ -0,0 +1,575 @@
+"""
+YOLO Training CLI
+Chạy training không cần giao diện (server headless, batch scheduler, benchmark)
+với cùng file config JSON mà tab Setup lưu ra (Save Config).
+
+Usage:
+    python -m yolo_cli train --config my_config.json
+    python -m yolo_cli train --config my_config.json --set epochs=10 --set device=0
+    python -m yolo_cli train --config my_config.json --retries 3
+    python -m yolo_cli resume --run runs/detect/train3
+    python -m yolo_cli scan --data path/to/data.yaml
+    python -m yolo_cli autotune --config my_config.json
+    python -m yolo_cli resize --data path/to/data.yaml --max-side 768
+    python -m yolo_cli pack --data path/to/data.yaml
+    python -m yolo_cli runs --sort map50_95 --filter yolov8n
+    python -m yolo_cli export --run runs/detect/train3 --dynamic --precision fp32 int8
+    python -m yolo_cli quantize --run runs/detect/train3 --data path/to/data.yaml
+    python -m yolo_cli predict --weights runs/detect/train3/weights/best.pt --source path/to/video.mp4
+    python -m yolo_cli predict --weights best.pt --source path/to/4k_images --tile 640
+    python -m yolo_cli evaluate --run runs/detect/train3 --conf 0.001 0.25 0.5 --iou 0.7 0.5
+
+Tiến độ được ghi ra stdout dạng JSON lines (mỗi dòng một sự kiện), log console
+của ultralytics ghi ra stderr và vào train_log.*.log trong thư mục kết quả.
+
+Exit codes: 0 = thành công, 1 = training lỗi, 2 = sai tham số/config, 130 = bị ngắt
+"""
+
+import argparse
+import dataclasses
+import json
+import multiprocessing
+import queue
+import re
+import sys
+import time
+
+from metrics_parser import BatchProgress
+from training_backend import (TrainingJob, TrainingWorker, LogOutput, TrainingFinished,
+                              WorkerExited, build_train_args, resume_job)
+from job_queue import QueuedJob
+from dataset_scan import scan_dataset
+from autotune import Autotuner, AutotuneSettings, AutotuneResult
+from dataset_cache import build_resized_dataset
+from dataset_pack import pack_dataset
+from run_catalog import RunInfo, scan_runs, filter_runs, sort_runs, resumable_checkpoint
+from model_export import (Exporter, ExportResult, EXPORT_FORMATS, PRECISIONS, DEFAULT_BATCH_SIZES,
+                          MEASURE_ITERATIONS, settings_for_run)
+from model_quantize import (Quantizer, QuantizeResult, QUANTIZE_FORMATS, CALIBRATION_IMAGES, MAX_MAP_DROP,
+                            quantize_settings_for_run)
+from inference_pipeline import Inferencer, InferenceSettings, InferenceResult, DEFAULT_BATCH, DECODE_THREADS
+from tiled_inference import TILE_OVERLAP, MERGE_METHODS
+from prediction_eval import (PredictionCache, PredictionCacher, EvalCacheResult, EvalSettings, CACHE_CONF,
+                             CACHE_IOU, eval_settings_for_run, load_cache)
+from training_log import ConsoleLineSplitter, LogSpool, next_run_dir
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def event_name(event):
+    """EpochStart -> 'epoch_start'"""
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', type(event).__name__).lower()
+
+
+def event_fields(event):
+    data = dataclasses.asdict(event)
+    if isinstance(event, BatchProgress):
+        data['loss'] = event.loss
+    return data
+
+
+class JsonLinesWriter:
+    """Writes one JSON object per line and flushes so pipes see it immediately"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def emit(self, name, /, **fields):
+        data = {'event': name, 'time': round(time.time(), 3)}
+        data.update(fields)
+        self.stream.write(json.dumps(data, default=str) + "\n")
+        self.stream.flush()
+
+    def emit_message(self, message):
+        """Emit a dataclass event coming from the training worker"""
+        self.emit(event_name(message), **event_fields(message))
+
+
+def report_fields(report):
+    """DatasetReport -> JSON-friendly dict"""
+    splits = {}
+    for name, split in report.splits.items():
+        data = dataclasses.asdict(split)
+        data['class_counts'] = {report.class_name(c): n for c, n in sorted(split.class_counts.items())}
+        splits[name] = data
+    return {'yaml_path': report.yaml_path, 'ok': report.ok, 'error_count': report.error_count,
+            'nc': report.nc, 'seconds': round(report.seconds, 3), 'errors': report.errors,
+            'splits': splits}
+
+
+def load_config(path, overrides=()):
+    """Load a Setup-tab config and apply KEY=VALUE overrides"""
+    with open(path, 'r') as f:
+        config = json.load(f)
+    job = QueuedJob.from_config(config)
+    for item in overrides:
+        key, sep, value = item.partition('=')
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid override '{item}', expected KEY=VALUE")
+        key = key.strip()
+        if key == 'model':
+            job.model = value
+        elif key in ('data', 'dataset'):
+            job.dataset = value
+        elif key in job.bool_params:
+            job.bool_params[key] = value.strip().lower() in ('1', 'true', 'yes', 'on')
+        else:
+            job.params[key] = value
+    if not job.dataset:
+        raise ValueError("Config has no dataset")
+    return job
+
+
+def _run_worker(training_job, events, spool, log_stream=None):
+    """Run one TrainingJob in a one-shot worker. Returns (TrainingFinished or None, interrupted).
+
+    The first Ctrl+C stops after the current epoch (last.pt saved), the second terminates.
+    """
+    splitter = ConsoleLineSplitter()
+    messages = queue.SimpleQueue()
+    worker = TrainingWorker(messages.put)
+    result = None
+    stopping = False
+    try:
+        worker.start()
+        worker.submit(training_job)
+        worker.shutdown()
+        while True:
+            try:
+                message = messages.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except KeyboardInterrupt:
+                if stopping:
+                    raise
+                stopping = True
+                worker.request_stop()
+                events.emit('stop_requested', graceful=True)
+                continue
+            if isinstance(message, LogOutput):
+                text = "".join(t for kind, t in splitter.feed(message.text) if kind == 'line')
+                if text:
+                    spool.write(text)
+                    if log_stream:
+                        log_stream.write(text)
+                        log_stream.flush()
+            elif isinstance(message, WorkerExited):
+                break
+            else:
+                if isinstance(message, TrainingFinished):
+                    result = message
+                events.emit_message(message)
+    except KeyboardInterrupt:
+        worker.stop()
+        worker.join(30)
+        return result, True
+    finally:
+        for kind, text in splitter.close():
+            spool.write(text)
+    return result, False
+
+
+def supervise_training(training_job, run_dir, events, log_stream=None, retries=0):
+    """Run a job, resuming it from weights/last.pt up to `retries` times if it crashes.
+
+    Returns an exit code.
+    """
+    spool = LogSpool(run_dir)
+    started = time.time()
+    attempt = 0
+    try:
+        while True:
+            result, interrupted = _run_worker(training_job, events, spool, log_stream)
+            if interrupted:
+                events.emit('run_finished', status='interrupted', run_dir=str(run_dir),
+                            seconds=round(time.time() - started, 3))
+                return EXIT_INTERRUPTED
+            if result is not None and result.save_dir:
+                run_dir = result.save_dir
+            if result is not None and result.stopped:
+                events.emit('run_finished', status='stopped', run_dir=str(run_dir), epoch=result.epoch,
+                            resumes=attempt, seconds=round(time.time() - started, 3))
+                return EXIT_INTERRUPTED
+            if (result is not None and result.ok) or attempt >= retries:
+                break
+            checkpoint = resumable_checkpoint(run_dir)
+            if not checkpoint:
+                break
+            attempt += 1
+            events.emit('run_resumed', checkpoint=checkpoint, attempt=attempt, retries=retries)
+            training_job = resume_job(checkpoint)
+    finally:
+        spool.close()
+
+    ok = result is not None and result.ok
+    events.emit('run_finished', status='done' if ok else 'failed', run_dir=str(run_dir),
+                resumes=attempt, seconds=round(time.time() - started, 3))
+    return EXIT_OK if ok else EXIT_FAILED
+
+
+def run_training(job, events, project="runs/detect", name="train", log_stream=None, retries=0):
+    """Train one job in a worker process, streaming events. Returns an exit code."""
+    run_dir = next_run_dir(project, name)
+    train_args = build_train_args(job.dataset, job.params, job.bool_params, run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    events.emit('run_started', model=job.model, dataset=job.dataset,
+                run_dir=str(run_dir), train_args=train_args)
+    return supervise_training(TrainingJob(job.model, train_args), run_dir, events, log_stream, retries)
+
+
+def cmd_train(args, events):
+    try:
+        job = load_config(args.config, args.set)
+    except (OSError, ValueError) as e:
+        events.emit('error', error=str(e))
+        return EXIT_USAGE
+    if args.preflight:
+        report = scan_dataset(job.dataset)
+        events.emit('dataset_report', **report_fields(report))
+        if not report.ok:
+            return EXIT_FAILED
+    return run_training(job, events, args.project, args.name,
+                        log_stream=None if args.quiet else sys.stderr, retries=args.retries)
+
+
+def cmd_resume(args, events):
+    checkpoint = resumable_checkpoint(args.run)
+    if not checkpoint:
+        events.emit('error', error=f"No resumable checkpoint in {args.run} "
+                                   "(needs weights/last.pt of a run that did not finish)")
+        return EXIT_USAGE
+    events.emit('run_resumed', checkpoint=checkpoint, attempt=0, retries=args.retries)
+    return supervise_training(resume_job(checkpoint), args.run, events,
+                              log_stream=None if args.quiet else sys.stderr, retries=args.retries)
+
+
+def cmd_scan(args, events):
+    report = scan_dataset(args.data, workers=args.workers)
+    events.emit('dataset_report', **report_fields(report))
+    return EXIT_OK if report.ok else EXIT_FAILED
+
+
+def cmd_runs(args, events):
+    scan = scan_runs(args.root)
+    if scan.error:
+        events.emit('error', error=scan.error)
+        return EXIT_FAILED
+    runs = sort_runs(filter_runs(scan.runs, args.filter), args.sort, not args.ascending)
+    for run in runs[:args.limit or None]:
+        # NaN không hợp lệ trong JSON
+        events.emit('run', **{k: None if v != v else v for k, v in dataclasses.asdict(run).items()})
+    events.emit('catalog', runs=len(scan.runs), shown=len(runs[:args.limit or None]),
+                updated=scan.scanned, removed=scan.removed, seconds=round(scan.seconds, 3))
+    return EXIT_OK
+
+
+def cmd_resize(args, events):
+    try:
+        result = build_resized_dataset(
+            args.data, args.max_side, args.out, args.workers,
+            progress=lambda done, total: events.emit('resize_progress', done=done, total=total))
+    except (OSError, ValueError) as e:
+        events.emit('error', error=str(e))
+        return EXIT_USAGE
+    events.emit_message(result)
+    return EXIT_FAILED if result.errors else EXIT_OK
+
+
+def cmd_pack(args, events):
+    try:
+        result = pack_dataset(
+            args.data, args.out, args.shard_mb << 20, args.workers,
+            progress=lambda done, total: events.emit('pack_progress', done=done, total=total))
+    except (OSError, ValueError) as e:
+        events.emit('error', error=str(e))
+        return EXIT_USAGE
+    events.emit_message(result)
+    # Ảnh lỗi bị bỏ qua (có trong errors), chỉ thất bại khi không còn ảnh nào
+    return EXIT_OK if result.images else EXIT_FAILED
+
+
+def cmd_autotune(args, events):
+    try:
+        job = load_config(args.config, args.set)
+        imgsz = int(job.params.get('imgsz', 640))
+    except (OSError, ValueError) as e:
+        events.emit('error', error=str(e))
+        return EXIT_USAGE
+    # Process riêng: log của ultralytics không lẫn vào JSON trên stdout
+    messages = queue.SimpleQueue()
+    tuner = Autotuner(messages.put)
+    tuner.start(AutotuneSettings(job.model, job.dataset, imgsz, job.params.get('device', '')))
+    try:
+        while True:
+            message = messages.get()
+            events.emit_message(message)
+            if isinstance(message, AutotuneResult):
+                return EXIT_FAILED if message.error else EXIT_OK
+    except KeyboardInterrupt:
+        tuner.stop()
+        return EXIT_INTERRUPTED
+
+
+def cmd_export(args, events):
+    overrides = {'formats': tuple(args.formats), 'precisions': tuple(args.precision),
+                 'dynamic': args.dynamic, 'batch_sizes': tuple(args.batch_sizes),
+                 'iterations': args.iterations}
+    for key in ('weights', 'imgsz', 'data'):
+        if getattr(args, key):
+            overrides[key] = getattr(args, key)
+    settings = settings_for_run(args.run, **overrides)
+    if not settings.weights:
+        events.emit('error', error=f"No weights/best.pt or last.pt in {args.run}")
+        return EXIT_USAGE
+    # Process riêng: log của exporter không lẫn vào JSON trên stdout
+    messages = queue.SimpleQueue()
+    exporter = Exporter(messages.put)
+    exporter.start(settings)
+    try:
+        while True:
+            message = messages.get()
+            events.emit_message(message)
+            if isinstance(message, ExportResult):
+                return EXIT_FAILED if message.error else EXIT_OK
+    except KeyboardInterrupt:
+        exporter.stop()
+        return EXIT_INTERRUPTED
+
+
+def cmd_quantize(args, events):
+    overrides = {'formats': tuple(args.formats), 'calibration_images': args.calibration_images,
+                 'max_map_drop': args.max_map_drop, 'iterations': args.iterations}
+    for key in ('weights', 'imgsz'):
+        if getattr(args, key):
+            overrides[key] = getattr(args, key)
+    settings = quantize_settings_for_run(args.run, args.data, **overrides)
+    if not settings.weights:
+        events.emit('error', error=f"No weights/best.pt or last.pt in {args.run}")
+        return EXIT_USAGE
+    # Process riêng: log của ultralytics/nncf không lẫn vào JSON trên stdout
+    messages = queue.SimpleQueue()
+    quantizer = Quantizer(messages.put)
+    quantizer.start(settings)
+    try:
+        while True:
+            message = messages.get()
+            events.emit_message(message)
+            if isinstance(message, QuantizeResult):
+                return EXIT_FAILED if message.error else EXIT_OK
+    except KeyboardInterrupt:
+        quantizer.stop()
+        return EXIT_INTERRUPTED
+
+
+def cmd_predict(args, events):
+    """Run the inference pipeline. The first Ctrl+C finishes frames already forwarded, the second terminates."""
+    settings = InferenceSettings(args.weights, args.source, out_dir=args.out or '', imgsz=args.imgsz or 0,
+                                 conf=args.conf, iou=args.iou, batch=args.batch, device=args.device or '',
+                                 decode_threads=args.decode_threads, save_images=not args.no_save,
+                                 save_json=not args.no_json, max_frames=args.max_frames, tile_size=args.tile,
+                                 tile_overlap=args.tile_overlap, tile_merge=args.tile_merge)
+    messages = queue.SimpleQueue()
+    inferencer = Inferencer(messages.put)
+    inferencer.start(settings)
+    stopping = False
+    try:
+        while True:
+            try:
+                message = messages.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except KeyboardInterrupt:
+                if stopping:
+                    raise
+                stopping = True
+                inferencer.request_stop()
+                events.emit('stop_requested', graceful=True)
+                continue
+            events.emit_message(message)
+            if isinstance(message, InferenceResult):
+                if message.error:
+                    return EXIT_FAILED
+                return EXIT_INTERRUPTED if message.stopped else EXIT_OK
+    except KeyboardInterrupt:
+        inferencer.stop()
+        return EXIT_INTERRUPTED
+
+
+def cmd_evaluate(args, events):
+    """Cache predictions once (reused while the weights are unchanged), then evaluate every conf x iou"""
+    if args.run:
+        settings = eval_settings_for_run(args.run)
+        if args.weights:
+            settings.weights = args.weights
+    else:
+        settings = EvalSettings(args.weights, '')
+    for key in ('data', 'imgsz', 'device'):
+        if getattr(args, key):
+            setattr(settings, key, getattr(args, key))
+    settings.split, settings.batch = args.split, args.batch
+    # Cache rộng nhất có thể dùng lại: conf thấp nhất, NMS iou cao nhất
+    settings.conf = min(args.conf + [CACHE_CONF])
+    settings.iou = max(args.iou + [CACHE_IOU])
+    if not settings.weights or not settings.data:
+        events.emit('error', error="Need --weights (or a --run with weights) and --data (or a --run with args.yaml)")
+        return EXIT_USAGE
+
+    cache = None if args.refresh else load_cache(settings)
+    if cache is None:
+        messages = queue.SimpleQueue()
+        cacher = PredictionCacher(messages.put)
+        cacher.start(settings)
+        try:
+            while True:
+                message = messages.get()
+                events.emit_message(message)
+                if isinstance(message, EvalCacheResult):
+                    break
+        except KeyboardInterrupt:
+            cacher.stop()
+            return EXIT_INTERRUPTED
+        if message.error:
+            return EXIT_FAILED
+        cache = PredictionCache.load(message.path)
+    for conf in args.conf:
+        for iou in args.iou:
+            try:
+                events.emit_message(cache.evaluate(conf, iou))
+            except ValueError as e:
+                events.emit('error', error=str(e))
+                return EXIT_USAGE
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m yolo_cli",
+                                     description="Headless YOLO training (JSON-lines progress on stdout)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train', help="train from a config saved by the GUI")
+    train.add_argument('--config', required=True, help="config JSON from Save Config")
+    train.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                       help="override a parameter (repeatable), e.g. --set epochs=10")
+    train.add_argument('--project', default="runs/detect", help="results root directory")
+    train.add_argument('--name', default="train", help="run name (train, train2, ...)")
+    train.add_argument('--quiet', action='store_true', help="do not echo the training log to stderr")
+    train.add_argument('--preflight', action='store_true',
+                       help="scan the dataset first and do not train if it has errors")
+    train.add_argument('--retries', type=int, default=0,
+                       help="resume from weights/last.pt up to this many times if training crashes")
+    train.set_defaults(func=cmd_train)
+
+    resume = subparsers.add_parser('resume', help="continue an interrupted run from its weights/last.pt")
+    resume.add_argument('--run', required=True, help="run directory, e.g. runs/detect/train3")
+    resume.add_argument('--retries', type=int, default=0,
+                        help="resume again up to this many times if training crashes")
+    resume.add_argument('--quiet', action='store_true', help="do not echo the training log to stderr")
+    resume.set_defaults(func=cmd_resume)
+
+    scan = subparsers.add_parser('scan', help="validate a dataset (images and YOLO labels)")
+    scan.add_argument('--data', required=True, help="dataset YAML file")
+    scan.add_argument('--workers', type=int, default=None, help="scanner processes (default: CPU count)")
+    scan.set_defaults(func=cmd_scan)
+
+    runs = subparsers.add_parser('runs', help="list and compare training runs (cached catalog)")
+    runs.add_argument('--root', default='runs', help="runs directory (default: runs)")
+    runs.add_argument('--filter', default='', help="words that must appear in the run path, model or dataset")
+    runs.add_argument('--sort', default='modified', choices=[f.name for f in dataclasses.fields(RunInfo)],
+                      help="sort key (default: modified)")
+    runs.add_argument('--ascending', action='store_true', help="sort ascending (default: descending)")
+    runs.add_argument('--limit', type=int, default=0, help="show at most this many runs")
+    runs.set_defaults(func=cmd_runs)
+
+    resize = subparsers.add_parser('resize', help="build a resized copy of a dataset for faster training")
+    resize.add_argument('--data', required=True, help="dataset YAML file")
+    resize.add_argument('--max-side', type=int, required=True, help="long side of the resized images")
+    resize.add_argument('--out', default=None, help="output directory (default: <yaml>_resized_<max-side>)")
+    resize.add_argument('--workers', type=int, default=None, help="resize processes (default: CPU count)")
+    resize.set_defaults(func=cmd_resize)
+
+    pack = subparsers.add_parser('pack', help="pack a dataset into memory-mapped shard files")
+    pack.add_argument('--data', required=True, help="dataset YAML file")
+    pack.add_argument('--out', default=None, help="output directory (default: <yaml>_packed)")
+    pack.add_argument('--shard-mb', type=int, default=1024, help="maximum shard size in MB")
+    pack.add_argument('--workers', type=int, default=None, help="reader processes (default: CPU count)")
+    pack.set_defaults(func=cmd_pack)
+
+    export = subparsers.add_parser('export', help="export a run's best.pt and benchmark CPU latency")
+    export.add_argument('--run', required=True, help="run directory, e.g. runs/detect/train3")
+    export.add_argument('--weights', default=None, help="weights to export (default: <run>/weights/best.pt)")
+    export.add_argument('--formats', nargs='+', choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS))
+    export.add_argument('--precision', nargs='+', choices=PRECISIONS, default=['fp32'],
+                        help="fp16 needs a GPU except for OpenVINO; int8 needs the training dataset")
+    export.add_argument('--dynamic', action='store_true', help="dynamic batch (ONNX/OpenVINO)")
+    export.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES))
+    export.add_argument('--imgsz', type=int, default=None, help="default: imgsz of the run")
+    export.add_argument('--data', default=None, help="INT8 calibration dataset (default: dataset of the run)")
+    export.add_argument('--iterations', type=int, default=MEASURE_ITERATIONS, help="timed runs per batch size")
+    export.set_defaults(func=cmd_export)
+
+    quantize = subparsers.add_parser('quantize', help="INT8 post-training quantization with mAP/latency report")
+    quantize.add_argument('--run', required=True, help="run directory, e.g. runs/detect/train3")
+    quantize.add_argument('--data', required=True, help="data.yaml: train split for calibration, val for mAP")
+    quantize.add_argument('--weights', default=None, help="FP32 weights (default: <run>/weights/best.pt)")
+    quantize.add_argument('--formats', nargs='+', choices=QUANTIZE_FORMATS, default=list(QUANTIZE_FORMATS))
+    quantize.add_argument('--calibration-images', type=int, default=CALIBRATION_IMAGES,
+                          help="train images sampled for calibration")
+    quantize.add_argument('--max-map-drop', type=float, default=MAX_MAP_DROP,
+                          help="flag INT8 models losing more mAP50-95 than this")
+    quantize.add_argument('--imgsz', type=int, default=None, help="default: imgsz of the run")
+    quantize.add_argument('--iterations', type=int, default=MEASURE_ITERATIONS, help="timed runs per model")
+    quantize.set_defaults(func=cmd_quantize)
+
+    predict = subparsers.add_parser('predict', help="run weights over an image folder or video")
+    predict.add_argument('--weights', required=True, help="e.g. runs/detect/train3/weights/best.pt")
+    predict.add_argument('--source', required=True, help="image folder, image or video file")
+    predict.add_argument('--out', default=None, help="output directory (default: runs/detect/predictN)")
+    predict.add_argument('--imgsz', type=int, default=None, help="default: imgsz the weights were trained with")
+    predict.add_argument('--conf', type=float, default=0.25)
+    predict.add_argument('--iou', type=float, default=0.7)
+    predict.add_argument('--batch', type=int, default=DEFAULT_BATCH,
+                         help="frames (or tiles with --tile) per forward pass")
+    predict.add_argument('--device', default=None, help="e.g. 0 or cpu (default: auto)")
+    predict.add_argument('--decode-threads', type=int, default=DECODE_THREADS, help="image decode threads")
+    predict.add_argument('--max-frames', type=int, default=0, help="stop after N frames (0 = all)")
+    predict.add_argument('--no-save', action='store_true', help="do not write annotated images/video")
+    predict.add_argument('--no-json', action='store_true', help="do not write predictions.jsonl")
+    predict.add_argument('--tile', type=int, default=0,
+                         help="sliced inference with TILE x TILE crops for high-resolution images (0 = off)")
+    predict.add_argument('--tile-overlap', type=float, default=TILE_OVERLAP, help="overlap between tiles (0-1)")
+    predict.add_argument('--tile-merge', choices=MERGE_METHODS, default='nms',
+                         help="merge of detections across tile borders")
+    predict.set_defaults(func=cmd_predict)
+
+    evaluate = subparsers.add_parser('evaluate', help="P/R/mAP per class for many conf/iou from cached predictions")
+    evaluate.add_argument('--run', default=None, help="run directory; weights, dataset and imgsz come from it")
+    evaluate.add_argument('--weights', default=None, help="default: <run>/weights/best.pt")
+    evaluate.add_argument('--data', default=None, help="dataset YAML file (default: dataset of the run)")
+    evaluate.add_argument('--split', default='val')
+    evaluate.add_argument('--conf', type=float, nargs='+', default=[CACHE_CONF], help="confidence thresholds")
+    evaluate.add_argument('--iou', type=float, nargs='+', default=[CACHE_IOU], help="NMS IoU thresholds (below the cache iou: approximate, NMS on the cached boxes)")
+    evaluate.add_argument('--imgsz', type=int, default=None, help="default: imgsz of the run")
+    evaluate.add_argument('--batch', type=int, default=16, help="images per forward pass while caching")
+    evaluate.add_argument('--device', default=None, help="e.g. 0 or cpu (default: auto)")
+    evaluate.add_argument('--refresh', action='store_true', help="re-run the model even if a cache exists")
+    evaluate.set_defaults(func=cmd_evaluate)
+
+    autotune = subparsers.add_parser('autotune', help="pick batch size and workers for the config's device")
+    autotune.add_argument('--config', required=True, help="config JSON from Save Config")
+    autotune.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                          help="override a parameter (repeatable), e.g. --set device=cpu")
+    autotune.set_defaults(func=cmd_autotune)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args, JsonLinesWriter(sys.stdout))
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
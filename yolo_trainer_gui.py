@@ -5,17 +5,62 @@ Author: Computer Vision Expert
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 import threading
 import subprocess
 import sys
 import os
 import json
+import multiprocessing
+import time
 from pathlib import Path
 from datetime import datetime
-import re
+import queue
+
+from metrics_parser import EpochStart, BatchProgress, ValMetrics, BestFitness
+from training_backend import (TrainingJob, TrainingWorker, LogOutput, TrainingFinished, resume_job,
+                              WorkerReady, FirstBatch, WorkerExited, build_train_args)
+from job_queue import JobQueue, QueuedJob, JobUpdated, split_devices, RUNNING
+from training_log import LogPump, LogSpool, LogPager, ConsoleLineSplitter, next_run_dir
+from sweep import Sweep, METHODS as SWEEP_METHODS
+from env_probe import quick_probe, deep_check
+from dataset_scan import DatasetReport, scan_dataset
+from autotune import Autotuner, AutotuneSettings, AutotuneProgress, AutotuneResult
+from dataset_cache import ResizeResult, build_resized_dataset
+from dataset_pack import PackResult, pack_dataset
+from results_tail import ResultsTail
+from live_chart import LiveChart
+from thumbnails import ThumbnailLoader, ThumbnailReady, THUMB_SIZE, list_result_images, prune_cache
+from image_viewer import ImageViewer
+from model_export import (Exporter, ExportProgress, ExportResult, EXPORT_FORMATS, EXPORT_DIR, TABLE_NAME,
+                          run_weights, settings_for_run)
+from model_quantize import Quantizer, QuantizeProgress, QuantizeResult, QUANT_TABLE_NAME, quantize_settings_for_run
+from inference_pipeline import (Inferencer, InferenceSettings, InferenceProgress, InferenceResult, DEFAULT_BATCH,
+                                DECODE_THREADS, VIDEO_FORMATS)
+from tiled_inference import TILE_OVERLAP, MERGE_METHODS
+from prediction_eval import (PredictionCache, PredictionCacher, EvalProgress, EvalCacheResult, CACHE_CONF,
+                             CACHE_IOU, eval_settings_for_run, load_cache, format_metrics)
+from run_catalog import (CatalogScan, RunCatalog, RUNS_ROOT, BEST_METRIC, scan_runs, filter_runs, sort_runs,
+                         resumable_checkpoint)
+
+# Dùng bởi benchmarks/bench_startup.py: ghi thời điểm cửa sổ hiện ra vào file này rồi thoát
+STARTUP_MARK_ENV = "YOLO_STUDIO_STARTUP_MARK"
 
 class YOLOTrainerGUI:
+    # Số dòng mỗi lần "Load Older" đọc từ file log
+    LOG_HISTORY_PAGE_LINES = 2000
+    # Chu kỳ đọc phần mới của results.csv (biểu đồ vẽ lại tối đa theo nhịp này)
+    RESULTS_POLL_MS = 500
+    # Ô thumbnail trong tab Plots
+    PLOT_CELL_WIDTH, PLOT_CELL_HEIGHT = THUMB_SIZE + 24, THUMB_SIZE + 44
+    # Auto-resume: số lần tối đa resume từ last.pt sau khi training crash, và thời gian chờ trước mỗi lần
+    AUTO_RESUME_RETRIES = 3
+    AUTO_RESUME_DELAY_MS = 3000
+    # Stop lần đầu: đợi epoch hiện tại xong và lưu checkpoint; quá thời gian này thì terminate
+    GRACEFUL_STOP_TIMEOUT_S = 600
+    # Worker warm crash liên tiếp (chưa chạy được batch nào) trước khi tắt "Keep worker warm"
+    MAX_WARM_RESTARTS = 3
+    
     def __init__(self, root):
         self.root = root
         self.root.title("YOLO Training Studio - by Techsolutions")
@@ -23,11 +68,35 @@ class YOLOTrainerGUI:
         self.root.configure(bg="#1e1e2e")
         
         # Variables
-        self.training_thread = None
+        self.training_worker = None
+        self.warm_worker = None
+        self.warm_worker_used = False
+        self.warm_worker_error = ''
+        self.warm_restarts = 0
+        self.training_started_at = 0.0
         self.is_training = False
+        self.stop_requested = False
+        self.resume_attempts = 0
+        self.stop_timeout_s = self.GRACEFUL_STOP_TIMEOUT_S
+        self.validate_on_stop = True
+        self.stop_escalation_job = None
         self.current_epoch = 0
         self.total_epochs = 0
-        self.training_process = None
+        self.console_splitter = ConsoleLineSplitter()
+        self.run_dir = None
+        self.raw_log = False
+        self.results_tail = None
+        self.results_generation = None
+        self.chart_redraw_job = None
+        self.catalog_runs = []
+        self.catalog_sort = ('modified', True)
+        self.catalog_scanning = False
+        self.training_events = queue.SimpleQueue()
+        self.thumb_loader = ThumbnailLoader(self.training_events.put)
+        self.plot_files = []
+        self.plot_photos = {}
+        self.plot_requested = set()
+        self.plot_columns = 0
         
         # Style configuration
         self.setup_styles()
@@ -38,6 +107,10 @@ class YOLOTrainerGUI:
         # Load saved config if exists
         self.load_config()
         
+        # Worker warm: spawn sẵn khi mở app để lần Start đầu tiên không phải chờ import
+        if self.warm_worker_var.get():
+            self.spawn_warm_worker()
+        
     def setup_styles(self):
         """Thiết lập styles cho giao diện hiện đại"""
         style = ttk.Style()
@@ -134,11 +207,21 @@ class YOLOTrainerGUI:
         self.notebook.add(self.training_tab, text="🎯 Training")
         self.create_training_tab()
         
-        # Tab 3: Results
+        # Tab 3: Job Queue
+        self.queue_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.queue_tab, text="📋 Job Queue")
+        self.create_queue_tab()
+        
+        # Tab 4: Results
         self.results_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.results_tab, text="📊 Results & Analysis")
         self.create_results_tab()
         
+        # Tab 5: Inference
+        self.inference_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.inference_tab, text="🔍 Inference")
+        self.create_inference_tab()
+        
         # Status bar
         self.create_status_bar()
         
@@ -178,6 +261,9 @@ class YOLOTrainerGUI:
                                                     font=('Consolas', 9))
         self.env_status.pack(fill='both', expand=True, padx=15, pady=10)
         
+        self.env_pump = LogPump(self.root, self.env_status)
+        self.env_pump.start()
+        
         # Right panel - Model Configuration
         right_panel = ttk.Frame(self.setup_tab, style='Card.TFrame')
         right_panel.pack(side='right', fill='both', expand=True, padx=(5, 10), pady=10)
@@ -193,6 +279,7 @@ class YOLOTrainerGUI:
         ttk.Label(model_frame, text="Select Pretrained Model:").pack(anchor='w', pady=(0, 5))
         
         self.model_var = tk.StringVar(value="yolov8n.pt")
+        self.model_var.trace_add('write', self.preload_selected_model)
         models = [
             "yolov8n.pt", "yolov8s.pt", "yolov8m.pt", "yolov8l.pt", "yolov8x.pt",
             "yolov10n.pt", "yolov10s.pt", "yolov10m.pt", "yolov10l.pt", "yolov10x.pt",
@@ -214,6 +301,7 @@ class YOLOTrainerGUI:
         upload_btn_frame.pack(fill='x')
         
         self.custom_model_path = tk.StringVar(value="")
+        self.custom_model_path.trace_add('write', self.preload_selected_model)
         custom_entry = ttk.Entry(upload_btn_frame, textvariable=self.custom_model_path, 
                                 state='readonly')
         custom_entry.pack(side='left', fill='x', expand=True, padx=(0, 5))
@@ -239,10 +327,37 @@ class YOLOTrainerGUI:
                                    command=self.browse_dataset, width=10)
         dataset_browse.pack(side='right')
         
+        ttk.Button(dataset_btn_frame, text="🔍 Scan", 
+                  command=self.scan_selected_dataset, width=8).pack(side='right', padx=(0, 5))
+        
+        ttk.Button(dataset_btn_frame, text="🗜️ Resize", 
+                  command=self.resize_selected_dataset, width=10).pack(side='right', padx=(0, 5))
+        
+        ttk.Button(dataset_btn_frame, text="📦 Pack", 
+                  command=self.pack_selected_dataset, width=8).pack(side='right', padx=(0, 5))
+        
+        # Thống kê dataset, đọc từ index (<yaml>.index.sqlite) nên gần như tức thì
+        self.dataset_info_label = ttk.Label(dataset_frame, text="", wraplength=420,
+                                            foreground=self.colors['text_dim'])
+        self.dataset_info_label.pack(anchor='w', pady=(5, 0))
+        self.dataset_info_job = None
+        # Dataset đang chờ kết quả pre-flight trước khi train
+        self.preflight_pending = None
+        self.dataset_path.trace_add('write', self.schedule_dataset_info)
+        
         # Training parameters
-        params_label = ttk.Label(right_panel, text="⚡ Training Parameters", 
+        params_header = ttk.Frame(right_panel)
+        params_header.pack(fill='x', padx=15, pady=(20, 10))
+        
+        params_label = ttk.Label(params_header, text="⚡ Training Parameters", 
                                 style='Subtitle.TLabel')
-        params_label.pack(anchor='w', padx=15, pady=(20, 10))
+        params_label.pack(side='left')
+        
+        # Đo nhanh để chọn batch/workers phù hợp với device hiện tại
+        self.autotuner = None
+        self.autotune_btn = ttk.Button(params_header, text="⚡ Auto-tune", 
+                                       command=self.autotune_params)
+        self.autotune_btn.pack(side='right')
         
         # Create scrollable frame for parameters
         params_canvas = tk.Canvas(right_panel, bg=self.colors['bg_medium'], 
@@ -348,6 +463,27 @@ class YOLOTrainerGUI:
                                    state='disabled', width=20)
         self.stop_btn.pack(side='left', padx=10)
         
+        # Tiếp tục run bị dừng giữa chừng từ weights/last.pt
+        self.resume_btn = ttk.Button(btn_frame, text="⏯️ Resume", 
+                                     command=self.resume_training, width=12)
+        self.resume_btn.pack(side='left', padx=10)
+        
+        # Giữ torch/ultralytics đã import sẵn trong một worker process giữa các lần train
+        self.warm_worker_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame, text="🔥 Keep worker warm", 
+                       variable=self.warm_worker_var,
+                       command=self.toggle_warm_worker).pack(side='left', padx=10)
+        
+        # Kiểm tra dataset (label/ảnh hỏng) trước khi bắt đầu training
+        self.preflight_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btn_frame, text="🔍 Pre-flight dataset check", 
+                       variable=self.preflight_var).pack(side='left', padx=10)
+        
+        # Worker crash (OOM, driver lỗi...) -> tự resume từ checkpoint cuối
+        self.auto_resume_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btn_frame, text="♻️ Auto-resume on crash", 
+                       variable=self.auto_resume_var).pack(side='left', padx=10)
+        
         # Progress section
         progress_frame = ttk.Frame(self.training_tab, style='Card.TFrame')
         progress_frame.pack(fill='x', padx=10, pady=(0, 10))
@@ -406,8 +542,21 @@ class YOLOTrainerGUI:
         log_frame = ttk.Frame(self.training_tab, style='Card.TFrame')
         log_frame.pack(fill='both', expand=True, padx=10, pady=(0, 10))
         
-        ttk.Label(log_frame, text="📝 Training Log", 
-                 style='Subtitle.TLabel').pack(anchor='w', padx=15, pady=(15, 10))
+        log_header = ttk.Frame(log_frame)
+        log_header.pack(fill='x', padx=15, pady=(15, 10))
+        
+        ttk.Label(log_header, text="📝 Training Log", 
+                 style='Subtitle.TLabel').pack(side='left')
+        
+        ttk.Button(log_header, text="📜 Load Older", 
+                  command=self.open_log_history, width=14).pack(side='right')
+        
+        # Raw mode: hiển thị mọi lần ghi đè '\r' của progress bar (debug)
+        self.raw_log_var = tk.BooleanVar(value=False)
+        self.raw_log_var.trace_add('write', 
+                                   lambda *args: setattr(self, 'raw_log', self.raw_log_var.get()))
+        ttk.Checkbutton(log_header, text="Raw output", 
+                       variable=self.raw_log_var).pack(side='right', padx=10)
         
         # Log text area
         self.log_text = scrolledtext.ScrolledText(log_frame, height=20,
@@ -423,6 +572,103 @@ class YOLOTrainerGUI:
         self.log_text.tag_config('warning', foreground=self.colors['warning'])
         self.log_text.tag_config('error', foreground=self.colors['error'])
         
+        # Log pump: worker threads chỉ đẩy vào queue, UI flush theo chu kỳ
+        self.log_pump = LogPump(self.root, self.log_text)
+        self.log_pump.start()
+        
+    def create_queue_tab(self):
+        """Tab hàng đợi job training"""
+        self.job_queue = JobQueue(self.on_job_update)
+        self.sweep = None
+        
+        control_frame = ttk.Frame(self.queue_tab, style='Card.TFrame')
+        control_frame.pack(fill='x', padx=10, pady=10)
+        
+        ttk.Label(control_frame, text="📋 Training Job Queue", 
+                 style='Subtitle.TLabel').pack(anchor='w', padx=15, pady=(15, 10))
+        
+        btn_frame = ttk.Frame(control_frame)
+        btn_frame.pack(fill='x', padx=15, pady=(0, 10))
+        
+        ttk.Button(btn_frame, text="➕ Add Current Setup", 
+                  command=self.queue_current_setup).pack(side='left', padx=(0, 5))
+        ttk.Button(btn_frame, text="📂 Add From Configs", 
+                  command=self.queue_config_files).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="🗑️ Remove", 
+                  command=self.remove_queued_jobs).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="⏹️ Stop All", 
+                  command=self.stop_job_queue).pack(side='right', padx=(5, 0))
+        ttk.Button(btn_frame, text="▶️ Start Queue", style='Success.TButton',
+                  command=self.start_job_queue).pack(side='right', padx=5)
+        
+        # Số slot chạy song song và danh sách device phân bổ cho các slot
+        slots_frame = ttk.Frame(control_frame)
+        slots_frame.pack(fill='x', padx=15, pady=(0, 15))
+        
+        ttk.Label(slots_frame, text="Concurrent Jobs:").pack(side='left')
+        self.queue_slots_var = tk.StringVar(value="1")
+        ttk.Spinbox(slots_frame, from_=1, to=16, textvariable=self.queue_slots_var,
+                   width=5).pack(side='left', padx=(5, 20))
+        
+        ttk.Label(slots_frame, text="Devices (e.g. 0,1 or cpu; empty = per job):").pack(side='left')
+        self.queue_devices_var = tk.StringVar(value="")
+        ttk.Entry(slots_frame, textvariable=self.queue_devices_var, width=15).pack(side='left', padx=5)
+        
+        # Hyperparameter sweep: giá trị trong tab Setup dùng cú pháp a,b,c / lo:hi / lo:hi:log
+        sweep_frame = ttk.Frame(self.queue_tab, style='Card.TFrame')
+        sweep_frame.pack(fill='x', padx=10, pady=(0, 10))
+        
+        ttk.Label(sweep_frame, text="🔬 Hyperparameter Sweep", 
+                 style='Subtitle.TLabel').pack(anchor='w', padx=15, pady=(15, 5))
+        ttk.Label(sweep_frame, text="Setup parameters accept a,b,c (choices), lo:hi, lo:hi:log or lo:hi:N (ranges)",
+                 foreground=self.colors['text_dim']).pack(anchor='w', padx=15)
+        
+        sweep_opts = ttk.Frame(sweep_frame)
+        sweep_opts.pack(fill='x', padx=15, pady=(5, 15))
+        
+        ttk.Label(sweep_opts, text="Method:").pack(side='left')
+        self.sweep_method_var = tk.StringVar(value='sobol')
+        ttk.Combobox(sweep_opts, textvariable=self.sweep_method_var, values=SWEEP_METHODS,
+                    state='readonly', width=8).pack(side='left', padx=(5, 15))
+        
+        ttk.Label(sweep_opts, text="Samples:").pack(side='left')
+        self.sweep_samples_var = tk.StringVar(value="8")
+        ttk.Entry(sweep_opts, textvariable=self.sweep_samples_var, width=5).pack(side='left', padx=(5, 15))
+        
+        ttk.Label(sweep_opts, text="Prune at epoch (0 = off):").pack(side='left')
+        self.sweep_rung_var = tk.StringVar(value="0")
+        ttk.Entry(sweep_opts, textvariable=self.sweep_rung_var, width=5).pack(side='left', padx=(5, 15))
+        
+        ttk.Label(sweep_opts, text="Keep top 1/").pack(side='left')
+        self.sweep_eta_var = tk.StringVar(value="3")
+        ttk.Entry(sweep_opts, textvariable=self.sweep_eta_var, width=3).pack(side='left', padx=(0, 15))
+        
+        ttk.Button(sweep_opts, text="🔬 Start Sweep", style='Success.TButton',
+                  command=self.start_sweep).pack(side='right')
+        
+        # Danh sách job
+        list_frame = ttk.Frame(self.queue_tab, style='Card.TFrame')
+        list_frame.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        
+        columns = ("name", "model", "dataset", "device", "workers", "status",
+                   "epoch", "map", "eta", "run_dir")
+        headings = ("Name", "Model", "Dataset", "Device", "Workers", "Status",
+                    "Epoch", "Best mAP50-95", "ETA", "Results Directory")
+        self.queue_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
+        for col, heading in zip(columns, headings):
+            self.queue_tree.heading(col, text=heading)
+            self.queue_tree.column(col, width=80, anchor='center')
+        for col in ("name", "model", "dataset"):
+            self.queue_tree.column(col, width=140, anchor='w')
+        self.queue_tree.column("run_dir", width=260, anchor='w')
+        
+        queue_scrollbar = ttk.Scrollbar(list_frame, command=self.queue_tree.yview)
+        self.queue_tree.configure(yscrollcommand=queue_scrollbar.set)
+        self.queue_tree.pack(side='left', fill='both', expand=True, padx=(15, 0), pady=15)
+        queue_scrollbar.pack(side='right', fill='y', pady=15, padx=(0, 15))
+        
+        self.queue_tree.bind('<Double-Button-1>', self.open_queued_job_results)
+        
     def create_results_tab(self):
         """Tab hiển thị kết quả training"""
         # Results directory
@@ -439,6 +685,7 @@ class YOLOTrainerGUI:
         ttk.Label(path_frame, text="Results Directory:").pack(side='left', padx=(0, 10))
         
         self.results_path = tk.StringVar(value="runs/detect/train")
+        self.results_path.trace_add('write', self.follow_results)
         results_entry = ttk.Entry(path_frame, textvariable=self.results_path, width=40)
         results_entry.pack(side='left', fill='x', expand=True, padx=(0, 10))
         
@@ -462,6 +709,15 @@ class YOLOTrainerGUI:
         results_notebook = ttk.Notebook(results_display)
         results_notebook.pack(fill='both', expand=True, padx=15, pady=15)
         
+        # Live charts tab
+        charts_frame = ttk.Frame(results_notebook)
+        results_notebook.add(charts_frame, text="📈 Charts")
+        
+        self.chart_canvas = tk.Canvas(charts_frame, bg=self.colors['bg_dark'], highlightthickness=0)
+        self.chart_canvas.pack(fill='both', expand=True, padx=5, pady=5)
+        self.live_chart = LiveChart(self.chart_canvas, self.colors)
+        self.chart_canvas.bind('<Configure>', lambda e: self.schedule_chart_redraw())
+        
         # Summary tab
         summary_frame = ttk.Frame(results_notebook)
         results_notebook.add(summary_frame, text="Summary")
@@ -476,28 +732,231 @@ class YOLOTrainerGUI:
         plots_frame = ttk.Frame(results_notebook)
         results_notebook.add(plots_frame, text="Plots")
         
-        self.plots_list = tk.Listbox(plots_frame, 
-                                     bg=self.colors['bg_dark'],
-                                     fg=self.colors['text'],
-                                     font=('Segoe UI', 10))
-        self.plots_list.pack(side='left', fill='both', expand=True, padx=5, pady=5)
+        # Lưới thumbnail: chỉ tạo thumbnail cho các ô đang nhìn thấy
+        self.plots_canvas = tk.Canvas(plots_frame, bg=self.colors['bg_dark'], highlightthickness=0)
+        self.plots_canvas.pack(side='left', fill='both', expand=True, padx=5, pady=5)
         
-        plots_scrollbar = ttk.Scrollbar(plots_frame, command=self.plots_list.yview)
-        plots_scrollbar.pack(side='right', fill='y')
-        self.plots_list.config(yscrollcommand=plots_scrollbar.set)
+        self.plots_scrollbar = ttk.Scrollbar(plots_frame, command=self.plots_canvas.yview)
+        self.plots_scrollbar.pack(side='right', fill='y')
+        self.plots_canvas.config(yscrollcommand=self.on_plots_scrolled)
         
-        self.plots_list.bind('<Double-Button-1>', self.open_plot)
+        self.plots_canvas.bind('<Configure>', lambda e: self.layout_plots())
+        self.plots_canvas.bind('<Double-Button-1>', self.open_plot)
+        self.plots_canvas.bind('<MouseWheel>', 
+                               lambda e: self.plots_canvas.yview_scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.plots_canvas.bind('<Button-4>', lambda e: self.plots_canvas.yview_scroll(-1, 'units'))
+        self.plots_canvas.bind('<Button-5>', lambda e: self.plots_canvas.yview_scroll(1, 'units'))
         
         # Weights tab
         weights_frame = ttk.Frame(results_notebook)
         results_notebook.add(weights_frame, text="Model Weights")
         
+        # Export best.pt sang các format inference và đo latency CPU
+        export_bar = ttk.Frame(weights_frame)
+        export_bar.pack(fill='x', padx=5, pady=(5, 0))
+        self.exporter = None
+        self.export_format_vars = {}
+        for fmt, label in zip(EXPORT_FORMATS, ("ONNX", "OpenVINO", "TorchScript")):
+            self.export_format_vars[fmt] = tk.BooleanVar(value=True)
+            ttk.Checkbutton(export_bar, text=label, 
+                           variable=self.export_format_vars[fmt]).pack(side='left', padx=5)
+        self.export_dynamic_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(export_bar, text="Dynamic batch", 
+                       variable=self.export_dynamic_var).pack(side='left', padx=5)
+        self.export_fp16_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(export_bar, text="FP16", 
+                       variable=self.export_fp16_var).pack(side='left', padx=5)
+        self.export_int8_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(export_bar, text="INT8", 
+                       variable=self.export_int8_var).pack(side='left', padx=5)
+        ttk.Label(export_bar, text="Batch sizes:").pack(side='left', padx=(10, 2))
+        self.export_batches_var = tk.StringVar(value="1,4,8")
+        ttk.Entry(export_bar, textvariable=self.export_batches_var, width=10).pack(side='left')
+        self.export_btn = ttk.Button(export_bar, text="📦 Export & Benchmark", 
+                                     command=self.export_selected_run)
+        self.export_btn.pack(side='right', padx=5)
+        self.quantizer = None
+        self.quantize_btn = ttk.Button(export_bar, text="🧮 Quantize INT8", 
+                                       command=self.quantize_selected_run)
+        self.quantize_btn.pack(side='right', padx=5)
+        
         self.weights_text = scrolledtext.ScrolledText(weights_frame,
                                                       bg=self.colors['bg_dark'],
                                                       fg=self.colors['text'],
                                                       font=('Consolas', 10))
         self.weights_text.pack(fill='both', expand=True, padx=5, pady=5)
         
+        # Evaluate tab: predictions được cache một lần, đổi conf/iou tính lại ngay
+        eval_frame = ttk.Frame(results_notebook)
+        results_notebook.add(eval_frame, text="🎯 Evaluate")
+        
+        eval_bar = ttk.Frame(eval_frame)
+        eval_bar.pack(fill='x', padx=5, pady=5)
+        self.eval_cache = None
+        self.eval_cacher = None
+        self.eval_conf_var = tk.StringVar(value=self.params['conf'].get())
+        self.eval_iou_var = tk.StringVar(value=self.params['iou'].get())
+        for label, var in (("Conf:", self.eval_conf_var), ("NMS IoU:", self.eval_iou_var)):
+            ttk.Label(eval_bar, text=label).pack(side='left')
+            entry = ttk.Entry(eval_bar, textvariable=var, width=8)
+            entry.pack(side='left', padx=(5, 15))
+            entry.bind('<Return>', lambda e: self.evaluate_selected_run())
+        self.eval_refresh_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(eval_bar, text="Re-run model", 
+                       variable=self.eval_refresh_var).pack(side='left', padx=5)
+        self.eval_btn = ttk.Button(eval_bar, text="🎯 Evaluate", command=self.evaluate_selected_run)
+        self.eval_btn.pack(side='left', padx=5)
+        self.eval_status_label = ttk.Label(eval_bar, text="", foreground=self.colors['text_dim'])
+        self.eval_status_label.pack(side='left', padx=10)
+        
+        self.eval_text = scrolledtext.ScrolledText(eval_frame,
+                                                   bg=self.colors['bg_dark'],
+                                                   fg=self.colors['text'],
+                                                   font=('Consolas', 10))
+        self.eval_text.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        # Runs tab: so sánh tất cả các run trong runs/
+        runs_frame = ttk.Frame(results_notebook)
+        results_notebook.add(runs_frame, text="🗂️ Runs")
+        
+        runs_bar = ttk.Frame(runs_frame)
+        runs_bar.pack(fill='x', padx=5, pady=5)
+        
+        ttk.Label(runs_bar, text="Filter:").pack(side='left', padx=(0, 5))
+        self.runs_filter_var = tk.StringVar()
+        self.runs_filter_var.trace_add('write', lambda *args: self.refresh_runs_table())
+        ttk.Entry(runs_bar, textvariable=self.runs_filter_var, width=30).pack(side='left', padx=(0, 10))
+        
+        ttk.Label(runs_bar, text="Curve:").pack(side='left', padx=(0, 5))
+        self.runs_metric_var = tk.StringVar(value=BEST_METRIC)
+        self.runs_metric_combo = ttk.Combobox(runs_bar, textvariable=self.runs_metric_var, width=24,
+                                              values=[BEST_METRIC], state='readonly')
+        self.runs_metric_combo.pack(side='left', padx=(0, 10))
+        self.runs_metric_combo.bind('<<ComboboxSelected>>', lambda e: self.draw_runs_overlay())
+        
+        ttk.Button(runs_bar, text="🔄 Rescan", command=self.rescan_runs, width=10).pack(side='left')
+        self.runs_status_label = ttk.Label(runs_bar, text="", foreground=self.colors['text_dim'])
+        self.runs_status_label.pack(side='left', padx=10)
+        
+        runs_list = ttk.Frame(runs_frame)
+        runs_list.pack(fill='both', expand=True, padx=5)
+        
+        columns = ("name", "model", "data", "epochs_done", "best_epoch", "map50_95", "map50",
+                   "precision", "recall", "best_size", "modified")
+        headings = ("Run", "Model", "Dataset", "Epochs", "Best Epoch", "mAP50-95", "mAP50",
+                    "Precision", "Recall", "best.pt", "Modified")
+        self.runs_tree = ttk.Treeview(runs_list, columns=columns, show='headings', height=10)
+        for col, heading in zip(columns, headings):
+            self.runs_tree.heading(col, text=heading, command=lambda c=col: self.sort_runs_table(c))
+            self.runs_tree.column(col, width=80, anchor='center')
+        for col in ("name", "model", "data"):
+            self.runs_tree.column(col, width=150, anchor='w')
+        self.runs_tree.column("modified", width=130)
+        
+        runs_scrollbar = ttk.Scrollbar(runs_list, command=self.runs_tree.yview)
+        self.runs_tree.configure(yscrollcommand=runs_scrollbar.set)
+        self.runs_tree.pack(side='left', fill='both', expand=True)
+        runs_scrollbar.pack(side='right', fill='y')
+        
+        self.runs_tree.bind('<<TreeviewSelect>>', lambda e: self.draw_runs_overlay())
+        self.runs_tree.bind('<Double-Button-1>', self.open_catalog_run)
+        
+        self.runs_canvas = tk.Canvas(runs_frame, bg=self.colors['bg_dark'], highlightthickness=0, height=260)
+        self.runs_canvas.pack(fill='x', padx=5, pady=5)
+        self.runs_chart = LiveChart(self.runs_canvas, self.colors)
+        self.runs_canvas.bind('<Configure>', lambda e: self.draw_runs_overlay())
+        
+    def create_inference_tab(self):
+        """Tab chạy weights trên thư mục ảnh / video"""
+        self.inferencer = None
+        
+        control_frame = ttk.Frame(self.inference_tab, style='Card.TFrame')
+        control_frame.pack(fill='x', padx=10, pady=10)
+        
+        ttk.Label(control_frame, text="🔍 Batch Inference", 
+                 style='Subtitle.TLabel').pack(anchor='w', padx=15, pady=(15, 10))
+        
+        # Weights (trống = best.pt của run trong tab Results)
+        weights_row = ttk.Frame(control_frame)
+        weights_row.pack(fill='x', padx=15, pady=(0, 5))
+        ttk.Label(weights_row, text="Weights:", width=10).pack(side='left')
+        self.infer_weights_var = tk.StringVar()
+        ttk.Entry(weights_row, textvariable=self.infer_weights_var).pack(side='left', fill='x', expand=True, padx=5)
+        ttk.Button(weights_row, text="📁 Browse", 
+                  command=self.browse_inference_weights).pack(side='left')
+        
+        source_row = ttk.Frame(control_frame)
+        source_row.pack(fill='x', padx=15, pady=(0, 5))
+        ttk.Label(source_row, text="Source:", width=10).pack(side='left')
+        self.infer_source_var = tk.StringVar()
+        ttk.Entry(source_row, textvariable=self.infer_source_var).pack(side='left', fill='x', expand=True, padx=5)
+        ttk.Button(source_row, text="📁 Folder", 
+                  command=self.browse_inference_folder).pack(side='left', padx=(0, 5))
+        ttk.Button(source_row, text="🎞️ Video", 
+                  command=self.browse_inference_video).pack(side='left')
+        
+        opts_row = ttk.Frame(control_frame)
+        opts_row.pack(fill='x', padx=15, pady=(5, 10))
+        self.infer_opt_vars = {}
+        for key, label, value in (('conf', "Conf:", "0.25"), ('iou', "IoU:", "0.7"),
+                                  ('batch', "Batch:", str(DEFAULT_BATCH)),
+                                  ('decode_threads', "Decode threads:", str(DECODE_THREADS)),
+                                  ('imgsz', "Image size (0 = model):", "0")):
+            ttk.Label(opts_row, text=label).pack(side='left')
+            self.infer_opt_vars[key] = tk.StringVar(value=value)
+            ttk.Entry(opts_row, textvariable=self.infer_opt_vars[key], width=6).pack(side='left', padx=(5, 15))
+        self.infer_save_images_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(opts_row, text="Save annotated", 
+                       variable=self.infer_save_images_var).pack(side='left', padx=5)
+        self.infer_save_json_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(opts_row, text="Save JSON", 
+                       variable=self.infer_save_json_var).pack(side='left', padx=5)
+        
+        # Ảnh 4K, đối tượng nhỏ: cắt tile chồng lấn thay vì thu nhỏ cả ảnh
+        tile_row = ttk.Frame(control_frame)
+        tile_row.pack(fill='x', padx=15, pady=(0, 10))
+        for key, label, value in (('tile_size', "Tile size (0 = off):", "0"),
+                                  ('tile_overlap', "Tile overlap:", str(TILE_OVERLAP))):
+            ttk.Label(tile_row, text=label).pack(side='left')
+            self.infer_opt_vars[key] = tk.StringVar(value=value)
+            ttk.Entry(tile_row, textvariable=self.infer_opt_vars[key], width=6).pack(side='left', padx=(5, 15))
+        ttk.Label(tile_row, text="Merge:").pack(side='left')
+        self.infer_merge_var = tk.StringVar(value='nms')
+        ttk.Combobox(tile_row, textvariable=self.infer_merge_var, values=MERGE_METHODS,
+                    state='readonly', width=6).pack(side='left', padx=5)
+        
+        btn_row = ttk.Frame(control_frame)
+        btn_row.pack(fill='x', padx=15, pady=(0, 15))
+        self.infer_run_btn = ttk.Button(btn_row, text="▶️ Run Inference", style='Success.TButton',
+                                        command=self.run_inference, width=20)
+        self.infer_run_btn.pack(side='left')
+        self.infer_stop_btn = ttk.Button(btn_row, text="⏹️ Stop", command=self.stop_inference,
+                                         state='disabled', width=12)
+        self.infer_stop_btn.pack(side='left', padx=10)
+        ttk.Button(btn_row, text="📂 Open Output", 
+                  command=self.open_inference_output).pack(side='left')
+        
+        # Tiến độ và throughput từng stage (decode -> forward -> write)
+        stats_frame = ttk.Frame(self.inference_tab, style='Card.TFrame')
+        stats_frame.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        
+        self.infer_progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(stats_frame, variable=self.infer_progress_var, maximum=100, mode='determinate',
+                       style='Horizontal.TProgressbar').pack(fill='x', padx=15, pady=(15, 5))
+        self.infer_status_label = ttk.Label(stats_frame, text="Select weights and a folder or video...",
+                                            foreground=self.colors['text_dim'])
+        self.infer_status_label.pack(anchor='w', padx=15)
+        
+        columns = ("stage", "workers", "frames", "busy", "fps")
+        headings = ("Stage", "Threads", "Frames", "Busy (s)", "Frames/s")
+        self.infer_tree = ttk.Treeview(stats_frame, columns=columns, show='headings', height=4)
+        for col, heading in zip(columns, headings):
+            self.infer_tree.heading(col, text=heading)
+            self.infer_tree.column(col, width=100, anchor='center')
+        self.infer_tree.tag_configure('bottleneck', foreground=self.colors['warning'])
+        self.infer_tree.pack(fill='x', padx=15, pady=10)
+        self.infer_output_dir = ''
+        
     def create_status_bar(self):
         """Tạo status bar"""
         status_frame = ttk.Frame(self.root)
@@ -512,6 +971,12 @@ class YOLOTrainerGUI:
         self.time_label.pack(side='right')
         
         self.update_time()
+        self.process_training_events()
+        self.follow_results()
+        self.poll_results()
+        self.rescan_runs()
+        # Dọn cache thumbnail cũ trong nền
+        threading.Thread(target=prune_cache, daemon=True).start()
         
     def update_time(self):
         """Update current time"""
@@ -551,38 +1016,39 @@ class YOLOTrainerGUI:
         thread.start()
         
     def check_environment(self):
-        """Kiểm tra môi trường"""
-        self.env_status.delete(1.0, tk.END)
+        """Kiểm tra môi trường (chạy nền, không import torch vào process giao diện)"""
+        self.env_pump.clear()
         self.log_to_env("Checking environment...\n\n", 'info')
+        threading.Thread(target=self._check_environment, daemon=True).start()
         
+    def _check_environment(self):
         # Check Python
         self.log_to_env(f"✓ Python: {sys.version}\n", 'success')
         
-        # Check key packages
-        packages = ['ultralytics', 'torch', 'torchvision', 'opencv-python', 'numpy']
-        
-        for package in packages:
-            try:
-                __import__(package.replace('-', '_'))
-                self.log_to_env(f"✓ {package}: Installed\n", 'success')
-            except ImportError:
-                self.log_to_env(f"✗ {package}: Not installed\n", 'error')
+        # Check key packages: find_spec + metadata, không import
+        for package in quick_probe():
+            if package.installed:
+                self.log_to_env(f"✓ {package.name}: {package.version or 'Installed'}\n", 'success')
+            else:
+                self.log_to_env(f"✗ {package.name}: Not installed\n", 'error')
         
-        # Check CUDA
+        # Check CUDA: import torch trong process riêng
+        self.log_to_env("\nChecking CUDA...\n", 'info')
         try:
-            import torch
-            if torch.cuda.is_available():
-                self.log_to_env(f"\n✓ CUDA: Available (GPU: {torch.cuda.get_device_name(0)})\n", 'success')
-            else:
-                self.log_to_env("\n⚠ CUDA: Not available (will use CPU)\n", 'warning')
-        except:
-            self.log_to_env("\n⚠ Could not check CUDA\n", 'warning')
+            info = deep_check()
+        except Exception as e:
+            self.log_to_env(f"⚠ Could not check CUDA: {str(e)}\n", 'warning')
+            return
+        if info.cuda_available:
+            self.log_to_env(f"✓ CUDA {info.cuda_version}: Available (GPU: {', '.join(info.devices)})\n", 'success')
+        elif info.error:
+            self.log_to_env(f"⚠ Could not check CUDA: {info.error}\n", 'warning')
+        else:
+            self.log_to_env("⚠ CUDA: Not available (will use CPU)\n", 'warning')
             
     def log_to_env(self, message, tag='info'):
         """Log to environment status"""
-        self.env_status.insert(tk.END, message, tag)
-        self.env_status.see(tk.END)
-        self.env_status.update()
+        self.env_pump.put(message, tag)
         
     # Model selection functions
     def browse_model(self):
@@ -611,12 +1077,7 @@ class YOLOTrainerGUI:
             'custom_model': self.custom_model_path.get(),
             'dataset': self.dataset_path.get(),
             'params': {k: v.get() for k, v in self.params.items()},
-            'bool_params': {
-                'cos_lr': self.cos_lr_var.get(),
-                'amp': self.amp_var.get(),
-                'pretrained': self.pretrained_var.get(),
-                'plots': self.plots_var.get()
-            }
+            'bool_params': self.get_bool_params()
         }
         
         filename = filedialog.asksaveasfilename(
@@ -629,6 +1090,15 @@ class YOLOTrainerGUI:
                 json.dump(config, f, indent=4)
             messagebox.showinfo("Success", "Configuration saved successfully!")
             
+    def get_bool_params(self):
+        """Boolean training parameters from the Setup tab"""
+        return {
+            'cos_lr': self.cos_lr_var.get(),
+            'amp': self.amp_var.get(),
+            'pretrained': self.pretrained_var.get(),
+            'plots': self.plots_var.get()
+        }
+        
     def load_config_file(self):
         """Load configuration from file"""
         filename = filedialog.askopenfilename(
@@ -668,6 +1138,16 @@ class YOLOTrainerGUI:
                     config = json.load(f)
                 
                 self.dataset_path.set(config.get('dataset', 'helmat.v1i.yolov11/data.yaml'))
+                self.log_pump.configure(
+                    flush_interval_ms=config.get('log_flush_interval_ms'),
+                    max_lines_per_flush=config.get('log_max_lines_per_flush'),
+                    max_widget_lines=config.get('log_max_widget_lines')
+                )
+                self.warm_worker_var.set(bool(config.get('warm_worker', False)))
+                self.preflight_var.set(bool(config.get('preflight_scan', True)))
+                self.auto_resume_var.set(bool(config.get('auto_resume', True)))
+                self.stop_timeout_s = float(config.get('graceful_stop_timeout_s', self.GRACEFUL_STOP_TIMEOUT_S))
+                self.validate_on_stop = bool(config.get('validate_on_stop', True))
             except:
                 pass
                 
@@ -683,9 +1163,6 @@ class YOLOTrainerGUI:
             messagebox.showerror("Error", "Please select a dataset!")
             return
         
-        # Get model path
-        model_path = self.custom_model_path.get() if self.custom_model_path.get() else self.model_var.get()
-        
         # Prepare training parameters
         try:
             epochs = int(self.params['epochs'].get())
@@ -694,164 +1171,736 @@ class YOLOTrainerGUI:
             messagebox.showerror("Error", "Invalid epochs value!")
             return
         
-        # Update UI
+        # Run directory: ultralytics sẽ ghi kết quả vào đây, log đầy đủ cũng ghi ra đây
+        self.begin_run(next_run_dir())
+        self.log_message("Starting YOLO training...\n", 'info')
+        self.log_message(f"Model: {self.get_model_path()}\n", 'info')
+        self.log_message(f"Dataset: {self.dataset_path.get()}\n", 'info')
+        self.log_message(f"Epochs: {epochs}\n", 'info')
+        self.log_message(f"Run directory: {self.run_dir}\n\n", 'info')
+        
+        if self.preflight_var.get():
+            self.log_message("🔍 Checking dataset...\n", 'info')
+            dataset = self.dataset_path.get()
+            self.preflight_pending = dataset
+            threading.Thread(target=lambda: self.training_events.put(scan_dataset(dataset)),
+                             daemon=True).start()
+        else:
+            self.launch_training()
+            
+    def begin_run(self, run_dir):
+        """Switch the UI to training mode for a run directory"""
         self.is_training = True
+        self.stop_requested = False
+        self.resume_attempts = 0
+        self.current_epoch = 0
+        self.training_worker = None
         self.start_btn.config(state='disabled')
+        self.resume_btn.config(state='disabled')
         self.stop_btn.config(state='normal')
         self.status_label.config(text="Training...", foreground=self.colors['warning'])
         
-        # Clear log
-        self.log_text.delete(1.0, tk.END)
-        self.log_message("Starting YOLO training...\n", 'info')
-        self.log_message(f"Model: {model_path}\n", 'info')
-        self.log_message(f"Dataset: {self.dataset_path.get()}\n", 'info')
-        self.log_message(f"Epochs: {epochs}\n\n", 'info')
+        self.run_dir = Path(run_dir)
+        self.results_path.set(str(self.run_dir))
         
-        # Start training in separate thread
-        self.training_thread = threading.Thread(target=self.run_training, 
-                                               args=(model_path,), daemon=True)
-        self.training_thread.start()
+        # Clear log (file log của run được ghi tiếp, không ghi đè)
+        self.log_pump.clear()
+        self.log_pump.set_spool(LogSpool(self.run_dir))
         
-    def run_training(self, model_path):
-        """Run training process"""
+    def resume_training(self):
+        """Continue the run shown in Results (or a chosen one) from weights/last.pt"""
+        if self.is_training:
+            messagebox.showwarning("Warning", "Training is already in progress!")
+            return
+        run_dir = self.results_path.get()
+        checkpoint = resumable_checkpoint(run_dir) if run_dir and os.path.isdir(run_dir) else ''
+        if not checkpoint:
+            run_dir = filedialog.askdirectory(title="Select an interrupted run",
+                                              initialdir=RUNS_ROOT if os.path.isdir(RUNS_ROOT) else None)
+            if not run_dir:
+                return
+            checkpoint = resumable_checkpoint(run_dir)
+            if not checkpoint:
+                messagebox.showerror("Error", f"Nothing to resume in {run_dir}:\n"
+                                              "it needs weights/last.pt of a run that did not finish.")
+                return
+        
+        self.begin_run(run_dir)
+        self.log_message(f"⏯️ Resuming training from {checkpoint}\n\n", 'info')
+        self.launch_training(resume_job(checkpoint))
+        
+    def on_preflight_report(self, report):
+        """Kết quả pre-flight: báo lỗi dataset, hỏi có tiếp tục training không"""
+        if self.stop_requested:
+            self.finish_training(TrainingFinished(False))
+            return
+        self.log_dataset_report(report, self.log_message)
+        if not report.ok and not messagebox.askyesno(
+                "Dataset Errors",
+                f"The dataset pre-flight check found {report.error_count} errors "
+                f"(see the training log).\n\nStart training anyway?"):
+            self.finish_training(TrainingFinished(False, error="Cancelled: dataset pre-flight check failed"))
+            return
+        self.launch_training()
+        
+    def log_dataset_report(self, report, log):
+        for line in report.summary_lines():
+            tag = 'error' if '✗' in line else 'warning' if '⚠' in line else 'info'
+            log(line + "\n", tag)
+        if report.ok:
+            log("✓ Dataset OK\n\n", 'success')
+        else:
+            log(f"✗ {report.error_count} dataset errors\n\n", 'error')
+            
+    def scan_selected_dataset(self):
+        """Quét dataset đang chọn, kết quả ghi vào khung Environment"""
+        dataset = self.dataset_path.get()
+        if not dataset:
+            messagebox.showerror("Error", "Please select a dataset!")
+            return
+        self.env_pump.clear()
+        self.log_to_env(f"🔍 Scanning {dataset}...\n", 'info')
+        
+        def scan():
+            report = scan_dataset(dataset)
+            self.log_dataset_report(report, self.log_to_env)
+            self.training_events.put(report)
+        threading.Thread(target=scan, daemon=True).start()
+        
+    def autotune_params(self):
+        """Chạy micro-benchmark để chọn batch size và workers"""
+        if not os.path.isfile(self.dataset_path.get()):
+            messagebox.showerror("Error", "Please select a dataset!")
+            return
         try:
-            # Build training script
-            script_lines = [
-                "from ultralytics import YOLO",
-                "import sys",
-                "",
-                "def main():",
-                f"    model = YOLO('{model_path}')",
-                "    ",
-                "    results = model.train(",
-                f"        data='{self.dataset_path.get()}',",
-            ]
-            
-            # Add parameters
-            for key, var in self.params.items():
-                value = var.get()
-                if key in ['optimizer']:
-                    script_lines.append(f"        {key}='{value}',")
-                else:
-                    script_lines.append(f"        {key}={value},")
-            
-            # Add boolean parameters
-            script_lines.append(f"        cos_lr={self.cos_lr_var.get()},")
-            script_lines.append(f"        amp={self.amp_var.get()},")
-            script_lines.append(f"        pretrained={self.pretrained_var.get()},")
-            script_lines.append(f"        plots={self.plots_var.get()},")
-            script_lines.append("    )")
-            script_lines.append("")
-            script_lines.append("if __name__ == '__main__':")
-            script_lines.append("    main()")
-            
-            script_content = "\n".join(script_lines)
-            
-            # Save training script
-            script_path = "temp_train.py"
-            with open(script_path, 'w') as f:
-                f.write(script_content)
-            
-            # Run training
-            self.training_process = subprocess.Popen(
-                [sys.executable, script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # Read output
-            for line in self.training_process.stdout:
-                if not self.is_training:
-                    break
-                    
-                self.log_message(line, 'info')
-                self.parse_training_output(line)
+            imgsz = int(self.params['imgsz'].get())
+        except ValueError:
+            messagebox.showerror("Error", "Invalid image size!")
+            return
+        if self.is_training and not messagebox.askyesno(
+                "Auto-tune", "Training is running, benchmarks will be slowed down. Continue?"):
+            return
+        
+        self.autotune_btn.config(state='disabled')
+        self.env_pump.clear()
+        self.log_to_env("⚡ Auto-tuning batch size and workers...\n", 'info')
+        self.autotuner = Autotuner(self.on_autotune_message)
+        self.autotuner.start(AutotuneSettings(self.get_model_path(), self.dataset_path.get(),
+                                              imgsz, self.params['device'].get()))
+        
+    def on_autotune_message(self, message):
+        """Nhận kết quả auto-tune (chạy trên reader thread)"""
+        if isinstance(message, AutotuneProgress):
+            self.log_to_env(message.text + "\n", 'info')
+        else:
+            self.training_events.put(message)
             
-            self.training_process.wait()
+    def apply_autotune(self, result):
+        self.autotune_btn.config(state='normal')
+        self.autotuner = None
+        if result.error:
+            self.log_to_env(f"✗ Auto-tune failed:\n{result.error}\n", 'error')
+            return
+        self.params['batch'].set(str(result.batch))
+        self.params['workers'].set(str(result.workers))
+        self.log_to_env(f"✓ Auto-tune on {result.device}: batch={result.batch}, workers={result.workers} "
+                        f"(~{result.images_per_sec:.1f} img/s)\n", 'success')
+        
+    def resize_selected_dataset(self):
+        """Tạo bản sao dataset đã thu nhỏ (dùng lại cho các lần training sau)"""
+        dataset = self.dataset_path.get()
+        if not os.path.isfile(dataset):
+            messagebox.showerror("Error", "Please select a dataset!")
+            return
+        try:
+            default = int(self.params['imgsz'].get())
+        except ValueError:
+            default = 640
+        max_side = simpledialog.askinteger("Resize Dataset", "Max image side (pixels):",
+                                           initialvalue=default, minvalue=32, maxvalue=8192)
+        if not max_side:
+            return
+        
+        self.env_pump.clear()
+        self.log_to_env(f"🗜️ Resizing {dataset} to {max_side}px...\n", 'info')
+        
+        def progress(done, total):
+            self.log_to_env(f"  {done}/{total} images\n", 'info')
             
-            # Training completed
-            if self.is_training:
-                self.log_message("\n✓ Training completed successfully!\n", 'success')
-                self.status_label.config(text="Training completed", 
-                                        foreground=self.colors['success'])
-                self.progress_var.set(100)
-                self.progress_text.config(text="Training completed!")
+        def resize():
+            try:
+                result = build_resized_dataset(dataset, max_side, progress=progress)
+            except Exception as e:
+                result = ResizeResult(errors=[str(e)])
+            self.training_events.put(result)
+        threading.Thread(target=resize, daemon=True).start()
+        
+    def finish_resize(self, result):
+        for error in result.errors[:20]:
+            self.log_to_env(f"✗ {error}\n", 'error')
+        if not result.yaml_path:
+            return
+        self.log_to_env(f"✓ {result.processed} resized, {result.reused} reused, {result.removed} removed "
+                        f"in {result.seconds:.1f}s\n  {result.yaml_path}\n", 'success')
+        if result.yaml_path != self.dataset_path.get() and messagebox.askyesno(
+                "Resize Dataset", f"Train on the resized dataset?\n\n{result.yaml_path}"):
+            self.dataset_path.set(result.yaml_path)
+        
+    def pack_selected_dataset(self):
+        """Đóng gói dataset thành shard (đọc bằng mmap khi training)"""
+        dataset = self.dataset_path.get()
+        if not os.path.isfile(dataset):
+            messagebox.showerror("Error", "Please select a dataset!")
+            return
+        
+        self.env_pump.clear()
+        self.log_to_env(f"📦 Packing {dataset}...\n", 'info')
+        
+        def progress(done, total):
+            self.log_to_env(f"  {done}/{total} images\n", 'info')
+            
+        def pack():
+            try:
+                result = pack_dataset(dataset, progress=progress)
+            except Exception as e:
+                result = PackResult(errors=[(dataset, str(e))])
+            self.training_events.put(result)
+        threading.Thread(target=pack, daemon=True).start()
+        
+    def finish_pack(self, result):
+        for path, message in result.errors[:20]:
+            self.log_to_env(f"✗ {path}: {message}\n", 'error')
+        if len(result.errors) > 20:
+            self.log_to_env(f"  ... {len(result.errors) - 20} more skipped\n", 'error')
+        if not result.images:
+            return
+        self.log_to_env(f"✓ {result.images} images in {result.shards} shards "
+                        f"({result.bytes / 2**20:.0f} MB, {result.skipped} skipped) in {result.seconds:.1f}s"
+                        f"\n  {result.yaml_path}\n", 'success')
+        if messagebox.askyesno("Pack Dataset", f"Train on the packed dataset?\n\n{result.yaml_path}"):
+            self.dataset_path.set(result.yaml_path)
+        
+    def schedule_dataset_info(self, *args):
+        """Cập nhật thống kê dataset sau khi đường dẫn ngừng thay đổi"""
+        if self.dataset_info_job:
+            self.root.after_cancel(self.dataset_info_job)
+        self.dataset_info_job = self.root.after(500, self.refresh_dataset_info)
+        
+    def refresh_dataset_info(self):
+        self.dataset_info_job = None
+        dataset = self.dataset_path.get()
+        if not os.path.isfile(dataset):
+            self.dataset_info_label.config(text="")
+            return
+        self.dataset_info_label.config(text="📊 Reading dataset...", foreground=self.colors['text_dim'])
+        threading.Thread(target=lambda: self.training_events.put(scan_dataset(dataset)),
+                         daemon=True).start()
+        
+    def show_dataset_info(self, report):
+        """Hiện số ảnh / histogram class dưới ô dataset"""
+        if report.yaml_path != self.dataset_path.get():
+            return
+        splits = " · ".join(f"{s.name} {s.images}" for s in report.splits.values())
+        totals = {}
+        for split in report.splits.values():
+            for class_id, count in split.class_counts.items():
+                totals[class_id] = totals.get(class_id, 0) + count
+        classes = ", ".join(f"{report.class_name(c)} {n}" for c, n in sorted(totals.items()))
+        status = "✓ OK" if report.ok else f"✗ {report.error_count} errors"
+        self.dataset_info_label.config(
+            text=f"📊 {splits} images | {classes or 'no labels'} | {status}",
+            foreground=self.colors['success'] if report.ok else self.colors['error'])
+        
+    def launch_training(self, job=None):
+        """Gửi job training cho worker process (mặc định: job từ tab Setup)"""
+        if job is None:
+            # Training chạy trong worker process, metrics gửi về qua callbacks
+            train_args = build_train_args(self.dataset_path.get(),
+                                          {k: v.get() for k, v in self.params.items()},
+                                          self.get_bool_params(), self.run_dir)
+            job = TrainingJob(self.get_model_path(), train_args)
+        job.validate_on_stop = self.validate_on_stop
+        self.console_splitter = ConsoleLineSplitter()
+        self.training_started_at = time.perf_counter()
+        try:
+            if self.warm_worker_var.get():
+                if not (self.warm_worker and self.warm_worker.is_alive()):
+                    self.spawn_warm_worker()
+                self.training_worker = self.warm_worker
+                self.warm_worker_used = True
+                self.training_worker.submit(job)
             else:
-                self.log_message("\n⚠ Training stopped by user\n", 'warning')
-                
+                # Worker dùng một lần: thoát ngay sau khi job xong
+                self.training_worker = TrainingWorker(self.on_worker_message)
+                self.training_worker.start()
+                self.training_worker.submit(job)
+                self.training_worker.shutdown()
         except Exception as e:
-            self.log_message(f"\n✗ Error during training: {str(e)}\n", 'error')
+            self.finish_training(TrainingFinished(False, error=str(e)))
+        
+    def get_model_path(self):
+        """Custom model if one was uploaded, otherwise the selected pretrained model"""
+        return self.custom_model_path.get() if self.custom_model_path.get() else self.model_var.get()
+        
+    def spawn_warm_worker(self):
+        """Start a persistent worker and preload the selected base weights"""
+        self.warm_worker = TrainingWorker(self.on_worker_message)
+        self.warm_worker_used = False
+        self.warm_worker_error = ''
+        self.warm_worker.start()
+        self.warm_worker.preload(self.get_model_path())
+        if not self.is_training:
+            self.status_label.config(text="Starting training worker...", 
+                                    foreground=self.colors['text_dim'])
+        
+    def respawn_warm_worker(self, exitcode):
+        """Worker warm bị dừng (Stop) hoặc crash -> spawn lại cho lần sau, trừ khi nó sẽ chết lại ngay"""
+        if self.warm_worker_error:
+            reason = f"torch/ultralytics failed to import:\n{self.warm_worker_error}"
+        elif not self.warm_worker_used:
+            reason = f"worker exited with code {exitcode} before running any job"
+        elif self.warm_restarts >= self.MAX_WARM_RESTARTS:
+            reason = f"worker crashed {self.warm_restarts + 1} times in a row (exit code {exitcode})"
+        else:
+            self.warm_restarts += 1
+            self.spawn_warm_worker()
+            return
+        self.warm_worker_var.set(False)
+        self.warm_restarts = 0
+        self.log_message(f"✗ Keep worker warm turned off: {reason}\n", 'error')
+        self.status_label.config(text="✗ Training worker failed, Keep worker warm turned off", 
+                                foreground=self.colors['error'])
+        messagebox.showerror("Training Worker", f"Keep worker warm was turned off: {reason}")
+        
+    def toggle_warm_worker(self):
+        """Bật/tắt worker warm"""
+        if self.warm_worker_var.get():
+            self.warm_restarts = 0
+            if not (self.warm_worker and self.warm_worker.is_alive()):
+                self.spawn_warm_worker()
+        elif self.warm_worker:
+            # Worker sẽ thoát sau khi job hiện tại (nếu có) hoàn thành
+            self.warm_worker.shutdown()
+            self.warm_worker = None
+            
+    def preload_selected_model(self, *args):
+        """Load lại base weights trong worker warm khi đổi model"""
+        if self.warm_worker and self.warm_worker.is_alive() and not self.warm_worker.busy:
+            self.warm_worker.preload(self.get_model_path())
+        
+    def on_worker_message(self, message):
+        """Nhận message từ training worker (chạy trên reader thread)"""
+        if isinstance(message, LogOutput):
+            self.console_splitter.raw = self.raw_log
+            for kind, text in self.console_splitter.feed(message.text):
+                if kind == 'progress':
+                    self.log_pump.put_progress(text, 'info')
+                else:
+                    self.log_pump.put_line(text, 'info')
+            return
+        
+        if isinstance(message, TrainingFinished):
+            for kind, text in self.console_splitter.close():
+                self.log_pump.put_line(text, 'info')
+        self.training_events.put(message)
+        
+    def finish_training(self, result):
+        """Cập nhật giao diện khi training kết thúc"""
+        if result.ok:
+            self.log_message("\n✓ Training completed successfully!\n", 'success')
+            self.status_label.config(text="Training completed", 
+                                    foreground=self.colors['success'])
+            self.progress_var.set(100)
+            self.progress_text.config(text="Training completed!")
+            if result.save_dir:
+                self.results_path.set(result.save_dir)
+        elif self.stop_requested and result.stopped:
+            self.log_message(f"\n⏸ Training stopped after epoch {result.epoch}, checkpoint saved "
+                             f"(⏯️ Resume continues from there)\n", 'warning')
+            self.status_label.config(text="Training stopped", foreground=self.colors['warning'])
+            if result.save_dir:
+                self.results_path.set(result.save_dir)
+        elif self.stop_requested:
+            self.log_message("\n⚠ Training stopped by user\n", 'warning')
+            self.status_label.config(text="Training stopped", foreground=self.colors['warning'])
+        else:
+            self.log_message(f"\n✗ Error during training:\n{result.error}\n", 'error')
+            checkpoint = self.auto_resume_checkpoint()
+            if checkpoint:
+                self.resume_attempts += 1
+                self.log_message(f"♻️ Resuming from {checkpoint} in {self.AUTO_RESUME_DELAY_MS / 1000:.0f}s "
+                                 f"(attempt {self.resume_attempts}/{self.AUTO_RESUME_RETRIES})\n", 'warning')
+                self.status_label.config(text="Training crashed, resuming...", foreground=self.colors['warning'])
+                self.root.after(self.AUTO_RESUME_DELAY_MS, lambda: self.relaunch_after_crash(checkpoint))
+                return
             self.status_label.config(text="Training failed", foreground=self.colors['error'])
-        finally:
-            self.is_training = False
-            self.start_btn.config(state='normal')
-            self.stop_btn.config(state='disabled')
-            
-            # Clean up
-            if os.path.exists("temp_train.py"):
-                try:
-                    os.remove("temp_train.py")
-                except:
-                    pass
+        
+        if self.stop_escalation_job:
+            self.root.after_cancel(self.stop_escalation_job)
+            self.stop_escalation_job = None
+        self.is_training = False
+        self.start_btn.config(state='normal')
+        self.resume_btn.config(state='normal')
+        self.stop_btn.config(state='disabled', text="⏹️ Stop Training")
+        self.rescan_runs()
                     
+    def auto_resume_checkpoint(self):
+        """last.pt to auto-resume the current run from after a crash, or ''"""
+        if not self.auto_resume_var.get() or self.resume_attempts >= self.AUTO_RESUME_RETRIES or not self.run_dir:
+            return ''
+        return resumable_checkpoint(self.run_dir)
+        
+    def relaunch_after_crash(self, checkpoint):
+        # Người dùng bấm Stop trong lúc chờ -> kết thúc như bình thường
+        if self.stop_requested:
+            self.finish_training(TrainingFinished(False))
+            return
+        self.launch_training(resume_job(checkpoint))
+        
     def stop_training(self):
-        """Stop training process"""
-        if self.training_process:
-            self.is_training = False
-            self.training_process.terminate()
+        """Stop training: finish the current epoch and save last.pt; a second click terminates"""
+        if not self.is_training:
+            return
+        worker = self.training_worker
+        # Chưa vào epoch nào (đang load dataset...) thì không có gì để lưu -> dừng ngay
+        if self.stop_requested or not self.current_epoch or not (worker and worker.busy):
+            self.force_stop_training()
+            return
+        self.stop_requested = True
+        worker.request_stop()
+        self.stop_btn.config(text="⏹️ Force Stop")
+        self.log_message(f"\nStopping after epoch {self.current_epoch} and saving a checkpoint... "
+                         f"(Force Stop terminates immediately)\n", 'warning')
+        self.status_label.config(text="Stopping after this epoch...", foreground=self.colors['warning'])
+        self.stop_escalation_job = self.root.after(int(self.stop_timeout_s * 1000), self.force_stop_training)
+        
+    def force_stop_training(self):
+        """Terminate the training worker (the partial epoch is lost)"""
+        self.stop_escalation_job = None
+        if not self.is_training:
+            return
+        if self.stop_requested:
+            self.log_message("\nTerminating training worker...\n", 'warning')
+        else:
             self.log_message("\nStopping training...\n", 'warning')
+        self.stop_requested = True
+        if self.training_worker:
+            self.training_worker.stop()
+            
+    def process_training_events(self):
+        """Apply queued training events on the Tk main thread"""
+        try:
+            while True:
+                self.handle_training_event(self.training_events.get_nowait())
+        except queue.Empty:
+            pass
+        self.root.after(100, self.process_training_events)
+        
+    def handle_training_event(self, event):
+        """Update progress and metric displays from one training event"""
+        if isinstance(event, EpochStart):
+            self.current_epoch = event.epoch
+            self.total_epochs = event.epochs
+            self.metric_labels['epoch'].config(text=f"{event.epoch}/{event.epochs}")
             
-    def parse_training_output(self, line):
-        """Parse training output to update metrics"""
-        # Parse epoch
-        epoch_match = re.search(r'Epoch\s+(\d+)/(\d+)', line)
-        if epoch_match:
-            current = int(epoch_match.group(1))
-            total = int(epoch_match.group(2))
-            self.current_epoch = current
-            self.total_epochs = total
-            
-            progress = (current / total) * 100
+        elif isinstance(event, BatchProgress):
+            done = event.epoch - 1
+            if event.batches:
+                done += event.batch / event.batches
+            progress = done / event.epochs * 100
             self.progress_var.set(progress)
-            self.progress_text.config(text=f"Epoch {current}/{total} ({progress:.1f}%)")
-            self.metric_labels['epoch'].config(text=f"{current}/{total}")
-        
-        # Parse metrics (simplified - actual parsing depends on ultralytics output format)
-        # You may need to adjust these regex patterns based on actual output
-        
-        # Loss
-        loss_match = re.search(r'loss:\s*([\d.]+)', line, re.IGNORECASE)
-        if loss_match:
-            self.metric_labels['loss'].config(text=f"{float(loss_match.group(1)):.4f}")
-        
-        # Precision
-        precision_match = re.search(r'precision:\s*([\d.]+)', line, re.IGNORECASE)
-        if precision_match:
-            self.metric_labels['precision'].config(text=f"{float(precision_match.group(1)):.4f}")
-        
-        # Recall
-        recall_match = re.search(r'recall:\s*([\d.]+)', line, re.IGNORECASE)
-        if recall_match:
-            self.metric_labels['recall'].config(text=f"{float(recall_match.group(1)):.4f}")
+            self.progress_text.config(text=f"Epoch {event.epoch}/{event.epochs} "
+                                           f"- batch {event.batch}/{event.batches} ({progress:.1f}%)")
+            self.metric_labels['loss'].config(text=f"{event.loss:.4f}")
+            
+        elif isinstance(event, ValMetrics):
+            self.metric_labels['precision'].config(text=f"{event.precision:.4f}")
+            self.metric_labels['recall'].config(text=f"{event.recall:.4f}")
+            self.metric_labels['mAP50'].config(text=f"{event.map50:.4f}")
+            self.metric_labels['mAP50-95'].config(text=f"{event.map50_95:.4f}")
+            
+        elif isinstance(event, BestFitness):
+            self.log_message(f"★ New best fitness {event.fitness:.4f} at epoch {event.epoch}\n", 'success')
+            
+        elif isinstance(event, TrainingFinished):
+            self.finish_training(event)
+            
+        elif isinstance(event, ResizeResult):
+            self.finish_resize(event)
+            
+        elif isinstance(event, PackResult):
+            self.finish_pack(event)
+            
+        elif isinstance(event, ThumbnailReady):
+            self.show_thumbnail(event)
+            
+        elif isinstance(event, CatalogScan):
+            self.finish_runs_scan(event)
+            
+        elif isinstance(event, AutotuneResult):
+            self.apply_autotune(event)
+            
+        elif isinstance(event, ExportProgress):
+            self.weights_text.insert(tk.END, event.text + "\n")
+            self.weights_text.see(tk.END)
+            
+        elif isinstance(event, ExportResult):
+            self.finish_export(event)
+            
+        elif isinstance(event, QuantizeProgress):
+            self.weights_text.insert(tk.END, event.text + "\n")
+            self.weights_text.see(tk.END)
+            
+        elif isinstance(event, QuantizeResult):
+            self.finish_quantize(event)
+            
+        elif isinstance(event, EvalProgress):
+            self.eval_status_label.config(text=f"Caching predictions {event.done}/{event.total}...")
+            
+        elif isinstance(event, EvalCacheResult):
+            self.finish_eval_cache(event)
+            
+        elif isinstance(event, InferenceProgress):
+            self.update_inference_progress(event)
+            
+        elif isinstance(event, InferenceResult):
+            self.finish_inference(event)
+            
+        elif isinstance(event, DatasetReport):
+            self.show_dataset_info(event)
+            if self.preflight_pending == event.yaml_path:
+                self.preflight_pending = None
+                self.on_preflight_report(event)
+            
+        elif isinstance(event, JobUpdated):
+            self.update_queue_row(event.job)
+            
+        elif isinstance(event, Sweep):
+            self.finish_sweep(event)
+            
+        elif isinstance(event, FirstBatch):
+            since_click = time.perf_counter() - self.training_started_at
+            worker = "warm worker" if event.warm else "cold worker"
+            self.log_message(f"⏱ Time to first batch: {since_click:.2f}s "
+                             f"({event.seconds:.2f}s inside {worker})\n", 'success')
+            if event.warm:
+                self.warm_restarts = 0
+            
+        elif isinstance(event, WorkerReady):
+            if event.error:
+                self.warm_worker_error = event.error
+                self.log_message(f"✗ Training worker failed to start:\n{event.error}\n", 'error')
+            elif self.is_training:
+                self.log_message(f"Worker imported torch/ultralytics in {event.import_seconds:.2f}s\n", 'info')
+            else:
+                self.status_label.config(text=f"🔥 Training worker ready ({event.import_seconds:.1f}s)", 
+                                        foreground=self.colors['success'])
+                
+        elif isinstance(event, WorkerExited):
+            if self.warm_worker and not self.warm_worker.is_alive():
+                self.warm_worker = None
+                if self.warm_worker_var.get():
+                    self.respawn_warm_worker(event.exitcode)
+            
+    def log_message(self, message, tag='info'):
+        """Log message to training log (thread-safe, flushed by the log pump)"""
+        self.log_pump.put(message, tag)
+        
+    def open_log_history(self):
+        """Xem toàn bộ log đã ghi ra đĩa, tải dần từng trang về phía trước"""
+        run_dir = self.run_dir or Path(self.results_path.get())
+        self.log_pump.flush()
+        pager = LogPager(run_dir)
+        if pager.exhausted:
+            messagebox.showinfo("Training Log", f"No log files found in:\n{run_dir}")
+            return
         
-        # mAP50
-        map50_match = re.search(r'mAP50:\s*([\d.]+)', line, re.IGNORECASE)
-        if map50_match:
-            self.metric_labels['mAP50'].config(text=f"{float(map50_match.group(1)):.4f}")
+        window = tk.Toplevel(self.root)
+        window.title(f"Training Log - {run_dir}")
+        window.geometry("1000x600")
+        window.configure(bg=self.colors['bg_dark'])
+        
+        history_text = scrolledtext.ScrolledText(window,
+                                                 bg=self.colors['bg_dark'],
+                                                 fg=self.colors['text'],
+                                                 font=('Consolas', 9),
+                                                 wrap=tk.WORD)
+        
+        def load_older():
+            lines = pager.older(self.LOG_HISTORY_PAGE_LINES)
+            if lines:
+                history_text.insert('1.0', "\n".join(lines) + "\n")
+            if pager.exhausted:
+                older_btn.config(state='disabled', text="Beginning of log")
+        
+        older_btn = ttk.Button(window, text="⬆️ Load Older", command=load_older)
+        older_btn.pack(fill='x', padx=10, pady=(10, 5))
+        history_text.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        
+        load_older()
+        history_text.see(tk.END)
+        
+    # Job queue functions
+    def queue_current_setup(self):
+        """Thêm cấu hình hiện tại của tab Setup vào hàng đợi"""
+        if not self.dataset_path.get():
+            messagebox.showerror("Error", "Please select a dataset!")
+            return
+        job = QueuedJob(name=f"{Path(self.get_model_path()).stem} @ {Path(self.dataset_path.get()).parent.name}",
+                        model=self.get_model_path(),
+                        dataset=self.dataset_path.get(),
+                        params={k: v.get() for k, v in self.params.items()},
+                        bool_params=self.get_bool_params())
+        self.job_queue.add(job)
+        
+    def queue_config_files(self):
+        """Thêm job từ các file config JSON đã lưu"""
+        filenames = filedialog.askopenfilenames(
+            title="Select Config Files",
+            filetypes=[("JSON File", "*.json"), ("All Files", "*.*")]
+        )
+        for filename in filenames:
+            try:
+                self.job_queue.add(QueuedJob.from_config_file(filename))
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to load config {filename}: {str(e)}")
+                
+    def remove_queued_jobs(self):
+        """Xóa các job đã chọn (trừ job đang chạy)"""
+        for item in self.queue_tree.selection():
+            job = self.job_queue.get(int(item))
+            if job and job.status != RUNNING:
+                self.job_queue.remove(job.job_id)
+                self.queue_tree.delete(item)
+                
+    def start_job_queue(self):
+        """Bắt đầu chạy hàng đợi"""
+        try:
+            self.job_queue.max_concurrent = max(1, int(self.queue_slots_var.get()))
+        except ValueError:
+            messagebox.showerror("Error", "Invalid number of concurrent jobs!")
+            return
+        self.job_queue.devices = split_devices(self.queue_devices_var.get())
+        self.job_queue.max_resumes = self.AUTO_RESUME_RETRIES if self.auto_resume_var.get() else 0
+        self.job_queue.start()
+        self.status_label.config(text="Job queue running...", foreground=self.colors['warning'])
+        
+    def stop_job_queue(self):
+        """Dừng hàng đợi và các job đang chạy"""
+        self.job_queue.stop_all()
+        self.status_label.config(text="Job queue stopped", foreground=self.colors['warning'])
+        
+    def on_job_update(self, update):
+        """Called from worker reader threads for every JobUpdated"""
+        self.training_events.put(update)
+        sweep = self.sweep
+        if sweep:
+            sweep.handle_update(update)
+        
+    def start_sweep(self):
+        """Sinh các trial từ tab Setup và chạy qua hàng đợi"""
+        if not self.dataset_path.get():
+            messagebox.showerror("Error", "Please select a dataset!")
+            return
+        if self.sweep and not self.sweep.finished:
+            messagebox.showwarning("Warning", "A sweep is already running!")
+            return
+        try:
+            sweep = Sweep(self.get_model_path(), self.dataset_path.get(),
+                          {k: v.get() for k, v in self.params.items()}, self.get_bool_params(),
+                          method=self.sweep_method_var.get(),
+                          samples=int(self.sweep_samples_var.get()),
+                          first_rung=int(self.sweep_rung_var.get() or 0),
+                          eta=int(self.sweep_eta_var.get() or 3),
+                          queue=self.job_queue,
+                          on_finished=lambda s: self.training_events.put(s))
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid sweep settings: {str(e)}")
+            return
+        if not sweep.dims:
+            messagebox.showerror("Error", "No parameter to sweep! Use a,b,c or lo:hi in Training Parameters.")
+            return
+        if not messagebox.askyesno("Start Sweep", f"Queue {len(sweep.trials)} trials "
+                                   f"into {sweep.sweep_dir}?"):
+            return
         
-        # mAP50-95
-        map5095_match = re.search(r'mAP50-95:\s*([\d.]+)', line, re.IGNORECASE)
-        if map5095_match:
-            self.metric_labels['mAP50-95'].config(text=f"{float(map5095_match.group(1)):.4f}")
+        self.sweep = sweep
+        try:
+            self.job_queue.max_concurrent = max(1, int(self.queue_slots_var.get()))
+        except ValueError:
+            self.job_queue.max_concurrent = 1
+        self.job_queue.devices = split_devices(self.queue_devices_var.get())
+        self.job_queue.max_resumes = self.AUTO_RESUME_RETRIES if self.auto_resume_var.get() else 0
+        sweep.start()
+        self.log_message(f"🔬 Sweep started: {len(sweep.trials)} trials "
+                         f"({', '.join(d.key for d in sweep.dims)}), "
+                         f"pruning at epochs {sweep.rungs or '-'}\n", 'info')
+        self.status_label.config(text="Sweep running...", foreground=self.colors['warning'])
+        
+    def finish_sweep(self, sweep):
+        """Sweep xong: báo kết quả tốt nhất và file leaderboard"""
+        best = sweep.leaderboard()[0]
+        self.log_message(f"✓ Sweep finished: {sweep.completed}/{len(sweep.trials)} trials completed\n", 'success')
+        if best.job.best_map50_95 is not None:
+            self.log_message(f"  Best trial #{best.index}: mAP50-95 {best.job.best_map50_95:.4f} "
+                             f"{best.values} -> {best.job.run_dir}\n", 'success')
+        self.log_message(f"  Leaderboard: {sweep.sweep_dir / 'leaderboard.csv'}\n", 'info')
+        self.status_label.config(text="Sweep finished", foreground=self.colors['success'])
+        
+    def update_queue_row(self, job):
+        """Cập nhật một dòng trong bảng job"""
+        eta = ""
+        if job.eta_seconds is not None:
+            eta = time.strftime("%H:%M:%S", time.gmtime(job.eta_seconds))
+        values = (job.name, Path(job.model).name, job.dataset, job.device, job.workers or "",
+                  job.status, f"{job.epoch}/{job.epochs}" if job.epochs else "",
+                  f"{job.best_map50_95:.4f}" if job.best_map50_95 is not None else "",
+                  eta, job.run_dir)
+        item = str(job.job_id)
+        if self.queue_tree.exists(item):
+            self.queue_tree.item(item, values=values)
+        elif self.job_queue.get(job.job_id):
+            self.queue_tree.insert('', tk.END, iid=item, values=values)
             
-    def log_message(self, message, tag='info'):
-        """Log message to training log"""
-        self.log_text.insert(tk.END, message, tag)
-        self.log_text.see(tk.END)
-        self.log_text.update()
+        if job.error and job.status == RUNNING:
+            self.log_message(f"♻️ Job '{job.name}' {job.error}\n", 'warning')
+            job.error = ''
+        elif job.error:
+            self.log_message(f"✗ Job '{job.name}' failed:\n{job.error}\n", 'error')
+            job.error = ''
+        if self.job_queue.running and not self.job_queue.active and \
+                not any(j.status == 'queued' for j in self.job_queue.jobs):
+            self.job_queue.running = False
+            self.status_label.config(text="Job queue finished", foreground=self.colors['success'])
+            
+    def open_queued_job_results(self, event):
+        """Mở kết quả của job trong tab Results"""
+        selection = self.queue_tree.selection()
+        if selection:
+            job = self.job_queue.get(int(selection[0]))
+            if job and job.run_dir:
+                self.results_path.set(job.run_dir)
+                self.notebook.select(self.results_tab)
+                self.load_results()
+            
+    def on_close(self):
+        """Dừng worker process trước khi thoát"""
+        for worker in (self.training_worker, self.warm_worker):
+            if worker:
+                worker.stop()
+        self.job_queue.stop_all()
+        if self.autotuner:
+            self.autotuner.stop()
+        if self.exporter:
+            self.exporter.stop()
+        if self.quantizer:
+            self.quantizer.stop()
+        if self.eval_cacher:
+            self.eval_cacher.stop()
+        if self.inferencer:
+            self.inferencer.stop()
+        self.thumb_loader.shutdown()
+        self.root.destroy()
         
     # Results functions
     def load_results(self):
@@ -862,27 +1911,12 @@ class YOLOTrainerGUI:
             messagebox.showwarning("Warning", "Results directory not found!")
             return
         
-        # Load summary
-        self.summary_text.delete(1.0, tk.END)
-        
-        # Check for results.csv or results.txt
-        results_file = os.path.join(results_dir, "results.csv")
-        if os.path.exists(results_file):
-            with open(results_file, 'r') as f:
-                self.summary_text.insert(tk.END, f.read())
-        else:
-            self.summary_text.insert(tk.END, "No results file found.\n")
-            self.summary_text.insert(tk.END, f"Looking in: {results_dir}\n")
+        # Load summary: đọc lại results.csv từ đầu, sau đó chỉ đọc phần mới
+        self.results_tail = None
+        self.follow_results()
         
         # Load plots
-        self.plots_list.delete(0, tk.END)
-        
-        plot_files = []
-        if os.path.exists(results_dir):
-            for file in os.listdir(results_dir):
-                if file.endswith(('.png', '.jpg', '.jpeg')):
-                    plot_files.append(os.path.join(results_dir, file))
-                    self.plots_list.insert(tk.END, file)
+        self.show_plots(results_dir)
         
         # Load weights info
         self.weights_text.delete(1.0, tk.END)
@@ -897,6 +1931,276 @@ class YOLOTrainerGUI:
                     self.weights_text.insert(tk.END, f"{file}: {size:.2f} MB\n")
         else:
             self.weights_text.insert(tk.END, "No weights found.\n")
+        
+        # Bảng benchmark/quantization của lần export trước (nếu có)
+        for title, name in (("Export benchmark", TABLE_NAME), ("INT8 quantization", QUANT_TABLE_NAME)):
+            table = os.path.join(results_dir, EXPORT_DIR, f"{name}.md")
+            if os.path.isfile(table):
+                with open(table, 'r', encoding='utf-8') as f:
+                    self.weights_text.insert(tk.END, f"\n{title} ({table}):\n\n{f.read()}")
+            
+    def export_selected_run(self):
+        """Export best.pt of the run in Results and benchmark every artifact on the CPU"""
+        if self.exporter and self.exporter.is_alive():
+            return
+        run_dir = self.results_path.get()
+        formats = tuple(fmt for fmt, var in self.export_format_vars.items() if var.get())
+        precisions = ('fp32',) + (('fp16',) if self.export_fp16_var.get() else ()) + \
+            (('int8',) if self.export_int8_var.get() else ())
+        try:
+            batch_sizes = tuple(int(b) for b in self.export_batches_var.get().replace(' ', '').split(',') if b)
+        except ValueError:
+            batch_sizes = ()
+        if not batch_sizes or min(batch_sizes) < 1:
+            messagebox.showerror("Error", "Invalid batch sizes (e.g. 1,4,8)!")
+            return
+        settings = settings_for_run(run_dir, formats=formats, precisions=precisions,
+                                    dynamic=self.export_dynamic_var.get(), batch_sizes=batch_sizes)
+        if not settings.weights:
+            messagebox.showerror("Error", f"No weights/best.pt or last.pt in {run_dir}")
+            return
+        if self.is_training and not messagebox.askyesno(
+                "Export", "Training is running, latency numbers will be slowed down. Continue?"):
+            return
+        
+        self.export_btn.config(state='disabled')
+        self.weights_text.delete(1.0, tk.END)
+        self.weights_text.insert(tk.END, f"📦 Exporting {settings.weights} "
+                                         f"({', '.join(formats) or 'PyTorch only'}; {', '.join(precisions)})\n")
+        self.exporter = Exporter(self.training_events.put)
+        self.exporter.start(settings)
+        
+    def finish_export(self, result):
+        self.export_btn.config(state='normal')
+        self.exporter = None
+        if result.error:
+            self.weights_text.insert(tk.END, f"\n✗ Export failed:\n{result.error}\n")
+            return
+        exported = [a for a in result.artifacts if a.path and not a.error]
+        self.weights_text.insert(tk.END, f"\n✓ {len(exported)} models in {result.out_dir}\n\n")
+        with open(result.table_path, 'r', encoding='utf-8') as f:
+            self.weights_text.insert(tk.END, f.read())
+        self.weights_text.see(tk.END)
+        
+    def quantize_selected_run(self):
+        """INT8 PTQ of the run in Results, calibrated on the train split of the Setup dataset"""
+        if self.quantizer and self.quantizer.is_alive():
+            return
+        run_dir = self.results_path.get()
+        data = self.dataset_path.get()
+        settings = quantize_settings_for_run(run_dir, data)
+        if not settings.weights:
+            messagebox.showerror("Error", f"No weights/best.pt or last.pt in {run_dir}")
+            return
+        if not os.path.isfile(data):
+            messagebox.showerror("Error", f"Dataset not found: {data}\n"
+                                          "Select the data.yaml the run was trained on in Setup.")
+            return
+        if self.is_training and not messagebox.askyesno(
+                "Quantize", "Training is running, latency numbers will be slowed down. Continue?"):
+            return
+        
+        self.quantize_btn.config(state='disabled')
+        self.weights_text.delete(1.0, tk.END)
+        self.weights_text.insert(tk.END, f"🧮 Quantizing {settings.weights} to INT8 "
+                                         f"(calibration: train split of {data})\n")
+        self.quantizer = Quantizer(self.training_events.put)
+        self.quantizer.start(settings)
+        
+    def finish_quantize(self, result):
+        self.quantize_btn.config(state='normal')
+        self.quantizer = None
+        if result.error:
+            self.weights_text.insert(tk.END, f"\n✗ Quantization failed:\n{result.error}\n")
+            return
+        self.weights_text.insert(tk.END, f"\n✓ Calibrated on {result.calibration_images} train images, "
+                                         f"models in {result.out_dir}\n\n")
+        with open(result.table_path, 'r', encoding='utf-8') as f:
+            self.weights_text.insert(tk.END, f.read())
+        self.weights_text.see(tk.END)
+            
+    def eval_settings(self):
+        """EvalSettings for the run in Results; the dataset falls back to the one in Setup"""
+        settings = eval_settings_for_run(self.results_path.get())
+        if not settings.data or not os.path.isfile(settings.data):
+            settings.data = self.dataset_path.get()
+        conf, iou = float(self.eval_conf_var.get()), float(self.eval_iou_var.get())
+        # Cache rộng nhất để các lần đổi conf/iou sau không phải chạy lại model
+        settings.conf, settings.iou = min(conf, CACHE_CONF), max(iou, CACHE_IOU)
+        return settings, conf, iou
+        
+    def evaluate_selected_run(self):
+        """P/R/mAP per class at the entered conf/iou, from cached predictions of the val split"""
+        if self.eval_cacher and self.eval_cacher.is_alive():
+            return
+        try:
+            settings, conf, iou = self.eval_settings()
+        except ValueError:
+            messagebox.showerror("Error", "Invalid conf/IoU!")
+            return
+        if not settings.weights:
+            messagebox.showerror("Error", f"No weights/best.pt or last.pt in {self.results_path.get()}")
+            return
+        if not os.path.isfile(settings.data):
+            messagebox.showerror("Error", f"Dataset not found: {settings.data}\n"
+                                          "Select the data.yaml the run was trained on in Setup.")
+            return
+        if self.eval_refresh_var.get():
+            self.eval_cache = None
+            self.eval_refresh_var.set(False)
+        elif self.eval_cache is None or not self.eval_cache.matches(settings):
+            self.eval_cache = load_cache(settings)
+        if self.eval_cache is not None:
+            self.show_eval_metrics(conf, iou)
+            return
+        
+        self.eval_btn.config(state='disabled')
+        self.eval_status_label.config(text=f"Caching predictions of {settings.weights}...")
+        self.eval_cacher = PredictionCacher(self.training_events.put)
+        self.eval_cacher.start(settings)
+        
+    def finish_eval_cache(self, result):
+        self.eval_btn.config(state='normal')
+        self.eval_cacher = None
+        if result.error:
+            self.eval_status_label.config(text="")
+            self.eval_text.delete(1.0, tk.END)
+            self.eval_text.insert(tk.END, f"✗ Caching predictions failed:\n{result.error}\n")
+            return
+        self.eval_status_label.config(text=f"✓ {result.predictions} predictions on {result.images} images "
+                                           f"cached in {result.seconds:.1f}s")
+        self.eval_cache = PredictionCache.load(result.path)
+        try:
+            conf, iou = float(self.eval_conf_var.get()), float(self.eval_iou_var.get())
+        except ValueError:
+            return
+        self.show_eval_metrics(conf, iou)
+        
+    def show_eval_metrics(self, conf, iou):
+        try:
+            metrics = self.eval_cache.evaluate(conf, iou)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.eval_text.delete(1.0, tk.END)
+        self.eval_text.insert(tk.END, format_metrics(metrics) + "\n")
+            
+    def follow_results(self, *args):
+        """Theo dõi results.csv của thư mục trong ô Results Directory"""
+        path = os.path.join(self.results_path.get(), "results.csv")
+        if self.results_tail is not None and self.results_tail.path == path:
+            return
+        self.results_tail = ResultsTail(path)
+        self.results_generation = None
+        self.summary_text.delete(1.0, tk.END)
+        self.summary_text.insert(tk.END, f"Waiting for {path}\n")
+        self.update_results()
+        self.schedule_chart_redraw()
+        
+    def poll_results(self):
+        self.update_results()
+        self.root.after(self.RESULTS_POLL_MS, self.poll_results)
+        
+    def update_results(self):
+        """Parse rows appended to results.csv since the last poll"""
+        tail = self.results_tail
+        if tail is None:
+            return
+        lines = tail.poll()
+        if not lines:
+            return
+        if tail.generation != self.results_generation:
+            # Lần đọc đầu hoặc file bị ghi lại từ đầu
+            self.results_generation = tail.generation
+            self.summary_text.delete(1.0, tk.END)
+        at_end = self.summary_text.yview()[1] >= 0.999
+        self.summary_text.insert(tk.END, "\n".join(lines) + "\n")
+        if at_end:
+            self.summary_text.see(tk.END)
+        self.schedule_chart_redraw()
+        
+    def schedule_chart_redraw(self):
+        """Gộp nhiều yêu cầu vẽ lại (dữ liệu mới, đổi kích thước) thành một"""
+        if self.chart_redraw_job is None:
+            self.chart_redraw_job = self.root.after(50, self.redraw_chart)
+            
+    def redraw_chart(self):
+        self.chart_redraw_job = None
+        if self.results_tail is not None:
+            self.live_chart.draw(self.results_tail)
+            
+    # Run catalog functions
+    def rescan_runs(self):
+        """Cập nhật chỉ mục runs/ trong nền (chỉ đọc lại run có file thay đổi)"""
+        if self.catalog_scanning:
+            return
+        self.catalog_scanning = True
+        self.runs_status_label.config(text="Scanning runs...")
+        threading.Thread(target=lambda: self.training_events.put(scan_runs(RUNS_ROOT)), daemon=True).start()
+        
+    def finish_runs_scan(self, scan):
+        self.catalog_scanning = False
+        if scan.error:
+            self.runs_status_label.config(text=f"✗ {scan.error}")
+            return
+        self.catalog_runs = scan.runs
+        self.runs_status_label.config(text=f"{len(scan.runs)} runs ({scan.scanned} updated, "
+                                           f"{scan.seconds:.2f}s)")
+        self.refresh_runs_table()
+        
+    def sort_runs_table(self, column):
+        key, descending = self.catalog_sort
+        self.catalog_sort = (column, not descending if key == column else column != 'name')
+        self.refresh_runs_table()
+        
+    def refresh_runs_table(self):
+        """Lọc + sắp xếp danh sách run đã có trong bộ nhớ (không đọc đĩa)"""
+        selected = set(self.runs_tree.selection())
+        key, descending = self.catalog_sort
+        runs = sort_runs(filter_runs(self.catalog_runs, self.runs_filter_var.get()), key, descending)
+        
+        def number(value, fmt):
+            return '-' if value != value else fmt.format(value)
+        
+        self.runs_tree.delete(*self.runs_tree.get_children())
+        for run in runs:
+            modified = datetime.fromtimestamp(run.modified).strftime("%Y-%m-%d %H:%M") if run.modified else '-'
+            values = (run.name, Path(run.model).name, Path(run.data).name,
+                      f"{run.epochs_done}/{run.epochs}", run.best_epoch or '-',
+                      number(run.map50_95, "{:.4f}"), number(run.map50, "{:.4f}"),
+                      number(run.precision, "{:.3f}"), number(run.recall, "{:.3f}"),
+                      f"{run.best_size / 2**20:.1f} MB" if run.best_size else '-', modified)
+            self.runs_tree.insert('', tk.END, iid=run.path, values=values)
+        keep = [path for path in selected if self.runs_tree.exists(path)]
+        if keep:
+            self.runs_tree.selection_set(keep)
+        self.draw_runs_overlay()
+        
+    def draw_runs_overlay(self):
+        """Vẽ chồng đường cong của các run đang chọn (đọc từ chỉ mục, không đọc CSV)"""
+        selection = self.runs_tree.selection()
+        metric = self.runs_metric_var.get()
+        series, columns = [], set()
+        if selection and os.path.isdir(RUNS_ROOT):
+            catalog = RunCatalog(RUNS_ROOT)
+            try:
+                for path in selection:
+                    columns.update(c for c in catalog.curve_columns(path) if c not in ('epoch', 'time'))
+                    curve = catalog.curve(path, metric)
+                    if curve is not None:
+                        series.append((Path(path).name, *curve))
+            finally:
+                catalog.close()
+        if columns:
+            self.runs_metric_combo.config(values=sorted(columns))
+        self.runs_chart.draw_overlay(metric, series)
+        
+    def open_catalog_run(self, event):
+        """Double-click: mở run trong các tab Charts/Summary/Plots"""
+        item = self.runs_tree.identify_row(event.y)
+        if item:
+            self.results_path.set(item)
+            self.load_results()
             
     def browse_results_folder(self):
         """Browse for results folder"""
@@ -911,25 +2215,222 @@ class YOLOTrainerGUI:
             
     def open_results_folder(self):
         """Open results folder in file explorer"""
-        results_dir = self.results_path.get()
-        if os.path.exists(results_dir):
-            os.startfile(results_dir)
-        else:
+        self.open_folder(self.results_path.get())
+        
+    def open_folder(self, directory):
+        if not directory or not os.path.exists(directory):
             messagebox.showwarning("Warning", "Results directory not found!")
+        elif sys.platform == 'win32':
+            os.startfile(directory)
+        else:
+            subprocess.Popen(['open' if sys.platform == 'darwin' else 'xdg-open', directory])
+            
+    # Inference functions
+    def browse_inference_weights(self):
+        filename = filedialog.askopenfilename(
+            title="Select Weights",
+            filetypes=[("PyTorch/ONNX weights", "*.pt *.onnx"), ("All files", "*.*")]
+        )
+        if filename:
+            self.infer_weights_var.set(filename)
+            
+    def browse_inference_folder(self):
+        folder = filedialog.askdirectory(title="Select Image Folder")
+        if folder:
+            self.infer_source_var.set(folder)
+            
+    def browse_inference_video(self):
+        patterns = " ".join(f"*.{ext}" for ext in sorted(VIDEO_FORMATS))
+        filename = filedialog.askopenfilename(
+            title="Select Video",
+            filetypes=[("Videos", patterns), ("All files", "*.*")]
+        )
+        if filename:
+            self.infer_source_var.set(filename)
             
+    def run_inference(self):
+        """Run the weights over the selected folder or video in a separate process"""
+        if self.inferencer and self.inferencer.is_alive():
+            return
+        weights = self.infer_weights_var.get() or run_weights(self.results_path.get())
+        if not weights or not os.path.isfile(weights):
+            messagebox.showerror("Error", "Select a weights file (or a run with weights/best.pt in Results)!")
+            return
+        source = self.infer_source_var.get()
+        if not source or not os.path.exists(source):
+            messagebox.showerror("Error", "Select an image folder or a video!")
+            return
+        try:
+            options = {key: (float if key in ('conf', 'iou', 'tile_overlap') else int)(var.get())
+                       for key, var in self.infer_opt_vars.items()}
+        except ValueError:
+            messagebox.showerror("Error", "Conf/IoU/overlap must be numbers, batch/threads/sizes integers!")
+            return
+        if not 0 <= options['tile_overlap'] < 1:
+            messagebox.showerror("Error", "Tile overlap must be in [0, 1)!")
+            return
+        
+        settings = InferenceSettings(weights, source, save_images=self.infer_save_images_var.get(),
+                                     save_json=self.infer_save_json_var.get(), tile_merge=self.infer_merge_var.get(),
+                                     **options)
+        self.infer_weights_var.set(weights)
+        self.infer_run_btn.config(state='disabled')
+        self.infer_stop_btn.config(state='normal')
+        self.infer_progress_var.set(0)
+        self.infer_tree.delete(*self.infer_tree.get_children())
+        self.infer_status_label.config(text=f"Loading {os.path.basename(weights)}...")
+        self.inferencer = Inferencer(self.training_events.put)
+        self.inferencer.start(settings)
+        
+    def stop_inference(self):
+        """Dừng sau khi ghi xong các frame đã forward (ảnh/video vẫn dùng được)"""
+        if self.inferencer:
+            self.inferencer.request_stop()
+            self.infer_stop_btn.config(state='disabled')
+            self.infer_status_label.config(text="Stopping...")
+            
+    def show_stage_stats(self, stages, bottleneck=''):
+        self.infer_tree.delete(*self.infer_tree.get_children())
+        if not bottleneck and any(s.frames for s in stages):
+            bottleneck = min((s for s in stages if s.frames), key=lambda s: s.fps).name
+        for s in stages:
+            self.infer_tree.insert('', 'end', values=(s.name, s.workers, s.frames, f"{s.busy_s:.2f}", f"{s.fps:.1f}"),
+                                   tags=('bottleneck',) if s.name == bottleneck else ())
+            
+    def update_inference_progress(self, progress):
+        if progress.total:
+            self.infer_progress_var.set(min(100, progress.frames / progress.total * 100))
+        total = f"/{progress.total}" if progress.total else ""
+        self.infer_status_label.config(text=f"{progress.frames}{total} frames, {progress.fps:.1f} frames/s")
+        self.show_stage_stats(progress.stages)
+        
+    def finish_inference(self, result):
+        self.inferencer = None
+        self.infer_run_btn.config(state='normal')
+        self.infer_stop_btn.config(state='disabled')
+        if result.error:
+            self.infer_status_label.config(text="✗ Inference failed")
+            messagebox.showerror("Inference Error", result.error[-2000:])
+            return
+        self.infer_output_dir = result.out_dir
+        if not result.stopped:
+            self.infer_progress_var.set(100)
+        skipped = f", {result.skipped} unreadable skipped" if result.skipped else ""
+        if result.tiles:
+            skipped += f", {result.tiles} tiles ({result.tiles / max(result.seconds, 1e-9):.1f} tiles/s)"
+        self.infer_status_label.config(
+            text=f"{'⏹️ Stopped' if result.stopped else '✓ Done'}: {result.frames} frames in {result.seconds:.1f}s "
+                 f"({result.fps:.1f} frames/s{skipped}), bottleneck: {result.bottleneck or '-'} → {result.out_dir}")
+        self.show_stage_stats(result.stages, result.bottleneck)
+        
+    def open_inference_output(self):
+        self.open_folder(self.infer_output_dir)
+            
+    # Plot thumbnails
+    def show_plots(self, results_dir):
+        """Hiển thị lưới thumbnail của các ảnh trong thư mục kết quả"""
+        self.thumb_loader.cancel_pending()
+        self.plot_files = list_result_images(results_dir)
+        self.plot_photos = {}
+        self.plot_requested = set()
+        self.plot_columns = 0
+        self.plots_canvas.yview_moveto(0)
+        self.layout_plots()
+        
+    def plot_cell(self, index):
+        """Top-left canvas coordinates of a thumbnail cell"""
+        row, col = divmod(index, self.plot_columns)
+        return col * self.PLOT_CELL_WIDTH, row * self.PLOT_CELL_HEIGHT
+        
+    def layout_plots(self):
+        canvas = self.plots_canvas
+        columns = max(1, canvas.winfo_width() // self.PLOT_CELL_WIDTH)
+        if columns == self.plot_columns:
+            self.request_visible_thumbnails()
+            return
+        self.plot_columns = columns
+        canvas.delete('all')
+        if not self.plot_files:
+            canvas.create_text(20, 20, anchor='nw', text="No images found.", fill=self.colors['text_dim'])
+        for index, path in enumerate(self.plot_files):
+            x, y = self.plot_cell(index)
+            canvas.create_rectangle(x + 8, y + 8, x + 8 + THUMB_SIZE, y + 8 + THUMB_SIZE,
+                                    outline=self.colors['text_dim'])
+            name = os.path.basename(path)
+            if len(name) > 28:
+                name = name[:25] + "..."
+            canvas.create_text(x + self.PLOT_CELL_WIDTH / 2, y + THUMB_SIZE + 16, text=name,
+                               fill=self.colors['text'], font=('Segoe UI', 9))
+            if path in self.plot_photos:
+                self.draw_thumbnail(index, path)
+        rows = -(-len(self.plot_files) // columns)
+        canvas.config(scrollregion=(0, 0, columns * self.PLOT_CELL_WIDTH, rows * self.PLOT_CELL_HEIGHT))
+        self.request_visible_thumbnails()
+        
+    def on_plots_scrolled(self, first, last):
+        self.plots_scrollbar.set(first, last)
+        self.request_visible_thumbnails()
+        
+    def request_visible_thumbnails(self):
+        """Chỉ yêu cầu thumbnail cho các hàng đang hiện (cộng 1 hàng dự phòng)"""
+        if not self.plot_files or not self.plot_columns:
+            return
+        top = self.plots_canvas.canvasy(0)
+        bottom = top + self.plots_canvas.winfo_height()
+        first_row = max(0, int(top // self.PLOT_CELL_HEIGHT))
+        last_row = int(bottom // self.PLOT_CELL_HEIGHT) + 1
+        for index in range(first_row * self.plot_columns,
+                           min(len(self.plot_files), (last_row + 1) * self.plot_columns)):
+            path = self.plot_files[index]
+            if path not in self.plot_requested:
+                self.plot_requested.add(path)
+                self.thumb_loader.request(path)
+                
+    def show_thumbnail(self, ready):
+        if ready.path not in self.plot_requested:
+            return  # thumbnail của run trước
+        index = self.plot_files.index(ready.path)
+        if ready.error:
+            x, y = self.plot_cell(index)
+            self.plots_canvas.create_text(x + 8 + THUMB_SIZE / 2, y + 8 + THUMB_SIZE / 2, text="✗ unreadable",
+                                          fill=self.colors['error'])
+            return
+        self.plot_photos[ready.path] = tk.PhotoImage(file=ready.thumb_path)
+        self.draw_thumbnail(index, ready.path)
+        
+    def draw_thumbnail(self, index, path):
+        x, y = self.plot_cell(index)
+        self.plots_canvas.create_image(x + 8 + THUMB_SIZE / 2, y + 8 + THUMB_SIZE / 2,
+                                       image=self.plot_photos[path])
+        
     def open_plot(self, event):
-        """Open selected plot"""
-        selection = self.plots_list.curselection()
-        if selection:
-            filename = self.plots_list.get(selection[0])
-            file_path = os.path.join(self.results_path.get(), filename)
-            if os.path.exists(file_path):
-                os.startfile(file_path)
+        """Mở ảnh được double-click trong trình xem ảnh của app"""
+        if not self.plot_columns:
+            return
+        col = int(self.plots_canvas.canvasx(event.x) // self.PLOT_CELL_WIDTH)
+        row = int(self.plots_canvas.canvasy(event.y) // self.PLOT_CELL_HEIGHT)
+        index = row * self.plot_columns + col
+        if col < self.plot_columns and index < len(self.plot_files):
+            ImageViewer(self.root, self.plot_files, index, self.colors)
 
 
 def main():
+    # Cần cho worker process (spawn) khi chạy bản đóng gói PyInstaller
+    multiprocessing.freeze_support()
+    
     root = tk.Tk()
     app = YOLOTrainerGUI(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
+    
+    startup_mark = os.environ.get(STARTUP_MARK_ENV)
+    if startup_mark:
+        def on_visible(event):
+            if event.widget is root:
+                with open(startup_mark, 'w') as f:
+                    f.write(repr(time.time()))
+                app.on_close()
+        root.bind('<Map>', on_visible)
+        
     root.mainloop()
 
 